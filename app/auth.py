@@ -1,25 +1,40 @@
 # tyres_service/auth.py
 # JWT verification. Tokens are issued by the users service (and service
 # tokens by the orders service) using the same shared JWT_SECRET.
+import hashlib
 import os
+import time
 from typing import Optional
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+from app.cache import TTLCache
+from app.metrics import JWT_DECODE_SECONDS, TOKEN_CACHE_LOOKUPS
 
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALGORITHM = "HS256"
 
+# Verified tokens, keyed by SHA-256 of the raw token. An entry lives for
+# TOKEN_CACHE_TTL seconds but never past the token's own exp, so a cached
+# token is never accepted after it would have failed jwt.decode.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+
 
 class TokenUser(BaseModel):
+    # Frozen: cached instances are shared between requests.
+    model_config = ConfigDict(frozen=True)
+
     id: Optional[int] = None  # None for service tokens
     name: str
     role: str
 
 
 _bearer = HTTPBearer(auto_error=False)
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
 
 
 def get_current_user(
@@ -31,20 +46,36 @@ def get_current_user(
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    key = hashlib.sha256(credentials.credentials.encode()).digest()
+    user = token_cache.get(key)
+    if user is not None:
+        TOKEN_CACHE_LOOKUPS.labels("hit").inc()
+        return user
+    TOKEN_CACHE_LOOKUPS.labels("miss").inc()
+
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        with JWT_DECODE_SECONDS.time():
+            payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return TokenUser(
+    user = TokenUser(
         id=payload.get("user_id"),
         name=payload.get("name", ""),
         role=payload.get("role", ""),
     )
 
+    ttl = TOKEN_CACHE_TTL
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(key, user, ttl=ttl)
+    return user
+
 
 def require_roles(*roles: str):
     def dependency(user: TokenUser = Depends(get_current_user)) -> TokenUser:
@@ -0,0 +1,278 @@
+# tyres_service/app/cache.py
+# Read-through cache for tyre lookups, shared by the API and the RPC
+# worker. The backend is chosen by TYRE_CACHE_BACKEND:
+#   memory - bounded LRU + TTL dict in this process (default)
+#   redis  - shared across processes/hosts (REDIS_URL), so an invalidation
+#            in one API replica is seen by every other reader
+#   off    - every lookup goes to the database
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import CACHE_LOOKUPS
+
+TYRE_CACHE_BACKEND = os.getenv("TYRE_CACHE_BACKEND", "memory")
+TYRE_CACHE_SIZE = int(os.getenv("TYRE_CACHE_SIZE", "10000"))
+TYRE_CACHE_TTL = float(os.getenv("TYRE_CACHE_TTL", "2"))
+FACET_CACHE_TTL = float(os.getenv("FACET_CACHE_TTL", "30"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class TTLCache:
+    """LRU cache whose entries also expire ttl seconds after being set."""
+
+    blocks = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_many(self, keys) -> dict:
+        """{key: value} for the keys that are cached."""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """Store value; ttl overrides the cache default for this entry."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class NullCache:
+    """Cache that never holds anything (TYRE_CACHE_BACKEND=off)."""
+
+    blocks = False
+
+    def get(self, key, default=None):
+        return default
+
+    def get_many(self, keys) -> dict:
+        return {}
+
+    def set(self, key, value, ttl: float = None) -> None:
+        pass
+
+    def delete(self, *keys) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class RedisCache:
+    """Cache over a redis-py compatible client (get/mget/set/delete/scan_iter).
+
+    Values go through dumps/loads. A Redis outage degrades to cache misses
+    rather than failed reads; a failed invalidation leaves the entry to
+    expire after its TTL.
+
+    The client blocks on a network round trip. Called from code the async
+    engine runs (AsyncSession.run_sync under ASYNC_DB, which is on the
+    event loop), the call goes to the threadpool and only that request
+    waits. Other event loop callers check blocks and offload themselves.
+    """
+
+    blocks = True
+
+    def __init__(self, client, prefix: str, ttl: float, dumps=json.dumps, loads=json.loads,
+                 errors=(OSError,)):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._dumps = dumps
+        self._loads = loads
+        self._errors = errors
+
+    def _key(self, key) -> str:
+        return f"{self.prefix}{key}"
+
+    def _call(self, method, *args, **kwargs):
+        if in_greenlet():
+            return await_only(run_in_threadpool(method, *args, **kwargs))
+        return method(*args, **kwargs)
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            raw = self._call(self.client.mget, [self._key(key) for key in keys])
+        except self._errors as e:
+            print(f"[cache] Redis read failed: {e!r}")
+            return {}
+        return {key: self._loads(value) for key, value in zip(keys, raw) if value is not None}
+
+    def set(self, key, value, ttl: float = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            self._call(
+                self.client.set, self._key(key), self._dumps(value), px=max(1, int(ttl * 1000))
+            )
+        except self._errors as e:
+            print(f"[cache] Redis write failed: {e!r}")
+
+    def delete(self, *keys) -> None:
+        if not keys:
+            return
+        try:
+            self._call(self.client.delete, *(self._key(key) for key in keys))
+        except self._errors as e:
+            print(f"[cache] Redis invalidation failed: {e!r}")
+
+    def _scan(self) -> list:
+        return list(self.client.scan_iter(match=f"{self.prefix}*", count=500))
+
+    def clear(self) -> None:
+        try:
+            keys = self._call(self._scan)
+            for start in range(0, len(keys), 500):
+                self._call(self.client.delete, *keys[start:start + 500])
+        except self._errors as e:
+            print(f"[cache] Redis invalidation failed: {e!r}")
+
+
+class InstrumentedCache:
+    """Counts hits and misses of another cache into tyres_cache_lookups_total."""
+
+    def __init__(self, backend, name: str):
+        self.backend = backend
+        self._hit = CACHE_LOOKUPS.labels(name, "hit")
+        self._miss = CACHE_LOOKUPS.labels(name, "miss")
+
+    def get(self, key, default=None):
+        found = self.get_many([key])
+        return found.get(key, default)
+
+    def get_many(self, keys) -> dict:
+        keys = list(keys)
+        found = self.backend.get_many(keys)
+        self._hit.inc(len(found))
+        self._miss.inc(len(keys) - len(found))
+        return found
+
+    @property
+    def blocks(self) -> bool:
+        """True if calls wait on the network (run them off the event loop)."""
+        return self.backend.blocks
+
+    def set(self, key, value, ttl: float = None) -> None:
+        self.backend.set(key, value, ttl)
+
+    def delete(self, *keys) -> None:
+        self.backend.delete(*keys)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+
+# Cached tyres are plain column dicts; Decimals travel through Redis as
+# strings and are restored on the way out.
+TYRE_DECIMAL_FIELDS = ("cost", "retail_cost")
+
+
+def dump_tyre(tyre: dict) -> str:
+    return json.dumps(tyre, default=str)
+
+
+def load_tyre(raw) -> dict:
+    tyre = json.loads(raw)
+    for field in TYRE_DECIMAL_FIELDS:
+        if tyre.get(field) is not None:
+            tyre[field] = Decimal(tyre[field])
+    return tyre
+
+
+def make_tyre_cache(backend: str = TYRE_CACHE_BACKEND):
+    if backend == "off":
+        return InstrumentedCache(NullCache(), "tyre")
+    if backend == "redis":
+        import redis
+
+        client = redis.Redis.from_url(REDIS_URL)
+        return InstrumentedCache(
+            RedisCache(client, "tyres:tyre:", TYRE_CACHE_TTL, dump_tyre, load_tyre,
+                       errors=(redis.RedisError, OSError)),
+            "tyre",
+        )
+    if backend == "memory":
+        return InstrumentedCache(TTLCache(maxsize=TYRE_CACHE_SIZE, ttl=TYRE_CACHE_TTL), "tyre")
+    raise ValueError(f"Unknown TYRE_CACHE_BACKEND {backend!r}")
+
+
+# Tyre column dicts keyed by id (see crud.load_tyres).
+tyre_cache = make_tyre_cache()
+
+
+# Caches derived from the whole catalogue (search index, facets) register
+# here to be dropped on any tyre write in this process.
+_write_listeners = []
+
+
+def on_tyre_write(listener):
+    _write_listeners.append(listener)
+    return listener
+
+
+# Facet counts per filter combination (see crud.tyre_facets).
+facet_cache = InstrumentedCache(TTLCache(maxsize=256, ttl=FACET_CACHE_TTL), "facets")
+on_tyre_write(facet_cache.clear)
+
+
+def invalidate_tyres(*tyre_ids: int) -> None:
+    """Drop cached tyres after a write; with no ids, drop everything."""
+    if tyre_ids:
+        tyre_cache.delete(*tyre_ids)
+    else:
+        tyre_cache.clear()
+    for listener in _write_listeners:
+        listener()
@@ -0,0 +1,1318 @@
+# backend/tyres_service/crud.py
+# Tyre reads and writes against a synchronous Session. The HTTP handlers
+# in main.py call these through database.run_db, which runs them on the
+# threadpool (sync engine) or inside AsyncSession.run_sync (ASYNC_DB),
+# so both modes share one implementation.
+import math
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import case, delete, func, insert, literal, select, tuple_, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.cache import facet_cache, invalidate_tyres, tyre_cache
+from app.database import dialect_insert
+from app.models import (
+    CHANGE_SEQ, TYRE_NATURAL_KEY, LocationModel, OutboxModel, PricingRuleModel, ReservationModel,
+    TyreLocationStockModel, TyreModel, TyreStockShardModel, TyreTombstoneModel,
+)
+from app.pricing import RULE_FIELDS, drop_pricing_rules, pricing_rules
+from app.schemas import (
+    LocationCreate, PricingRuleIn, StockAdjustLine, TyreCreate, TyreFilters, TyreSchema,
+    TyreUpdate,
+)
+
+# Bulk imports are upserted in multi-row statements of this many rows.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+
+# A tyre's stock: its own quantity plus, when sharded, its slots. The
+# CASE keeps the slot lookup off the path of unsharded tyres.
+TYRE_STOCK = case(
+    (
+        TyreModel.shards > 0,
+        TyreModel.quantity
+        + select(func.coalesce(func.sum(TyreStockShardModel.quantity), 0))
+        .where(TyreStockShardModel.tyre_id == TyreModel.id)
+        .correlate(TyreModel)
+        .scalar_subquery(),
+    ),
+    else_=TyreModel.quantity,
+)
+
+# What reads return (and the tyre cache holds per id): every column, with
+# quantity as the tyre's total stock.
+TYRE_FIELDS = {
+    column.key: TYRE_STOCK.label("quantity") if column.key == "quantity" else column
+    for column in TyreModel.__table__.c
+}
+TYRE_COLUMNS = tuple(TYRE_FIELDS.values())
+
+# Stock holds expire after RESERVATION_TTL seconds unless the request
+# asks for less; the sweeper returns expired holds in batches this size.
+RESERVATION_TTL = int(os.getenv("RESERVATION_TTL", "900"))
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", "500"))
+RESERVATION_COLUMNS = tuple(ReservationModel.__table__.c)
+
+# Repricing applies the pricing rules to this many tyres per UPDATE,
+# each chunk in its own transaction.
+REPRICE_CHUNK_SIZE = int(os.getenv("REPRICE_CHUNK_SIZE", "1000"))
+PRICING_RULE_COLUMNS = tuple(PricingRuleModel.__table__.c)
+
+
+def commit_or_rollback(db: Session, msg: str):
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=msg)
+    except StaleDataError:
+        # version_id_col: the row changed between our read and our write
+        db.rollback()
+        raise HTTPException(status_code=412, detail="Tyre was modified concurrently")
+
+
+def execute_write(db: Session, stmt, msg: str):
+    """Run a single-statement write ... RETURNING; the row, or None if no
+    row matched. Constraint violations become 409 as in commit_or_rollback."""
+    try:
+        return db.execute(stmt).one_or_none()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=msg)
+
+
+def write_failed(db: Session, tyre_id: int, status_code: int, detail: str):
+    """Explain a write that matched no row: 404 if the tyre is gone,
+    otherwise the caller's status. Only failed writes pay for this query."""
+    db.rollback()
+    if db.execute(select(TyreModel.id).where(TyreModel.id == tyre_id)).first() is None:
+        return HTTPException(status_code=404, detail="Tyre not found")
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def write_stamp(db: Session) -> dict:
+    """Columns every Core write to a tyre row sets: the next version (the
+    ETag) and a fresh change feed position."""
+    return {"version": TyreModel.version + 1, "change_seq": next_change_seq(db)}
+
+
+def filter_tyres(stmt, filters: TyreFilters):
+    if filters.brand is not None:
+        stmt = stmt.where(TyreModel.brand == filters.brand)
+    if filters.size is not None:
+        stmt = stmt.where(TyreModel.size == filters.size)
+    if filters.season is not None:
+        stmt = stmt.where(TyreModel.season == filters.season)
+    if filters.speed_rate is not None:
+        stmt = stmt.where(TyreModel.speed_rate == filters.speed_rate)
+    if filters.ev_approved is not None:
+        stmt = stmt.where(TyreModel.ev_approved == filters.ev_approved)
+    if filters.min_price is not None:
+        stmt = stmt.where(TyreModel.retail_cost >= filters.min_price)
+    if filters.max_price is not None:
+        stmt = stmt.where(TyreModel.retail_cost <= filters.max_price)
+    if filters.in_stock:
+        stmt = stmt.where(TYRE_STOCK > TyreModel.reserved)
+    return stmt
+
+
+# Sidebar facets, counted in one GROUP BY over their combined values.
+FACET_FIELDS = ("brand", "season", "speed_rate", "fuel_efficiency", "weather_efficiency",
+                "ev_approved")
+
+
+def tyre_facets(db: Session, filters: TyreFilters) -> dict:
+    """Value counts per facet plus the retail_cost range, for the tyres
+    matching filters. Cached until the next local write or FACET_CACHE_TTL."""
+    key = tuple(filters.model_dump().items())
+    cached = facet_cache.get(key)
+    if cached is not None:
+        return cached
+
+    columns = [getattr(TyreModel, field) for field in FACET_FIELDS]
+    stmt = filter_tyres(
+        select(
+            *columns,
+            func.count().label("count"),
+            func.min(TyreModel.retail_cost).label("min_price"),
+            func.max(TyreModel.retail_cost).label("max_price"),
+        ),
+        filters,
+    ).group_by(*columns)
+
+    counts = {field: {} for field in FACET_FIELDS}
+    total = 0
+    low = high = None
+    for row in db.execute(stmt):
+        total += row.count
+        low = row.min_price if low is None else min(low, row.min_price)
+        high = row.max_price if high is None else max(high, row.max_price)
+        for field in FACET_FIELDS:
+            value = getattr(row, field)
+            counts[field][value] = counts[field].get(value, 0) + row.count
+
+    facets = {
+        "total": total,
+        "retail_cost": {"min": low, "max": high},
+        "facets": {
+            field: [
+                {"value": value, "count": count}
+                for value, count in sorted(
+                    values.items(), key=lambda item: (-item[1], str(item[0]))
+                )
+            ]
+            for field, values in counts.items()
+        },
+    }
+    facet_cache.set(key, facets)
+    return facets
+
+
+def create_tyre(db: Session, payload: TyreCreate):
+    data = payload.model_dump()
+
+    data["retail_cost"] = pricing_rules(db).retail_price(data)
+
+    stmt = insert(TyreModel).values(**data, change_seq=next_change_seq(db)).returning(
+        *TYRE_COLUMNS
+    )
+    tyre = execute_write(db, stmt, "Tyre could not be created")
+    commit_or_rollback(db, "Tyre could not be created")
+    invalidate_tyres(tyre.id)
+    return tyre
+
+
+def list_tyres(db: Session, filters: TyreFilters, after, limit: int):
+    """One keyset page of column rows; returns (rows, next_cursor or None)."""
+    stmt = filter_tyres(select(*TYRE_COLUMNS), filters)
+    if after is not None:
+        stmt = stmt.where(TyreModel.id > after)
+    # One extra row tells us whether another page exists.
+    stmt = stmt.order_by(TyreModel.id).limit(limit + 1)
+    tyres = db.execute(stmt).all()
+
+    if len(tyres) > limit:
+        tyres = tyres[:limit]
+        return tyres, tyres[-1].id
+    return tyres, None
+
+
+def fetch_tyres(db: Session, tyre_ids) -> dict:
+    """{id: column dict} for the ids that exist, in one IN query; cached."""
+    found = {}
+    rows = db.execute(select(*TYRE_COLUMNS).where(TyreModel.id.in_(tyre_ids)))
+    for row in rows.mappings():
+        found[row["id"]] = tyre = dict(row)
+        tyre_cache.set(row["id"], tyre)
+    return found
+
+
+def load_tyres(db: Session, tyre_ids) -> dict:
+    """Read-through lookup: cache hits cost no query, misses are fetched.
+
+    Writers invalidate, so a stale entry can only come from a read racing
+    a write, and lives at most TYRE_CACHE_TTL seconds.
+    """
+    found = tyre_cache.get_many(tyre_ids)
+    misses = [tyre_id for tyre_id in tyre_ids if tyre_id not in found]
+    if misses:
+        found.update(fetch_tyres(db, misses))
+    return found
+
+
+def get_tyre(db: Session, tyre_id: int) -> dict:
+    tyre = load_tyres(db, [tyre_id]).get(tyre_id)
+    if tyre is None:
+        raise HTTPException(status_code=404, detail="Tyre not found")
+    return tyre
+
+
+def update_tyre_fields(db: Session, tyre_id: int, data: dict, expected_version=None):
+    """UPDATE ... RETURNING in one statement. With expected_version
+    (If-Match), a row that has moved on is not matched and answers 412."""
+    stmt = update(TyreModel).where(TyreModel.id == tyre_id)
+    if expected_version is not None:
+        stmt = stmt.where(TyreModel.version == expected_version)
+    if "quantity" in data:
+        stmt = stmt.where(TyreModel.located <= data["quantity"])
+    stmt = stmt.values(**data, **write_stamp(db)).returning(*TYRE_COLUMNS)
+
+    tyre = execute_write(db, stmt, "Failed to update tyre")
+    if tyre is None and "quantity" in data and unassign_stock(
+        db, tyre_id, literal(data["quantity"]), reserved_after=None
+    ):
+        tyre = execute_write(db, stmt, "Failed to update tyre")
+    if tyre is None:
+        raise write_failed(db, tyre_id, 412, "Tyre has been modified")
+    if tyre.shards and "quantity" in data:
+        # The new quantity is the tyre's total: spread it over its slots.
+        spread_stock(db, tyre_id, data["quantity"], tyre.shards)
+        tyre = db.execute(select(*TYRE_COLUMNS).where(TyreModel.id == tyre_id)).one()
+    changes = [key for field, key in CHANGE_EVENTS.items() if field in data]
+    if changes:
+        record_changes(db, [tyre_id], *changes)
+    commit_or_rollback(db, "Failed to update tyre")
+    invalidate_tyres(tyre_id)
+    return tyre
+
+
+def update_tyre_put(db: Session, tyre_id: int, payload: TyreSchema, expected_version=None):
+    data = payload.model_dump()
+    data.pop("retail_cost", None)
+
+    data["retail_cost"] = pricing_rules(db).retail_price(data)
+
+    return update_tyre_fields(db, tyre_id, data, expected_version)
+
+
+def update_tyre_patch(db: Session, tyre_id: int, payload: TyreUpdate, expected_version=None):
+    update_data = payload.model_dump(exclude_unset=True)
+    update_data.pop("retail_cost", None)  # cannot be changed manually
+
+    rules = pricing_rules(db)
+    if "cost" in update_data or rules.fields & update_data.keys():
+        # Priced in the UPDATE itself, from the new values where given and
+        # the row's own otherwise.
+        if "cost" in update_data:
+            cost = literal(update_data["cost"], TyreModel.cost.type)
+        else:
+            cost = TyreModel.cost
+        fields = {
+            field: literal(update_data[field]) for field in RULE_FIELDS if field in update_data
+        }
+        update_data["retail_cost"] = rules.retail_cost_sql(cost, fields)
+
+    return update_tyre_fields(db, tyre_id, update_data, expected_version)
+
+
+def adjust_stock(db: Session, tyre_id: int, delta: int):
+    if delta == 0:
+        raise HTTPException(status_code=400, detail="Delta must not be zero")
+
+    stmt = (
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .where(TyreModel.shards == 0)
+        .where(TyreModel.quantity + delta >= TyreModel.reserved)
+        .where(TyreModel.quantity + delta >= TyreModel.located)
+        .values(quantity=TyreModel.quantity + delta, **write_stamp(db))
+        .returning(*TYRE_COLUMNS)
+    )
+    tyre = db.execute(stmt).one_or_none()
+
+    if tyre is None:
+        if adjust_sharded_stock(db, tyre_id, delta):
+            tyre = db.execute(select(*TYRE_COLUMNS).where(TyreModel.id == tyre_id)).one()
+        elif unassign_stock(db, tyre_id, TyreModel.quantity + delta):
+            tyre = db.execute(stmt).one()
+        else:
+            raise write_failed(db, tyre_id, 409, "Not enough stock")
+
+    record_changes(db, [tyre_id], STOCK_CHANGED)
+    db.commit()
+    invalidate_tyres(tyre_id)
+    return tyre
+
+
+def adjust_stock_batch(db: Session, items: list[StockAdjustLine]):
+    if any(line.delta == 0 for line in items):
+        raise HTTPException(status_code=400, detail="Delta must not be zero")
+
+    deltas: dict[int, int] = {}
+    for line in items:
+        deltas[line.tyre_id] = deltas.get(line.tyre_id, 0) + line.delta
+
+    updated = []
+    failed_ids = []
+    for tyre_id in sorted(deltas):
+        delta = deltas[tyre_id]
+        stmt = (
+            update(TyreModel)
+            .where(TyreModel.id == tyre_id)
+            .where(TyreModel.shards == 0)
+            .where(TyreModel.quantity + delta >= TyreModel.reserved)
+            .where(TyreModel.quantity + delta >= TyreModel.located)
+            .values(quantity=TyreModel.quantity + delta, **write_stamp(db))
+            .returning(TyreModel.id, TyreModel.quantity)
+        )
+        row = db.execute(stmt).one_or_none()
+        if row is None and adjust_sharded_stock(db, tyre_id, delta):
+            row = db.execute(
+                select(TyreModel.id, TYRE_STOCK.label("quantity")).where(TyreModel.id == tyre_id)
+            ).one()
+        elif row is None and unassign_stock(db, tyre_id, TyreModel.quantity + delta):
+            row = db.execute(stmt).one()
+        if row is None:
+            failed_ids.append(tyre_id)
+        else:
+            updated.append({"tyre_id": row.id, "quantity": row.quantity})
+
+    if failed_ids:
+        db.rollback()
+        existing = set(
+            db.execute(select(TyreModel.id).where(TyreModel.id.in_(failed_ids))).scalars()
+        )
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Stock batch rejected",
+                "failed": [
+                    {
+                        "tyre_id": tyre_id,
+                        "reason": "Not enough stock" if tyre_id in existing else "Tyre not found",
+                    }
+                    for tyre_id in failed_ids
+                ],
+            },
+        )
+
+    record_changes(db, list(deltas), STOCK_CHANGED)
+    db.commit()
+    invalidate_tyres(*deltas)
+    return updated
+
+
+def import_tyres(db: Session, rows: list) -> dict:
+    by_key: dict[tuple, dict] = {}
+    numbers: dict[tuple, int] = {}
+    errors = []
+    rules = pricing_rules(db)
+    for number, row in enumerate(rows, start=1):
+        try:
+            data = TyreCreate.model_validate(row).model_dump()
+        except ValidationError as exc:
+            errors.append(
+                {"row": number, "errors": exc.errors(include_url=False, include_context=False)}
+            )
+            continue
+        data["retail_cost"] = rules.retail_price(data)
+        key = tuple(data[field] for field in TYRE_NATURAL_KEY)
+        by_key[key], numbers[key] = data, number
+
+    values = list(by_key.values())
+    skipped = []
+    imported = []
+    insert = dialect_insert(db.get_bind())
+    for start in range(0, len(values), IMPORT_CHUNK_SIZE):
+        chunk = values[start:start + IMPORT_CHUNK_SIZE]
+        seqs = change_seqs(db, len(chunk))
+        stmt = insert(TyreModel).values(
+            [{**row, "change_seq": seq} for row, seq in zip(chunk, seqs)]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(TYRE_NATURAL_KEY),
+            set_={
+                **{
+                    name: stmt.excluded[name]
+                    for name in [*values[0], "change_seq"]
+                    if name not in TYRE_NATURAL_KEY
+                },
+                "version": TyreModel.version + 1,
+            },
+            # An import sets the total; it must leave room for held and
+            # location stock.
+            where=(TyreModel.reserved <= stmt.excluded.quantity)
+            & (TyreModel.located <= stmt.excluded.quantity),
+        ).returning(
+            TyreModel.id, TyreModel.shards, TyreModel.quantity,
+            *(getattr(TyreModel, field) for field in TYRE_NATURAL_KEY),
+        )
+        upserted = db.execute(stmt).all()
+        if len(upserted) < len(chunk):
+            written = {
+                tuple(getattr(row, field) for field in TYRE_NATURAL_KEY) for row in upserted
+            }
+            skipped.extend(_import_conflicts(db, [
+                row for row in chunk
+                if tuple(row[field] for field in TYRE_NATURAL_KEY) not in written
+            ]))
+        for row in upserted:
+            if row.shards:
+                spread_stock(db, row.id, row.quantity, row.shards)
+        record_changes(db, [row.id for row in upserted], STOCK_CHANGED, PRICE_CHANGED)
+        imported.extend(row.id for row in upserted)
+
+    # An import runs long, while other writers take and commit later
+    # positions: had its rows kept the positions taken as the chunks ran,
+    # a feed reader could step past them before this commit made them
+    # visible. Fresh ones taken now are as late as any single write's.
+    imported.sort()
+    for start in range(0, len(imported), IMPORT_CHUNK_SIZE):
+        ids = imported[start:start + IMPORT_CHUNK_SIZE]
+        db.execute(
+            update(TyreModel)
+            .where(TyreModel.id.in_(ids))
+            .values(change_seq=row_change_seqs(db, ids[0] - 1))
+        )
+    commit_or_rollback(db, "Tyres could not be imported")
+    invalidate_tyres()
+
+    for row, row_errors in skipped:
+        errors.append({
+            "row": numbers[tuple(row[field] for field in TYRE_NATURAL_KEY)],
+            "errors": row_errors,
+        })
+    errors.sort(key=lambda error: error["row"])
+    return {"received": len(rows), "upserted": len(values) - len(skipped), "errors": errors}
+
+
+def _import_conflicts(db: Session, rows: list) -> list:
+    """[(row, errors)] for import rows whose tyre holds more stock than the
+    row's quantity. Read in the import's transaction, where the upsert
+    has already locked those tyres."""
+    key = tuple_(*(getattr(TyreModel, field) for field in TYRE_NATURAL_KEY))
+    held = {
+        tuple(tyre[:-2]): tyre[-2:]
+        for tyre in db.execute(
+            select(
+                *(getattr(TyreModel, field) for field in TYRE_NATURAL_KEY),
+                TyreModel.reserved, TyreModel.located,
+            ).where(key.in_([tuple(row[field] for field in TYRE_NATURAL_KEY) for row in rows]))
+        )
+    }
+    conflicts = []
+    for row in rows:
+        reserved, located = held[tuple(row[field] for field in TYRE_NATURAL_KEY)]
+        row_errors = []
+        if reserved > row["quantity"]:
+            row_errors.append({
+                "type": "reserved_stock",
+                "loc": ["quantity"],
+                "msg": "Quantity is below the stock reserved",
+                "input": row["quantity"],
+            })
+        if located > row["quantity"]:
+            row_errors.append({
+                "type": "located_stock",
+                "loc": ["quantity"],
+                "msg": "Quantity is below the stock held at locations",
+                "input": row["quantity"],
+            })
+        conflicts.append((row, row_errors))
+    return conflicts
+
+
+def delete_tyre(db: Session, tyre_id: int) -> None:
+    # Taken before the DELETE: on SQLite a position is one past the
+    # highest in use, and the tyre may hold that one.
+    [seq] = change_seqs(db, 1)
+    stmt = delete(TyreModel).where(TyreModel.id == tyre_id).returning(TyreModel.id)
+    if execute_write(db, stmt, "Tyre could not be deleted") is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Tyre not found")
+
+    db.execute(
+        insert(TyreTombstoneModel).values(tyre_id=tyre_id, change_seq=seq)
+    )
+    commit_or_rollback(db, "Tyre could not be deleted")
+    invalidate_tyres(tyre_id)
+
+
+# -----------------------------
+# Reservations
+# A hold moves units from available (quantity - reserved) to reserved with
+# one conditional UPDATE, so concurrent holds can never oversell. Confirm
+# turns the hold into a sale (quantity and reserved both drop); release
+# and expiry hand the units back. A reservation leaves "held" exactly
+# once, guarded by "WHERE status = 'held'".
+# -----------------------------
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def hold_stock(db: Session, tyre_id: int, quantity: int, ttl_seconds=None):
+    stmt = (
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .where(TyreModel.shards == 0)
+        .where(TyreModel.quantity - TyreModel.reserved >= quantity)
+        .values(reserved=TyreModel.reserved + quantity, **write_stamp(db))
+        .returning(TyreModel.id)
+    )
+    if db.execute(stmt).first() is None:
+        db.rollback()
+        shards = db.execute(
+            select(TyreModel.shards).where(TyreModel.id == tyre_id)
+        ).scalar_one_or_none()
+        if shards is None:
+            raise HTTPException(status_code=404, detail="Tyre not found")
+        if shards:
+            raise HTTPException(status_code=409, detail="Sharded stock cannot be reserved")
+        raise HTTPException(status_code=409, detail="Not enough stock available")
+
+    reservation = db.execute(
+        insert(ReservationModel)
+        .values(
+            tyre_id=tyre_id,
+            quantity=quantity,
+            status="held",
+            expires_at=utcnow() + timedelta(seconds=ttl_seconds or RESERVATION_TTL),
+        )
+        .returning(*RESERVATION_COLUMNS)
+    ).one()
+    record_changes(db, [tyre_id], STOCK_CHANGED)
+    db.commit()
+    invalidate_tyres(tyre_id)
+    return reservation
+
+
+def get_reservation(db: Session, reservation_id: int):
+    reservation = db.execute(
+        select(*RESERVATION_COLUMNS).where(ReservationModel.id == reservation_id)
+    ).one_or_none()
+    if reservation is None:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return reservation
+
+
+def _close_reservation(db: Session, reservation_id: int, status: str, unexpired_only: bool):
+    stmt = (
+        update(ReservationModel)
+        .where(ReservationModel.id == reservation_id)
+        .where(ReservationModel.status == "held")
+    )
+    if unexpired_only:
+        stmt = stmt.where(ReservationModel.expires_at > utcnow())
+    reservation = db.execute(
+        stmt.values(status=status).returning(*RESERVATION_COLUMNS)
+    ).one_or_none()
+
+    if reservation is None:
+        db.rollback()
+        current = get_reservation(db, reservation_id)
+        if current.status == "held":
+            raise HTTPException(status_code=409, detail="Reservation has expired")
+        raise HTTPException(status_code=409, detail=f"Reservation is already {current.status}")
+    return reservation
+
+
+def confirm_reservation(db: Session, reservation_id: int):
+    reservation = _close_reservation(db, reservation_id, "confirmed", unexpired_only=True)
+    stmt = (
+        update(TyreModel)
+        .where(TyreModel.id == reservation.tyre_id)
+        .where(TyreModel.quantity - reservation.quantity >= TyreModel.located)
+        .values(
+            quantity=TyreModel.quantity - reservation.quantity,
+            reserved=TyreModel.reserved - reservation.quantity,
+            **write_stamp(db),
+        )
+        .returning(TyreModel.id)
+    )
+    if db.execute(stmt).first() is None:
+        # The held units are at locations: the sale takes them from there.
+        unassign_stock(
+            db,
+            reservation.tyre_id,
+            TyreModel.quantity - reservation.quantity,
+            reserved_after=TyreModel.reserved - reservation.quantity,
+        )
+        db.execute(stmt).one()
+    record_changes(db, [reservation.tyre_id], STOCK_CHANGED)
+    db.commit()
+    invalidate_tyres(reservation.tyre_id)
+    return reservation
+
+
+def release_reservation(db: Session, reservation_id: int):
+    reservation = _close_reservation(db, reservation_id, "released", unexpired_only=False)
+    db.execute(
+        update(TyreModel)
+        .where(TyreModel.id == reservation.tyre_id)
+        .values(
+            reserved=TyreModel.reserved - reservation.quantity,
+            **write_stamp(db),
+        )
+    )
+    record_changes(db, [reservation.tyre_id], STOCK_CHANGED)
+    db.commit()
+    invalidate_tyres(reservation.tyre_id)
+    return reservation
+
+
+def tyre_availability(db: Session, tyre_id: int) -> dict:
+    row = db.execute(
+        select(TYRE_STOCK.label("quantity"), TyreModel.reserved).where(TyreModel.id == tyre_id)
+    ).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Tyre not found")
+    return {
+        "tyre_id": tyre_id,
+        "quantity": row.quantity,
+        "reserved": row.reserved,
+        "available": row.quantity - row.reserved,
+    }
+
+
+def expire_reservations(db: Session, batch_size: int = RESERVATION_SWEEP_BATCH, now=None) -> int:
+    """Expire up to batch_size overdue holds in one transaction and return
+    their units; returns how many were expired. SKIP LOCKED (Postgres) lets
+    several sweepers share the backlog; a hold being confirmed or released
+    concurrently fails the status re-check and is left alone.
+    """
+    due = (
+        select(ReservationModel.id)
+        .where(ReservationModel.status == "held")
+        .where(ReservationModel.expires_at <= (now or utcnow()))
+        .order_by(ReservationModel.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    expired = db.execute(
+        update(ReservationModel)
+        .where(ReservationModel.id.in_(due))
+        .where(ReservationModel.status == "held")
+        .values(status="expired")
+        .returning(ReservationModel.tyre_id, ReservationModel.quantity)
+    ).all()
+
+    released: dict[int, int] = {}
+    for row in expired:
+        released[row.tyre_id] = released.get(row.tyre_id, 0) + row.quantity
+    # Tyre rows in id order, the lock order every batch writer uses.
+    for tyre_id in sorted(released):
+        db.execute(
+            update(TyreModel)
+            .where(TyreModel.id == tyre_id)
+            .values(
+                reserved=TyreModel.reserved - released[tyre_id],
+                **write_stamp(db),
+            )
+        )
+    if released:
+        record_changes(db, sorted(released), STOCK_CHANGED)
+    db.commit()
+    if released:
+        invalidate_tyres(*released)
+    return len(expired)
+
+
+# -----------------------------
+# Sharded stock
+# A hot tyre's stock can be split over N slot rows so concurrent sales
+# update different rows instead of queueing on one row lock. A decrement
+# takes the first slot (from a random start) that covers it, skipping
+# slots other transactions hold; only when no single slot can cover it
+# are all slots locked and drained. Slots never go below zero, so the
+# total cannot either. Sharded tyres cannot be reserved, and their stock
+# moves do not bump the tyre's version (that would recreate the hot row).
+# -----------------------------
+def spread_stock(db: Session, tyre_id: int, total: int, count: int) -> None:
+    """Set a tyre's stock to total, spread over count slots (0: unsharded)."""
+    db.execute(delete(TyreStockShardModel).where(TyreStockShardModel.tyre_id == tyre_id))
+    if count:
+        share, extra = divmod(total, count)
+        db.execute(
+            insert(TyreStockShardModel),
+            [
+                {"tyre_id": tyre_id, "slot": slot, "quantity": share + (slot < extra)}
+                for slot in range(count)
+            ],
+        )
+    db.execute(
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .values(quantity=0 if count else total, shards=count)
+    )
+
+
+def set_stock_shards(db: Session, tyre_id: int, count: int):
+    tyre = db.execute(
+        select(TyreModel.quantity, TyreModel.reserved, TyreModel.shards, TyreModel.located)
+        .where(TyreModel.id == tyre_id)
+        .with_for_update()
+    ).one_or_none()
+    if tyre is None:
+        raise HTTPException(status_code=404, detail="Tyre not found")
+    if count and tyre.reserved:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Release reservations before sharding stock")
+    if count and tyre.located:
+        db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Move location stock to unassigned before sharding stock"
+        )
+
+    slots = db.execute(
+        select(TyreStockShardModel.quantity)
+        .where(TyreStockShardModel.tyre_id == tyre_id)
+        .with_for_update()
+    ).scalars().all()
+    # Taken before spread_stock deletes the slots, which may hold the
+    # highest position (see delete_tyre).
+    [seq] = change_seqs(db, 1)
+    spread_stock(db, tyre_id, tyre.quantity + sum(slots), count)
+    db.execute(
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .values(version=TyreModel.version + 1, change_seq=seq)
+    )
+    tyre = db.execute(select(*TYRE_COLUMNS).where(TyreModel.id == tyre_id)).one()
+    db.commit()
+    invalidate_tyres(tyre_id)
+    return tyre
+
+
+def adjust_sharded_stock(db: Session, tyre_id: int, delta: int, retry: bool = True) -> bool:
+    """Apply delta to a sharded tyre's slots. False if the tyre is not
+    sharded (or does not exist) or its slots hold too little stock.
+
+    A tyre un-sharded (or re-sharded) by a concurrent writer after its
+    shard count was read has no slots left to lock here: delta then goes
+    wherever the stock is now, the tyre row or the new slots."""
+    shards = db.execute(
+        select(TyreModel.shards).where(TyreModel.id == tyre_id)
+    ).scalar_one_or_none()
+    if not shards:
+        return False
+
+    slot = TyreStockShardModel
+    start = random.randrange(shards)
+    pick = (
+        select(slot.slot)
+        .where(slot.tyre_id == tyre_id)
+        .where(slot.quantity + delta >= 0)
+        .order_by((slot.slot + shards - start) % shards)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .correlate(None)
+    )
+    picked = db.execute(
+        update(slot)
+        .where(slot.tyre_id == tyre_id)
+        .where(slot.slot == pick.scalar_subquery())
+        .where(slot.quantity + delta >= 0)
+        .values(quantity=slot.quantity + delta, change_seq=next_change_seq(db))
+        .returning(slot.slot)
+    ).first()
+    if picked is not None:
+        return True
+
+    # Every covering slot is busy, or none covers delta on its own: lock
+    # them all (in slot order) and take from the fullest first.
+    rows = db.execute(
+        select(slot.slot, slot.quantity)
+        .where(slot.tyre_id == tyre_id)
+        .order_by(slot.slot)
+        .with_for_update()
+    ).all()
+    if not rows:
+        moved = db.execute(
+            update(TyreModel)
+            .where(TyreModel.id == tyre_id)
+            .where(TyreModel.shards == 0)
+            .where(TyreModel.quantity + delta >= TyreModel.reserved)
+            .where(TyreModel.quantity + delta >= TyreModel.located)
+            .values(quantity=TyreModel.quantity + delta, **write_stamp(db))
+            .returning(TyreModel.id)
+        ).first()
+        if moved is not None:
+            return True
+        return retry and adjust_sharded_stock(db, tyre_id, delta, retry=False)
+    if sum(row.quantity for row in rows) + delta < 0:
+        return False
+    remaining = delta
+    for row in sorted(rows, key=lambda row: row.quantity, reverse=True):
+        change = remaining if remaining > 0 else max(remaining, -row.quantity)
+        db.execute(
+            update(slot)
+            .where(slot.tyre_id == tyre_id)
+            .where(slot.slot == row.slot)
+            .values(quantity=slot.quantity + change, change_seq=next_change_seq(db))
+        )
+        remaining -= change
+        if remaining == 0:
+            break
+    return remaining == 0
+
+
+# -----------------------------
+# Outbox
+# Every stock or price change queues an event row in the transaction that
+# makes it, so an event is published if and only if its change commits
+# (app/outbox_publisher.py relays them). Rows snapshot quantity (total
+# stock), reserved, retail_cost and version as the writing transaction
+# sees them. Writers to a tyre queue on its row lock, so outbox ids follow
+# each tyre's commit order; sharded stock moves skip that lock, so two
+# concurrent sales of a sharded tyre may snapshot in either order.
+# -----------------------------
+STOCK_CHANGED = "tyre.stock.changed"
+PRICE_CHANGED = "tyre.price.changed"
+# Written field -> event it triggers (update_tyre_fields).
+CHANGE_EVENTS = {"quantity": STOCK_CHANGED, "retail_cost": PRICE_CHANGED}
+
+
+def record_changes(db: Session, tyre_ids, *routing_keys: str) -> None:
+    """Queue one event per tyre and routing key, in one INSERT ... SELECT."""
+    sources = [
+        select(
+            literal(routing_key).label("routing_key"),
+            TyreModel.id,
+            TYRE_STOCK,
+            TyreModel.reserved,
+            TyreModel.retail_cost,
+            TyreModel.version,
+        )
+        .where(TyreModel.id.in_(tyre_ids))
+        for routing_key in routing_keys
+    ]
+    db.execute(
+        insert(OutboxModel).from_select(
+            ["routing_key", "tyre_id", "quantity", "reserved", "retail_cost", "version"],
+            sources[0] if len(sources) == 1 else union_all(*sources),
+        )
+    )
+
+
+# -----------------------------
+# Change feed
+# Tyre rows, stock slots and tombstones carry change_seq, a position in
+# one catalogue-wide sequence taken by every write, so a client holding
+# the last position it saw can fetch just what changed since. Positions
+# are taken when a write runs, not when it commits; writes commit
+# straight after, which keeps the window for two of them to commit out
+# of order (and a reader to step past the earlier one) narrow.
+# -----------------------------
+_LATEST_CHANGE_SEQ = union_all(
+    *(
+        select(func.max(model.change_seq).label("seq")).correlate(None)
+        for model in (TyreModel, TyreStockShardModel, TyreTombstoneModel)
+    )
+).subquery()
+
+
+def next_change_seq(db: Session):
+    """SQL for a fresh change feed position."""
+    if db.get_bind().dialect.name == "postgresql":
+        return CHANGE_SEQ.next_value()
+    # Elsewhere (SQLite) writers are serialized, so one past the highest
+    # position in use is free. Writes that DELETE rows fix theirs first
+    # (change_seqs): once a row is gone its position would be handed out
+    # again.
+    return select(
+        func.coalesce(func.max(_LATEST_CHANGE_SEQ.c.seq), 0) + 1
+    ).scalar_subquery()
+
+
+def change_seqs(db: Session, count: int) -> list:
+    """count distinct positions for the rows of one multi-row statement."""
+    if db.get_bind().dialect.name == "postgresql":
+        return [CHANGE_SEQ.next_value()] * count
+    first = db.execute(select(next_change_seq(db))).scalar_one()
+    return list(range(first, first + count))
+
+
+def tyre_changes(db: Session, since: int, limit: int) -> dict:
+    """Tyres written and tyres deleted after position since, oldest first:
+    the latest event of each tyre among the next limit events, plus the
+    position to ask from next time and whether events remain past it.
+    Each source is an index range scan on change_seq."""
+    slot = TyreStockShardModel
+    sources = [
+        select(*TYRE_COLUMNS, TyreModel.change_seq.label("seq"))
+        .where(TyreModel.change_seq > since)
+        .order_by(TyreModel.change_seq),
+        # A sharded tyre's stock moves only touch its slots.
+        select(*TYRE_COLUMNS, slot.change_seq.label("seq"))
+        .join(slot, slot.tyre_id == TyreModel.id)
+        .where(slot.change_seq > since)
+        .order_by(slot.change_seq),
+        select(TyreTombstoneModel.tyre_id.label("id"), TyreTombstoneModel.change_seq.label("seq"))
+        .where(TyreTombstoneModel.change_seq > since)
+        .order_by(TyreTombstoneModel.change_seq),
+    ]
+    # One extra event tells us whether more remain: pages collapse to one
+    # entry per tyre, so a page's length says nothing about that.
+    events = sorted(
+        (row for stmt in sources for row in db.execute(stmt.limit(limit + 1)).mappings()),
+        key=lambda row: row["seq"],
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    # Only the latest event per tyre matters: a write, or its deletion.
+    latest = {row["id"]: row for row in events}
+    changed, deleted = [], []
+    for row in sorted(latest.values(), key=lambda row: row["seq"]):
+        if "brand" in row:
+            tyre = dict(row)
+            tyre["change_seq"] = tyre.pop("seq")
+            changed.append(tyre)
+        else:
+            deleted.append({"id": row["id"], "change_seq": row["seq"]})
+    return {
+        "changes": changed,
+        "deleted": deleted,
+        "next_since": events[-1]["seq"] if events else since,
+        "has_more": has_more,
+    }
+
+
+# -----------------------------
+# Pricing rules
+# Rule writes drop this process's compiled rules (app/pricing.py); they
+# price new writes at once, but existing tyres keep their prices until
+# reprice_tyres runs (POST /api/pricing/reprice, python -m
+# app.reprice_job).
+# -----------------------------
+def list_pricing_rules(db: Session) -> list:
+    stmt = select(*PRICING_RULE_COLUMNS).order_by(
+        PricingRuleModel.priority.desc(), PricingRuleModel.id
+    )
+    return db.execute(stmt).all()
+
+
+def create_pricing_rule(db: Session, payload: PricingRuleIn):
+    stmt = insert(PricingRuleModel).values(**payload.model_dump()).returning(
+        *PRICING_RULE_COLUMNS
+    )
+    rule = execute_write(db, stmt, "Pricing rule could not be created")
+    db.commit()
+    drop_pricing_rules()
+    return rule
+
+
+def update_pricing_rule(db: Session, rule_id: int, payload: PricingRuleIn):
+    stmt = (
+        update(PricingRuleModel)
+        .where(PricingRuleModel.id == rule_id)
+        .values(**payload.model_dump(), updated_at=func.now())
+        .returning(*PRICING_RULE_COLUMNS)
+    )
+    rule = execute_write(db, stmt, "Pricing rule could not be updated")
+    if rule is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Pricing rule not found")
+    db.commit()
+    drop_pricing_rules()
+    return rule
+
+
+def delete_pricing_rule(db: Session, rule_id: int) -> None:
+    stmt = delete(PricingRuleModel).where(PricingRuleModel.id == rule_id).returning(
+        PricingRuleModel.id
+    )
+    if db.execute(stmt).one_or_none() is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Pricing rule not found")
+    db.commit()
+    drop_pricing_rules()
+
+
+def row_change_seqs(db: Session, after: int):
+    """SQL giving each row of a multi-row UPDATE over ids > after its own
+    change feed position."""
+    if db.get_bind().dialect.name == "postgresql":
+        return CHANGE_SEQ.next_value()
+    # Ids are distinct, so offsets from one fresh position are too.
+    return next_change_seq(db) + (TyreModel.id - after - 1)
+
+
+def reprice_tyres(db: Session, chunk_size: int = REPRICE_CHUNK_SIZE, progress=None) -> dict:
+    """Apply the pricing rules to every tyre. Each chunk of chunk_size ids
+    is one UPDATE pricing the rows in SQL, committed on its own so row
+    locks are short and an interrupted run loses at most one chunk. Only
+    tyres whose price changes are written, with a new version, change
+    feed position and price event, so a rerun is cheap.
+    progress(done, total, repriced) is called after each chunk."""
+    drop_pricing_rules()
+    new_price = pricing_rules(db).retail_cost_sql()
+    total = db.execute(select(func.count()).select_from(TyreModel)).scalar_one()
+
+    done = repriced = chunks = 0
+    after = 0
+    while True:
+        # The chunk's last id, from the primary key index.
+        upper = db.execute(
+            select(TyreModel.id)
+            .where(TyreModel.id > after)
+            .order_by(TyreModel.id)
+            .offset(chunk_size - 1)
+            .limit(1)
+        ).scalar()
+        stmt = update(TyreModel).where(TyreModel.id > after)
+        if upper is not None:
+            stmt = stmt.where(TyreModel.id <= upper)
+        repriced_ids = db.execute(
+            stmt.where(TyreModel.retail_cost != new_price)
+            .values(
+                retail_cost=new_price,
+                version=TyreModel.version + 1,
+                change_seq=row_change_seqs(db, after),
+            )
+            .returning(TyreModel.id)
+        ).scalars().all()
+        if repriced_ids:
+            record_changes(db, repriced_ids, PRICE_CHANGED)
+        db.commit()
+        if repriced_ids:
+            invalidate_tyres(*repriced_ids)
+
+        chunks += 1
+        repriced += len(repriced_ids)
+        done = total if upper is None else min(done + chunk_size, total)
+        if progress is not None:
+            progress(done, total, repriced)
+        if upper is None:
+            return {"total": total, "repriced": repriced, "chunks": chunks}
+        after = upper
+
+
+# -----------------------------
+# Location stock
+# A tyre's quantity stays its total stock, what single-quantity clients
+# read and write. Units at a branch or warehouse are also counted in its
+# TyreLocationStockModel row and in tyres.located; the rest of quantity
+# is unassigned. A location stock move is two conditional UPDATEs, tyre
+# row first (the lock order every stock writer uses): quantity and
+# located on the tyre, then the location's row, which never goes below
+# zero. A single-quantity write that would cut into located stock first
+# takes the excess back from the fullest locations (unassign_stock), the
+# way sharded stock falls back to draining its slots. Sharded tyres hold
+# no location stock.
+# -----------------------------
+LOCATION_COLUMNS = tuple(LocationModel.__table__.c)
+
+
+def list_locations(db: Session) -> list:
+    return db.execute(select(*LOCATION_COLUMNS).order_by(LocationModel.id)).all()
+
+
+def create_location(db: Session, payload: LocationCreate):
+    stmt = insert(LocationModel).values(**payload.model_dump()).returning(*LOCATION_COLUMNS)
+    location = execute_write(db, stmt, "Location code already exists")
+    db.commit()
+    return location
+
+
+def tyre_locations(db: Session, tyre_id: int) -> dict:
+    tyre = db.execute(
+        select(TYRE_STOCK.label("quantity"), TyreModel.reserved, TyreModel.located)
+        .where(TyreModel.id == tyre_id)
+    ).one_or_none()
+    if tyre is None:
+        raise HTTPException(status_code=404, detail="Tyre not found")
+    stock = TyreLocationStockModel
+    locations = db.execute(
+        select(stock.location_id, LocationModel.code, LocationModel.name, stock.quantity)
+        .join(LocationModel, LocationModel.id == stock.location_id)
+        .where(stock.tyre_id == tyre_id)
+        .where(stock.quantity > 0)
+        .order_by(stock.location_id)
+    ).mappings().all()
+    return {
+        "tyre_id": tyre_id,
+        "quantity": tyre.quantity,
+        "reserved": tyre.reserved,
+        "unassigned": tyre.quantity - tyre.located,
+        "locations": locations,
+    }
+
+
+def _move_location_stock(db: Session, tyre_id: int, location_id: int, delta: int) -> bool:
+    """Apply delta to a tyre's stock row at a location, creating it for
+    the first units received there. False if the location does not hold
+    enough (or does not exist)."""
+    stock = TyreLocationStockModel
+    moved = db.execute(
+        update(stock)
+        .where(stock.tyre_id == tyre_id)
+        .where(stock.location_id == location_id)
+        .where(stock.quantity + delta >= 0)
+        .values(quantity=stock.quantity + delta)
+        .returning(stock.quantity)
+    ).first()
+    if moved is None and delta > 0:
+        moved = db.execute(
+            insert(stock)
+            .from_select(
+                ["tyre_id", "location_id", "quantity"],
+                select(literal(tyre_id), LocationModel.id, literal(delta))
+                .where(LocationModel.id == location_id),
+            )
+            .returning(stock.quantity)
+        ).first()
+    return moved is not None
+
+
+def adjust_location_stock(db: Session, tyre_id: int, location_id: int, delta: int,
+                          transfer: bool = False) -> dict:
+    """Receive (delta > 0) or take (delta < 0) units at a location; the
+    tyre's total moves with them. With transfer, the units move between
+    the location and unassigned stock and the total stays put."""
+    if delta == 0:
+        raise HTTPException(status_code=400, detail="Delta must not be zero")
+
+    stmt = (
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .where(TyreModel.shards == 0)
+        .where(TyreModel.located + delta >= 0)
+    )
+    values = {"located": TyreModel.located + delta, **write_stamp(db)}
+    if transfer:
+        stmt = stmt.where(TyreModel.located + delta <= TyreModel.quantity)
+    else:
+        stmt = stmt.where(TyreModel.quantity + delta >= TyreModel.reserved)
+        values["quantity"] = TyreModel.quantity + delta
+    if db.execute(stmt.values(**values).returning(TyreModel.id)).first() is None:
+        db.rollback()
+        tyre = db.execute(
+            select(TyreModel.shards, TyreModel.located).where(TyreModel.id == tyre_id)
+        ).one_or_none()
+        if tyre is None:
+            raise HTTPException(status_code=404, detail="Tyre not found")
+        if tyre.shards:
+            raise HTTPException(status_code=409, detail="Sharded stock has no locations")
+        if tyre.located + delta < 0:
+            raise HTTPException(status_code=409, detail="Not enough stock at this location")
+        if transfer:
+            raise HTTPException(status_code=409, detail="Not enough unassigned stock")
+        raise HTTPException(status_code=409, detail="Not enough stock")
+
+    if not _move_location_stock(db, tyre_id, location_id, delta):
+        db.rollback()
+        if db.execute(
+            select(LocationModel.id).where(LocationModel.id == location_id)
+        ).first() is None:
+            raise HTTPException(status_code=404, detail="Location not found")
+        raise HTTPException(status_code=409, detail="Not enough stock at this location")
+
+    if not transfer:
+        record_changes(db, [tyre_id], STOCK_CHANGED)
+    db.commit()
+    invalidate_tyres(tyre_id)
+    return tyre_locations(db, tyre_id)
+
+
+def unassign_stock(db: Session, tyre_id: int, quantity_after,
+                   reserved_after=TyreModel.reserved) -> bool:
+    """Make room for a single-quantity write that leaves the tyre with
+    quantity_after units (SQL over its columns) when its located stock
+    would not fit: take the excess back from the fullest locations into
+    unassigned stock. False if nothing needs taking, or if the write
+    cannot apply anyway (quantity_after below zero, or below
+    reserved_after unless that is None)."""
+    spare = literal(0) if reserved_after is None else quantity_after - reserved_after
+    tyre = db.execute(
+        select(
+            TyreModel.located,
+            (TyreModel.located - quantity_after).label("excess"),
+            spare.label("spare"),
+        )
+        .where(TyreModel.id == tyre_id)
+        .with_for_update()
+    ).one_or_none()
+    if tyre is None or not 0 < tyre.excess <= tyre.located or tyre.spare < 0:
+        return False
+
+    stock = TyreLocationStockModel
+    rows = db.execute(
+        select(stock.location_id, stock.quantity)
+        .where(stock.tyre_id == tyre_id)
+        .where(stock.quantity > 0)
+        .order_by(stock.location_id)
+        .with_for_update()
+    ).all()
+    remaining = tyre.excess
+    for row in sorted(rows, key=lambda row: row.quantity, reverse=True):
+        take = min(remaining, row.quantity)
+        db.execute(
+            update(stock)
+            .where(stock.tyre_id == tyre_id)
+            .where(stock.location_id == row.location_id)
+            .values(quantity=stock.quantity - take)
+        )
+        remaining -= take
+        if remaining == 0:
+            break
+    db.execute(
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .values(located=TyreModel.located - tyre.excess)
+    )
+    return True
+
+
+def location_distance(latitude: float, longitude: float):
+    """SQL ranking locations by distance from a point: the squared
+    equirectangular approximation, which needs only arithmetic (no trig
+    functions in SQLite) and orders nearby points as well as haversine."""
+    scale = math.cos(math.radians(latitude))
+    north = LocationModel.latitude - latitude
+    east = (LocationModel.longitude - longitude) * scale
+    return north * north + east * east
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def allocate_stock(db: Session, tyre_id: int, quantity: int, latitude: float,
+                   longitude: float) -> dict:
+    """Take quantity units of a tyre from the nearest location holding all
+    of them. The location is picked and its stock taken in one UPDATE,
+    behind the tyre row lock the total's UPDATE takes first."""
+    taken = db.execute(
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .where(TyreModel.shards == 0)
+        .where(TyreModel.located >= quantity)
+        .where(TyreModel.quantity - quantity >= TyreModel.reserved)
+        .values(
+            quantity=TyreModel.quantity - quantity,
+            located=TyreModel.located - quantity,
+            **write_stamp(db),
+        )
+        .returning(TyreModel.id)
+    ).first()
+
+    stock = TyreLocationStockModel
+    nearest = (
+        select(stock.location_id)
+        .join(LocationModel, LocationModel.id == stock.location_id)
+        .where(stock.tyre_id == tyre_id)
+        .where(stock.quantity >= quantity)
+        .order_by(location_distance(latitude, longitude), stock.location_id)
+        .limit(1)
+        .correlate(None)
+    )
+    picked = None
+    if taken is not None:
+        picked = db.execute(
+            update(stock)
+            .where(stock.tyre_id == tyre_id)
+            .where(stock.location_id == nearest.scalar_subquery())
+            .values(quantity=stock.quantity - quantity)
+            .returning(stock.location_id)
+        ).first()
+    if picked is None:
+        raise write_failed(db, tyre_id, 409, "No location has enough stock")
+
+    location = db.execute(
+        select(*LOCATION_COLUMNS).where(LocationModel.id == picked.location_id)
+    ).one()
+    record_changes(db, [tyre_id], STOCK_CHANGED)
+    db.commit()
+    invalidate_tyres(tyre_id)
+    return {
+        "tyre_id": tyre_id,
+        "location_id": location.id,
+        "code": location.code,
+        "name": location.name,
+        "quantity": quantity,
+        "distance_km": round(
+            distance_km(latitude, longitude, location.latitude, location.longitude), 1
+        ),
+    }
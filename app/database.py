@@ -1,8 +1,14 @@
 # backend/tyres_service/database.py
-import os, time
-from sqlalchemy import create_engine
+import os, threading, time
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import instrument_engine, register_pool_collector
 
 POSTGRES_USER = os.getenv("POSTGRES_USER", "tyre_user")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "tyre_pass")
@@ -16,26 +22,160 @@ DATABASE_URL = os.getenv("DATABASE_URL") or (
 )
 
 SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() == "true"
+# Opt-in async request path (asyncpg / aiosqlite); the sync engine stays
+# the default and is always used by the workers and migrations.
+ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() == "true"
+# How long wait_for_database (migrations at container start) keeps
+# trying before giving up.
 RETRIES = int(os.getenv("DB_RETRIES", "15"))
 DELAY = float(os.getenv("DB_RETRY_DELAY", "2"))
 
-engine = None
-for attempt in range(RETRIES):
-    try:
-        engine = create_engine(
-            DATABASE_URL,
-            pool_pre_ping=True,
-            echo=SQL_ECHO,
+# Connection pool, per process. Keep
+#   processes x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# below Postgres max_connections across all API and queue workers.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Off by default: DB_POOL_RECYCLE already retires stale connections, and
+# pre-ping costs a round trip on every checkout.
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Behind PgBouncer in transaction mode: no client-side pool (NullPool),
+# and settings go per transaction since server connections are shared.
+DB_EXTERNAL_POOLER = os.getenv("DB_EXTERNAL_POOLER", "false").lower() == "true"
+# Server-side cap per statement in ms (Postgres only); 0 leaves the
+# server default.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+class CheckoutWaitStats:
+    """How long callers waited for a pooled connection."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+class _TimedCheckout:
+    """Records checkout waits in the pool's own wait_stats, so the sync
+    and async pools are reported apart."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = CheckoutWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url, is_async: bool = False) -> dict:
+    """create_engine kwargs for the pool settings above."""
+    url = make_url(url)
+    options = {"echo": SQL_ECHO}
+
+    if DB_EXTERNAL_POOLER:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+        # Startup parameter: no extra round trip per connection.
+        if DB_STATEMENT_TIMEOUT_MS and url.get_backend_name() == "postgresql":
+            if is_async:
+                options["connect_args"] = {
+                    "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+                }
+            else:
+                options["connect_args"] = {
+                    "options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+                }
+    return options
+
+
+def configure_engine(engine) -> None:
+    """Query timing, plus per-transaction settings behind an external pooler."""
+    instrument_engine(engine)
+    if (
+        DB_EXTERNAL_POOLER
+        and DB_STATEMENT_TIMEOUT_MS
+        and engine.dialect.name == "postgresql"
+    ):
+        @event.listens_for(engine, "begin")
+        def _set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}")
+
+
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    wait = getattr(pool, "wait_stats", None)
+    if wait is not None:
+        status.update(
+            checkouts=wait.checkouts,
+            checkout_wait_seconds_total=round(wait.wait_seconds_total, 6),
+            checkout_wait_seconds_max=round(wait.wait_seconds_max, 6),
+        )
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
         )
-        with engine.connect():
-            print("Connected to PostgreSQL")
-        break
-    except OperationalError:
-        print(f"Postgres not ready (attempt {attempt + 1}/{RETRIES})")
-        time.sleep(DELAY)
+    return status
+
+
+def pool_saturated(engine) -> bool:
+    """True when every connection the pool may open is checked out."""
+    status = pool_status(engine)
+    if "checked_out" not in status:
+        return False  # NullPool: nothing to run out of client-side
+    return status["checked_out"] >= status["size"] + status["max_overflow"]
+
+
+# Creating the engine opens no connection: the pool connects on first
+# use, so importing this module never waits for the database.
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+configure_engine(engine)
+
+
+def wait_for_database(retries: int = RETRIES, delay: float = DELAY) -> None:
+    """Block until the database accepts connections (container start)."""
+    for attempt in range(retries):
+        try:
+            with engine.connect():
+                return
+        except OperationalError:
+            print(f"Database not ready (attempt {attempt + 1}/{retries})")
+            time.sleep(delay)
+    raise RuntimeError(f"Could not connect to the database after {retries} attempts.")
 
-if engine is None:
-    raise RuntimeError("Could not connect to PostgreSQL after several attempts.")
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -44,9 +184,86 @@ SessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Async drivers for the sync URLs we are configured with.
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=f"{url.get_backend_name()}+{ASYNC_DRIVERS[url.get_backend_name()]}")
+
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    """AsyncEngine + session factory, created on first use so the async
+    driver is only needed when ASYNC_DB is on."""
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        url = async_database_url(DATABASE_URL)
+        _async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+        configure_engine(_async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(
+            _async_engine,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_sessionmaker
+
+
+def engines() -> dict:
+    """Engines created so far in this process, by name."""
+    created = {"sync": engine}
+    if _async_engine is not None:
+        created["async"] = _async_engine
+    return created
+
+
+register_pool_collector(engines, pool_status)
+
+
+def dialect_insert(bind):
+    """INSERT construct with ON CONFLICT support for the bound dialect."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+async def get_session():
+    """Request-scoped session for the async handlers: an AsyncSession when
+    ASYNC_DB is on, otherwise a sync Session used from the threadpool."""
+    if ASYNC_DB:
+        async with get_async_sessionmaker()() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+def _ping() -> None:
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def ping_database() -> None:
+    """One round trip through the engine that serves requests; raises if
+    the database is unreachable."""
+    if ASYNC_DB:
+        async with get_async_sessionmaker()() as db:
+            await db.execute(text("SELECT 1"))
+    else:
+        await run_in_threadpool(_ping)
+
+
+async def run_db(db, fn, *args):
+    """Run fn(sync_session, *args) without blocking the event loop."""
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
@@ -0,0 +1,44 @@
+# tyres_service/app/local_broker.py
+# In-process stand-in for a RabbitMQ topic exchange, for tests. Publishing
+# and binding follow aio_pika's shapes closely enough that code written
+# against an aio_pika exchange can be pointed at a LocalExchange instead.
+import asyncio
+
+
+def topic_matches(pattern: str, routing_key: str) -> bool:
+    """AMQP topic matching: "*" is exactly one word, "#" zero or more."""
+    return _match(pattern.split("."), routing_key.split("."))
+
+
+def _match(pattern: list, words: list) -> bool:
+    if not pattern:
+        return not words
+    head, rest = pattern[0], pattern[1:]
+    if head == "#":
+        return any(_match(rest, words[i:]) for i in range(len(words) + 1))
+    return bool(words) and head in ("*", words[0]) and _match(rest, words[1:])
+
+
+class LocalExchange:
+    """Topic exchange held in memory.
+
+    Every publish is kept in .published as (routing_key, message); queues
+    from bind() receive the messages whose routing key matches their
+    pattern, in publish order.
+    """
+
+    def __init__(self, name: str = "topic_logs"):
+        self.name = name
+        self.published = []
+        self._bindings = []
+
+    def bind(self, pattern: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._bindings.append((pattern, queue))
+        return queue
+
+    async def publish(self, message, routing_key: str, **kwargs):
+        self.published.append((routing_key, message))
+        for pattern, queue in self._bindings:
+            if topic_matches(pattern, routing_key):
+                queue.put_nowait(message)
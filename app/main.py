@@ -1,30 +1,63 @@
 # backend/tyres_service/main.py
+import asyncio
+import csv
+import hashlib
+import io
+import json
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, status, Response
+from typing import Literal, Optional
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, status, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import select, update
-from sqlalchemy.exc import IntegrityError
-from decimal import Decimal
-
-from app.database import engine, SessionLocal
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, search
+from app.crud import filter_tyres
+from app.database import (
+    engine, engines, ping_database, pool_saturated, pool_status, SessionLocal, get_session, run_db,
+)
 from app.models import Base, TyreModel
-from app.schemas import StockAdjust, TyreCreate, TyreSchema, TyreUpdate
+from app.schemas import (
+    LocationCreate, LocationOut, LocationStockAdjust, PricingRuleIn, PricingRuleOut,
+    RepriceResult, ReservationCreate, ReservationOut, StockAdjust, StockAdjustBatch,
+    StockAllocate, StockAllocation, StockShards, TyreAvailability, TyreChanges, TyreCreate,
+    TyreFacets, TyreFilters, TyreLocations, TyreOut, TyreSchema, TyreSearchHit, TyreUpdate,
+)
 from app.auth import TokenUser, get_current_user, require_roles
+from app.metrics import PrometheusMiddleware, render_latest
 
-# Retail price = cost * markup; configurable so the business can change
-# its margin without a code change.
-RETAIL_MARKUP = Decimal(os.getenv("RETAIL_MARKUP", "1.35"))
+# Keyset pagination for the catalogue listing.
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "100"))
+LIST_PAGE_SIZE_MAX = int(os.getenv("LIST_PAGE_SIZE_MAX", "500"))
 
+# Rows fetched per round trip by the streaming export.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_COLUMNS = ["id", *TyreSchema.model_fields]
 
+# Upper bound on rows in one bulk import request.
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "20000"))
+
+# Alembic owns the schema wherever migrations run (RUN_MIGRATIONS=1, see
+# entrypoint.sh), so booting there touches no database at all. create_all
+# on startup is for migration-less local runs; DB_CREATE_ALL overrides.
+DB_CREATE_ALL = os.getenv(
+    "DB_CREATE_ALL", "false" if os.getenv("RUN_MIGRATIONS") == "1" else "true"
+).lower() == "true"
+# /ready fails if the database has not answered within this many seconds.
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "2"))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    if DB_CREATE_ALL:
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
     yield
-app = FastAPI(lifespan=lifespan)
+# Tyre endpoints declare TyreOut as their response model, so FastAPI
+# serializes straight from rows via pydantic-core and orjson renders the
+# result, instead of jsonable_encoder walking ORM objects.
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 ALLOWED_ORIGINS = [
@@ -40,137 +73,338 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(PrometheusMiddleware)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Liveness: the process is up. Never touches the database, so a slow or
+# restarting database does not get healthy replicas killed.
+@app.get("/health")
+def health():
+    return {"status": "ok"}
 
 
+# Readiness: route traffic here only while the database answers and the
+# connection pool has room.
+@app.get("/ready")
+async def ready():
+    problems = {
+        f"pool_{name}": "exhausted" for name, eng in engines().items() if pool_saturated(eng)
+    }
+    if not problems:
+        try:
+            await asyncio.wait_for(ping_database(), READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            problems["database"] = f"no answer within {READY_TIMEOUT}s"
+        except Exception as e:
+            problems["database"] = type(e).__name__
+    if problems:
+        return ORJSONResponse({"status": "unavailable", **problems}, status_code=503)
+    return {"status": "ready"}
 
-def commit_or_rollback(db: Session, msg: str):
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        raise HTTPException(status_code=409, detail=msg)
 
+# Prometheus scrape endpoint: request/query/JWT latency histograms and
+# pool gauges.
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
 
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+# Connection pool occupancy and checkout wait, per engine.
+@app.get("/metrics/db")
+def db_metrics():
+    return {name: pool_status(eng) for name, eng in engines().items()}
+
+
+# -----------------------------
+# ETags
+# A tyre's ETag is its version (bumped by every write), plus its quantity
+# when its stock is sharded (slot writes leave the version alone); a list
+# page's is a digest of the (id, version, quantity) rows on it. Weak,
+# because the JSON rendering is not byte-for-byte guaranteed.
+# -----------------------------
+def tyre_etag(tyre) -> str:
+    tyre = getattr(tyre, "_mapping", tyre)
+    if tyre["shards"]:
+        return f'W/"{tyre["version"]}.{tyre["quantity"]}"'
+    return f'W/"{tyre["version"]}"'
+
+
+def page_etag(tyres, next_cursor) -> str:
+    digest = hashlib.blake2b(digest_size=12)
+    for tyre in tyres:
+        digest.update(f"{tyre.id}:{tyre.version}:{tyre.quantity};".encode())
+    digest.update(f"next:{next_cursor}".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak: W/ prefixes are ignored)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def if_match_version(if_match: Optional[str] = Header(None)) -> Optional[int]:
+    """Version from an If-Match header (W/"<version>"), or None if absent."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"').partition(".")[0])
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not name a tyre version")
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
 
 # ===============================================
 #                  TYRES CRUD
 # ===============================================
+# Handlers are async and hand their DB work to crud via run_db: on the
+# threadpool with the sync engine (default), or on the async engine when
+# ASYNC_DB is on.
 
 # -----------------------------
 # CREATE TYRE (admin / employee+)
 # -----------------------------
-@app.post("/api/tyres", status_code=201)
-def create_tyre(
+@app.post("/api/tyres", status_code=201, response_model=TyreOut)
+async def create_tyre(
     payload: TyreCreate,
-    db: Session = Depends(get_db),
+    db=Depends(get_session),
     _user: TokenUser = Depends(require_roles("admin", "employee+")),
 ):
-    data = payload.model_dump()
+    return await run_db(db, crud.create_tyre, payload)
 
-    data["retail_cost"] = (data["cost"] * RETAIL_MARKUP).quantize(Decimal("0.01"))
 
-    tyre = TyreModel(**data)
-    db.add(tyre)
-    commit_or_rollback(db, "Tyre could not be created")
-    db.refresh(tyre)
-    return tyre
+# -----------------------------
+# BULK IMPORT (admin / employee+)
+# Supplier price lists as a JSON array or a CSV body (Content-Type:
+# text/csv, headers as in tyredatabase.csv). Each row is validated
+# against TyreCreate; valid rows are upserted on the natural key
+# (brand, model, size, supplier) with multi-row INSERT ... ON CONFLICT
+# in one transaction, invalid rows are reported and skipped. If the same
+# key appears twice the later row wins.
+# -----------------------------
+def _parse_import_body(body: bytes, content_type: str) -> list:
+    if content_type.startswith("text/csv"):
+        try:
+            reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+            return [
+                {key.strip().lower(): value.strip() for key, value in row.items() if key}
+                for row in reader
+            ]
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV must be UTF-8")
+    try:
+        rows = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or CSV")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or CSV")
+    return rows
+
+
+@app.post("/api/tyres/import")
+async def import_tyres(
+    request: Request,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+")),
+):
+    rows = _parse_import_body(await request.body(), request.headers.get("content-type", ""))
+    if len(rows) > IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {IMPORT_MAX_ROWS} rows per import"
+        )
+    return await run_db(db, crud.import_tyres, rows)
 
 
 # -----------------------------
 # LIST TYRES
+# Keyset pagination on id: pass the X-Next-Cursor value from the previous
+# page as ?after=; the header is absent on the last page.
 # -----------------------------
-@app.get("/api/tyres")
-def list_tyres(
-    db: Session = Depends(get_db),
+@app.get("/api/tyres", response_model=list[TyreOut])
+async def list_tyres(
+    response: Response,
+    filters: TyreFilters = Depends(),
+    after: Optional[int] = Query(None, ge=0),
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_PAGE_SIZE_MAX),
+    if_none_match: Optional[str] = Header(None),
+    db=Depends(get_session),
     _user: TokenUser = Depends(get_current_user),
 ):
-    stmt = select(TyreModel).order_by(TyreModel.id)
-    return db.execute(stmt).scalars().all()
+    tyres, next_cursor = await run_db(db, crud.list_tyres, filters, after, limit)
+    etag = page_etag(tyres, next_cursor)
+    if etag_matches(if_none_match, etag):
+        response = not_modified(etag)
+    response.headers["ETag"] = etag
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return response if response.status_code == status.HTTP_304_NOT_MODIFIED else tyres
+
+
+# -----------------------------
+# EXPORT TYRES (NDJSON / CSV)
+# Streams the catalogue through a server-side cursor so memory stays flat
+# however large it gets. The generator owns its session because the
+# request-scoped one is closed before the body is streamed.
+# -----------------------------
+def _export_rows(filters: TyreFilters):
+    stmt = filter_tyres(
+        select(*(crud.TYRE_FIELDS[name] for name in EXPORT_COLUMNS)), filters
+    ).order_by(TyreModel.id)
+
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _export_ndjson(filters: TyreFilters):
+    for rows in _export_rows(filters):
+        yield "".join(
+            json.dumps(row._asdict(), default=str) + "\n" for row in rows
+        )
+
+
+def _export_csv(filters: TyreFilters):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in _export_rows(filters):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header only, for an empty catalogue
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@app.get("/api/tyres/export")
+def export_tyres(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: TyreFilters = Depends(),
+    _user: TokenUser = Depends(get_current_user),
+):
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(filters),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="tyres.csv"'},
+        )
+    return StreamingResponse(_export_ndjson(filters), media_type="application/x-ndjson")
+
+
+# -----------------------------
+# FACETS
+# Counts for the catalogue filter sidebar (brand, season, speed rate,
+# efficiency classes, EV) and the price range, under the same filters as
+# the listing.
+# -----------------------------
+@app.get("/api/tyres/facets", response_model=TyreFacets)
+async def tyre_facets(
+    filters: TyreFilters = Depends(),
+    db=Depends(get_session),
+    _user: TokenUser = Depends(get_current_user),
+):
+    return await run_db(db, crud.tyre_facets, filters)
+
+
+# -----------------------------
+# CHANGE FEED
+# Delta sync for POS terminals and the storefront: tyres written or
+# deleted after position `since`, oldest first. Start from 0 for the full
+# catalogue, then pass next_since back while has_more is true. A page
+# holds one entry per tyre, so it can be shorter than `limit` with more
+# to come: its length is no end-of-feed signal.
+# -----------------------------
+@app.get("/api/tyres/changes", response_model=TyreChanges)
+async def tyre_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_PAGE_SIZE_MAX),
+    db=Depends(get_session),
+    _user: TokenUser = Depends(get_current_user),
+):
+    return await run_db(db, crud.tyre_changes, since, limit)
+
+
+# -----------------------------
+# SEARCH TYRES
+# Free text for the counter: a size in any notation plus brand, model or
+# supplier words, matched by prefix or fuzzily; best matches first.
+# -----------------------------
+@app.get("/api/tyres/search", response_model=list[TyreSearchHit])
+async def search_tyres(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db=Depends(get_session),
+    _user: TokenUser = Depends(get_current_user),
+):
+    return await run_db(db, search.search_tyres, q, limit)
 
 
 # -----------------------------
 # GET TYRE BY ID
 # -----------------------------
-@app.get("/api/tyres/{tyre_id}")
-def get_tyre(
+@app.get("/api/tyres/{tyre_id}", response_model=TyreOut)
+async def get_tyre(
     tyre_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db=Depends(get_session),
     _user: TokenUser = Depends(get_current_user),
 ):
-    tyre = db.get(TyreModel, tyre_id)
-    if not tyre:
-        raise HTTPException(status_code=404, detail="Tyre not found")
+    tyre = await run_db(db, crud.get_tyre, tyre_id)
+    etag = tyre_etag(tyre)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return tyre
 
 
 # -----------------------------
 # UPDATE TYRE (PUT, admin / employee+)
+# Optional If-Match: 412 unless it names the current version.
 # -----------------------------
-@app.put("/api/tyres/{tyre_id}")
-def update_tyre_put(
+@app.put("/api/tyres/{tyre_id}", response_model=TyreOut)
+async def update_tyre_put(
     tyre_id: int,
     payload: TyreSchema,
-    db: Session = Depends(get_db),
+    response: Response,
+    expected_version: Optional[int] = Depends(if_match_version),
+    db=Depends(get_session),
     _user: TokenUser = Depends(require_roles("admin", "employee+")),
 ):
-    tyre = db.get(TyreModel, tyre_id)
-    if not tyre:
-        raise HTTPException(status_code=404, detail="Tyre not found")
-
-    data = payload.model_dump()
-    data.pop("retail_cost", None)
-
-    data["retail_cost"] = (data["cost"] * RETAIL_MARKUP).quantize(Decimal("0.01"))
-
-    for field, value in data.items():
-        setattr(tyre, field, value)
-
-    commit_or_rollback(db, "Failed to update tyre")
-    db.refresh(tyre)
+    tyre = await run_db(db, crud.update_tyre_put, tyre_id, payload, expected_version)
+    response.headers["ETag"] = tyre_etag(tyre)
     return tyre
 
 
 # -----------------------------
 # PARTIAL UPDATE (PATCH, admin / employee+ / service)
 # "service" is the orders service adjusting stock during a sale.
+# Optional If-Match as for PUT.
 # -----------------------------
-@app.patch("/api/tyres/{tyre_id}")
-def update_tyre_patch(
+@app.patch("/api/tyres/{tyre_id}", response_model=TyreOut)
+async def update_tyre_patch(
     tyre_id: int,
     payload: TyreUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    expected_version: Optional[int] = Depends(if_match_version),
+    db=Depends(get_session),
     _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
 ):
-    tyre = db.get(TyreModel, tyre_id)
-    if not tyre:
-        raise HTTPException(status_code=404, detail="Tyre not found")
-
-    update_data = payload.model_dump(exclude_unset=True)
-    update_data.pop("retail_cost", None)  # cannot be changed manually
-
-    if "cost" in update_data:
-        update_data["retail_cost"] = (
-            update_data["cost"] * RETAIL_MARKUP
-        ).quantize(Decimal("0.01"))
-
-    for field, value in update_data.items():
-        setattr(tyre, field, value)
-
-    commit_or_rollback(db, "Failed to update tyre")
-    db.refresh(tyre)
+    tyre = await run_db(db, crud.update_tyre_patch, tyre_id, payload, expected_version)
+    response.headers["ETag"] = tyre_etag(tyre)
     return tyre
 
 
@@ -180,48 +414,223 @@ def update_tyre_patch(
 # the quantity check and the decrement happen in one statement.
 # Negative delta sells stock; positive delta restores it (compensation).
 # -----------------------------
-@app.post("/api/tyres/{tyre_id}/stock")
-def adjust_stock(
+@app.post("/api/tyres/{tyre_id}/stock", response_model=TyreOut)
+async def adjust_stock(
     tyre_id: int,
     payload: StockAdjust,
-    db: Session = Depends(get_db),
+    response: Response,
+    db=Depends(get_session),
     _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
 ):
-    if payload.delta == 0:
-        raise HTTPException(status_code=400, detail="Delta must not be zero")
+    tyre = await run_db(db, crud.adjust_stock, tyre_id, payload.delta)
+    response.headers["ETag"] = tyre_etag(tyre)
+    return tyre
+
 
-    stmt = (
-        update(TyreModel)
-        .where(TyreModel.id == tyre_id)
-        .where(TyreModel.quantity + payload.delta >= 0)
-        .values(quantity=TyreModel.quantity + payload.delta)
-        .returning(TyreModel.id)
+# -----------------------------
+# SHARD STOCK (admin)
+# Opt a hot tyre in to N stock slots, or back out with 0 (see
+# crud.adjust_sharded_stock). Reads still report one quantity.
+# -----------------------------
+@app.put("/api/tyres/{tyre_id}/stock/shards", response_model=TyreOut)
+async def set_stock_shards(
+    tyre_id: int,
+    payload: StockShards,
+    response: Response,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin")),
+):
+    tyre = await run_db(db, crud.set_stock_shards, tyre_id, payload.count)
+    response.headers["ETag"] = tyre_etag(tyre)
+    return tyre
+
+
+# -----------------------------
+# BATCH ADJUST STOCK (admin / employee+ / service)
+# All lines of an order in one transaction, with the same conditional
+# UPDATE as adjust_stock. Lines are merged per tyre and applied in id
+# order so concurrent batches lock rows in the same order and cannot
+# deadlock. If any line fails nothing is applied and every failed line
+# is reported.
+# -----------------------------
+@app.post("/api/tyres/stock/batch")
+async def adjust_stock_batch(
+    payload: StockAdjustBatch,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
+):
+    return await run_db(db, crud.adjust_stock_batch, payload.items)
+
+
+# -----------------------------
+# STOCK BY LOCATION
+# Branches and warehouses hold part of a tyre's stock; quantity stays the
+# total, so single-quantity clients are unaffected (see the Location
+# stock section of crud.py). Allocation takes an order's units from the
+# nearest location that has them all.
+# -----------------------------
+@app.get("/api/locations", response_model=list[LocationOut])
+async def list_locations(
+    db=Depends(get_session),
+    _user: TokenUser = Depends(get_current_user),
+):
+    return await run_db(db, crud.list_locations)
+
+
+@app.post("/api/locations", status_code=201, response_model=LocationOut)
+async def create_location(
+    payload: LocationCreate,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin")),
+):
+    return await run_db(db, crud.create_location, payload)
+
+
+@app.get("/api/tyres/{tyre_id}/locations", response_model=TyreLocations)
+async def tyre_locations(
+    tyre_id: int,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(get_current_user),
+):
+    return await run_db(db, crud.tyre_locations, tyre_id)
+
+
+@app.post("/api/tyres/{tyre_id}/locations/{location_id}/stock", response_model=TyreLocations)
+async def adjust_location_stock(
+    tyre_id: int,
+    location_id: int,
+    payload: LocationStockAdjust,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
+):
+    return await run_db(
+        db, crud.adjust_location_stock, tyre_id, location_id, payload.delta, payload.transfer
     )
-    updated_id = db.execute(stmt).scalar_one_or_none()
 
-    if updated_id is None:
-        db.rollback()
-        if not db.get(TyreModel, tyre_id):
-            raise HTTPException(status_code=404, detail="Tyre not found")
-        raise HTTPException(status_code=409, detail="Not enough stock")
 
-    db.commit()
-    return db.get(TyreModel, tyre_id)
+@app.post("/api/tyres/{tyre_id}/allocate", response_model=StockAllocation)
+async def allocate_stock(
+    tyre_id: int,
+    payload: StockAllocate,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
+):
+    return await run_db(
+        db, crud.allocate_stock, tyre_id, payload.quantity, payload.latitude, payload.longitude
+    )
+
+
+# -----------------------------
+# STOCK RESERVATIONS (admin / employee+ / service)
+# Checkout holds stock, then confirms on payment or releases on failure;
+# unconfirmed holds expire and the reservation sweeper hands them back.
+# -----------------------------
+@app.get("/api/tyres/{tyre_id}/availability", response_model=TyreAvailability)
+async def tyre_availability(
+    tyre_id: int,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(get_current_user),
+):
+    return await run_db(db, crud.tyre_availability, tyre_id)
+
+
+@app.post("/api/tyres/{tyre_id}/reservations", status_code=201, response_model=ReservationOut)
+async def hold_stock(
+    tyre_id: int,
+    payload: ReservationCreate,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
+):
+    return await run_db(db, crud.hold_stock, tyre_id, payload.quantity, payload.ttl_seconds)
+
+
+@app.get("/api/reservations/{reservation_id}", response_model=ReservationOut)
+async def get_reservation(
+    reservation_id: int,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
+):
+    return await run_db(db, crud.get_reservation, reservation_id)
+
+
+@app.post("/api/reservations/{reservation_id}/confirm", response_model=ReservationOut)
+async def confirm_reservation(
+    reservation_id: int,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
+):
+    return await run_db(db, crud.confirm_reservation, reservation_id)
+
+
+@app.post("/api/reservations/{reservation_id}/release", response_model=ReservationOut)
+async def release_reservation(
+    reservation_id: int,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin", "employee+", "service")),
+):
+    return await run_db(db, crud.release_reservation, reservation_id)
+
+
+# -----------------------------
+# PRICING RULES (admin)
+# Markups by supplier, brand or season (app/pricing.py). New and updated
+# tyres are priced by the current rules; POST /api/pricing/reprice
+# applies them to the existing catalogue (python -m app.reprice_job does
+# the same with progress output, for large catalogues).
+# -----------------------------
+@app.get("/api/pricing/rules", response_model=list[PricingRuleOut])
+async def list_pricing_rules(
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin")),
+):
+    return await run_db(db, crud.list_pricing_rules)
+
+
+@app.post("/api/pricing/rules", status_code=201, response_model=PricingRuleOut)
+async def create_pricing_rule(
+    payload: PricingRuleIn,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin")),
+):
+    return await run_db(db, crud.create_pricing_rule, payload)
+
+
+@app.put("/api/pricing/rules/{rule_id}", response_model=PricingRuleOut)
+async def update_pricing_rule(
+    rule_id: int,
+    payload: PricingRuleIn,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin")),
+):
+    return await run_db(db, crud.update_pricing_rule, rule_id, payload)
+
+
+@app.delete("/api/pricing/rules/{rule_id}", status_code=204)
+async def delete_pricing_rule(
+    rule_id: int,
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin")),
+) -> Response:
+    await run_db(db, crud.delete_pricing_rule, rule_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@app.post("/api/pricing/reprice", response_model=RepriceResult)
+async def reprice_tyres(
+    db=Depends(get_session),
+    _user: TokenUser = Depends(require_roles("admin")),
+):
+    return await run_db(db, crud.reprice_tyres)
 
 
 # -----------------------------
 # DELETE TYRE (admin / employee+)
 # -----------------------------
 @app.delete("/api/tyres/{tyre_id}", status_code=204)
-def delete_tyre(
+async def delete_tyre(
     tyre_id: int,
-    db: Session = Depends(get_db),
+    db=Depends(get_session),
     _user: TokenUser = Depends(require_roles("admin", "employee+")),
 ) -> Response:
-    tyre = db.get(TyreModel, tyre_id)
-    if not tyre:
-        raise HTTPException(status_code=404, detail="Tyre not found")
-    
-    db.delete(tyre)
-    db.commit()
+    await run_db(db, crud.delete_tyre, tyre_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
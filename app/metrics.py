@@ -0,0 +1,184 @@
+# tyres_service/app/metrics.py
+# Prometheus instrumentation shared by the API and the queue workers.
+# Everything here is an in-memory counter/histogram update on the hot
+# path; pool gauges are read only when /metrics is scraped.
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "tyres_http_request_duration_seconds",
+    "HTTP request latency by route template and status.",
+    ["method", "route", "status"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "tyres_db_query_duration_seconds",
+    "SQL statement execution time by statement type.",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+JWT_DECODE_SECONDS = Histogram(
+    "tyres_jwt_decode_duration_seconds",
+    "Time spent verifying bearer tokens.",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+TOKEN_CACHE_LOOKUPS = Counter(
+    "tyres_token_cache_lookups_total",
+    "Verified-token cache lookups by result (hit/miss).",
+    ["result"],
+)
+CACHE_LOOKUPS = Counter(
+    "tyres_cache_lookups_total",
+    "Read-through cache lookups by cache and result (hit/miss).",
+    ["cache", "result"],
+)
+WORKER_MESSAGE_SECONDS = Histogram(
+    "tyres_worker_message_duration_seconds",
+    "Time from starting to handle a message to acking it.",
+    ["worker"],
+)
+WORKER_BATCH_SIZE = Histogram(
+    "tyres_worker_batch_size",
+    "Messages applied per worker batch.",
+    ["worker"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+WORKER_FAILURES = Counter(
+    "tyres_worker_failures_total",
+    "Messages a worker rejected or failed to apply.",
+    ["worker", "reason"],
+)
+
+
+# -----------------------------
+# HTTP: plain ASGI middleware (cheaper than BaseHTTPMiddleware). Routes
+# are labelled by template (/api/tyres/{tyre_id}) to bound cardinality.
+# -----------------------------
+class PrometheusMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status_code),
+            ).observe(time.perf_counter() - start)
+
+
+# -----------------------------
+# SQL: timed through cursor execute events.
+# -----------------------------
+def instrument_engine(engine) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+
+
+class PoolCollector:
+    """Connection pool gauges, read from the engines at scrape time. With
+    pid, every sample is also labelled with it (one process's pools among
+    several, see render_latest)."""
+
+    def __init__(self, engines, pool_status, pid=None):
+        self._engines = engines
+        self._pool_status = pool_status
+        self._pid = pid
+
+    def collect(self):
+        labels = ["engine"] if self._pid is None else ["engine", "pid"]
+        extra = [] if self._pid is None else [str(self._pid)]
+        gauges = {
+            "checked_out": GaugeMetricFamily(
+                "tyres_db_pool_checked_out", "Connections in use.", labels=labels
+            ),
+            "checked_in": GaugeMetricFamily(
+                "tyres_db_pool_checked_in", "Idle pooled connections.", labels=labels
+            ),
+            "overflow": GaugeMetricFamily(
+                "tyres_db_pool_overflow", "Connections beyond pool_size.", labels=labels
+            ),
+            "size": GaugeMetricFamily(
+                "tyres_db_pool_size", "Configured pool_size.", labels=labels
+            ),
+        }
+        wait_total = GaugeMetricFamily(
+            "tyres_db_pool_checkout_wait_seconds_total",
+            "Cumulative time spent waiting for a pooled connection.",
+            labels=labels,
+        )
+        for name, engine in self._engines().items():
+            status = self._pool_status(engine)
+            for key, gauge in gauges.items():
+                if key in status:
+                    gauge.add_metric([name, *extra], status[key])
+            if "checkout_wait_seconds_total" in status:
+                wait_total.add_metric([name, *extra], status["checkout_wait_seconds_total"])
+        yield from gauges.values()
+        yield wait_total
+
+
+_pool_sources = []
+
+
+def register_pool_collector(engines, pool_status) -> None:
+    REGISTRY.register(PoolCollector(engines, pool_status))
+    _pool_sources.append((engines, pool_status))
+
+
+def render_latest():
+    """(body, content type) for a /metrics response. Under gunicorn with
+    PROMETHEUS_MULTIPROC_DIR set, aggregates every worker process. Pools
+    live in one process each and cannot be aggregated: the process that
+    answers adds its own pool gauges, labelled with its pid (scrapes land
+    on any worker; /metrics/db shows the same for that process)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for engines, pool_status in _pool_sources:
+            registry.register(PoolCollector(engines, pool_status, pid=os.getpid()))
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def start_worker_metrics_server() -> None:
+    """Expose /metrics from a queue worker when WORKER_METRICS_PORT is set."""
+    port = os.getenv("WORKER_METRICS_PORT")
+    if port:
+        start_http_server(int(port))
@@ -1,16 +1,46 @@
 # backend/tyres_service/models.py
-from sqlalchemy import CheckConstraint, Column, Integer, String, Boolean, Numeric
+from sqlalchemy import (
+    BigInteger, CheckConstraint, Column, DateTime, Float, ForeignKey, Index, Integer, String,
+    Boolean, Numeric, Sequence, UniqueConstraint, func,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from datetime import datetime
 from decimal import Decimal
+from typing import Optional
 
 class Base(DeclarativeBase):
     pass
 
+
+# Change feed position, shared by tyres, stock slots and tombstones.
+# Postgres draws it from this sequence; SQLite (one writer at a time)
+# takes one past the highest value in use (see crud.next_change_seq).
+CHANGE_SEQ = Sequence("tyre_change_seq", metadata=Base.metadata)
+
+# Identifies a catalogue entry across supplier price lists.
+TYRE_NATURAL_KEY = ("brand", "model", "size", "supplier")
+
 class TyreModel(Base):
     __tablename__ = "tyres"
     __table_args__ = (
         CheckConstraint("quantity >= 0", name="ck_tyres_quantity_nonnegative"),
         CheckConstraint("cost > 0", name="ck_tyres_cost_positive"),
+        # Held stock can never exceed stock on hand: no oversell.
+        CheckConstraint(
+            "reserved >= 0 AND reserved <= quantity", name="ck_tyres_reserved_within_quantity"
+        ),
+        # Stock at locations is part of the total.
+        CheckConstraint(
+            "located >= 0 AND located <= quantity", name="ck_tyres_located_within_quantity"
+        ),
+        # Natural key: bulk imports upsert on it.
+        UniqueConstraint(*TYRE_NATURAL_KEY, name="uq_tyres_natural_key"),
+        # Catalogue filters + keyset pagination on id (see list_tyres).
+        Index("ix_tyres_brand_id", "brand", "id"),
+        Index("ix_tyres_size_id", "size", "id"),
+        Index("ix_tyres_season_id", "season", "id"),
+        Index("ix_tyres_speed_rate_id", "speed_rate", "id"),
+        Index("ix_tyres_retail_cost_id", "retail_cost", "id"),
     )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     brand: Mapped[str] = mapped_column(String, nullable=False)
@@ -27,3 +57,142 @@ class TyreModel(Base):
     cost: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     retail_cost: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    # Bumped by every write; served as the ETag. ORM flushes bump it and
+    # check it (optimistic locking); Core UPDATEs must set it themselves.
+    version: Mapped[int] = mapped_column(Integer, nullable=False, server_default="1")
+    # Units held by open reservations; available = quantity - reserved.
+    reserved: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    # Hot SKUs opt in to N stock slots (TyreStockShardModel) so concurrent
+    # sales update different rows. Their stock is quantity + sum(slots);
+    # quantity is 0 while sharded. 0 means unsharded.
+    shards: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    # Units of quantity held at locations (TyreLocationStockModel), kept in
+    # step by every location stock write so reads never add up the rows;
+    # the rest of quantity is unassigned.
+    located: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    # Position of the tyre's latest write in the change feed (GET
+    # /api/tyres/changes). Every Core write must set it.
+    change_seq: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default="0", index=True
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class TyreStockShardModel(Base):
+    """One stock slot of a sharded tyre."""
+    __tablename__ = "tyre_stock_shards"
+    __table_args__ = (
+        CheckConstraint("quantity >= 0", name="ck_tyre_stock_shards_quantity_nonnegative"),
+    )
+    tyre_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("tyres.id", ondelete="CASCADE"), primary_key=True
+    )
+    slot: Mapped[int] = mapped_column(Integer, primary_key=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Stock moves of a sharded tyre bump its slot, not the tyre row.
+    change_seq: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default="0", index=True
+    )
+
+
+class TyreTombstoneModel(Base):
+    """A deleted tyre, so change feed readers learn of the delete."""
+    __tablename__ = "tyre_tombstones"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tyre_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    change_seq: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    deleted_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class ReservationModel(Base):
+    """A hold on stock: "held" until confirmed (sold), released, or expired."""
+    __tablename__ = "reservations"
+    __table_args__ = (
+        CheckConstraint("quantity > 0", name="ck_reservations_quantity_positive"),
+        # The sweeper's scan: open holds past their expiry.
+        Index("ix_reservations_status_expires_at", "status", "expires_at"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tyre_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("tyres.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False, server_default="held")
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class ProcessedEventModel(Base):
+    """Events the queue workers have already applied, so redelivery is a no-op."""
+    __tablename__ = "processed_events"
+    event_id: Mapped[str] = mapped_column(String, primary_key=True)
+    processed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class OutboxModel(Base):
+    """A tyre change event written in the same transaction as the change,
+    awaiting relay to the broker (app/outbox_publisher.py). Rows hold the
+    tyre as that transaction left it; no foreign key, so events outlive
+    the tyre."""
+    __tablename__ = "outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    routing_key: Mapped[str] = mapped_column(String, nullable=False)
+    tyre_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    reserved: Mapped[int] = mapped_column(Integer, nullable=False)
+    retail_cost: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class PricingRuleModel(Base):
+    """Markup for the tyres matching every criterion the rule sets
+    (unset criteria match any tyre); see app/pricing.py."""
+    __tablename__ = "pricing_rules"
+    __table_args__ = (
+        CheckConstraint("markup > 0", name="ck_pricing_rules_markup_positive"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    supplier: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    brand: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    season: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    markup: Mapped[Decimal] = mapped_column(Numeric(6, 4), nullable=False)
+    # Higher wins when several rules match a tyre.
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+    )
+
+
+class LocationModel(Base):
+    """A branch or warehouse that holds stock."""
+    __tablename__ = "locations"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    code: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    latitude: Mapped[float] = mapped_column(Float, nullable=False)
+    longitude: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class TyreLocationStockModel(Base):
+    """Units of a tyre held at one location."""
+    __tablename__ = "tyre_location_stock"
+    __table_args__ = (
+        CheckConstraint("quantity >= 0", name="ck_tyre_location_stock_quantity_nonnegative"),
+    )
+    tyre_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("tyres.id", ondelete="CASCADE"), primary_key=True
+    )
+    location_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("locations.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -2,60 +2,296 @@ import aio_pika
 import asyncio
 import os
 import json
+import time
 
-from app.database import SessionLocal
-from app.models import TyreModel
+from sqlalchemy import select, update
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from app import crud
+from app.cache import invalidate_tyres
+from app.database import SessionLocal, dialect_insert
+from app.metrics import (
+    WORKER_BATCH_SIZE, WORKER_FAILURES, WORKER_MESSAGE_SECONDS, start_worker_metrics_server,
+)
+from app.models import ProcessedEventModel, TyreModel
+from app.worker_runtime import drain, run_db, shutdown_executor, stop_on_signals
 
 RABBIT_URL = os.getenv("RABBIT_URL")
 EXCHANGE = "topic_logs"
+# Orders that cannot be applied (malformed, or failing on their own) are
+# rejected into this exchange's queue for inspection, not dropped.
+DEAD_LETTER_EXCHANGE = "order_worker.dead_letter"
+DEAD_LETTER_QUEUE = "order.created.dead_letter"
 
-async def process_message(msg: aio_pika.IncomingMessage):
-    async with msg.process():
+# Unacked messages the broker may push to us, and how many of them are
+# applied per transaction. A batch is flushed when it is full or
+# BATCH_WINDOW seconds after its first message, whichever comes first.
+PREFETCH = int(os.getenv("ORDER_WORKER_PREFETCH", "200"))
+BATCH_SIZE = int(os.getenv("ORDER_WORKER_BATCH_SIZE", "50"))
+BATCH_WINDOW = float(os.getenv("ORDER_WORKER_BATCH_WINDOW", "0.05"))
+# Batches applied concurrently (each on its own DB thread and connection).
+# Safe because every batch locks tyre rows in id order.
+CONCURRENCY = int(os.getenv("ORDER_WORKER_CONCURRENCY", "4"))
+# While the database is unreachable, messages go back on the queue after
+# a delay that doubles per consecutive failure, up to the max.
+RETRY_DELAY = float(os.getenv("ORDER_WORKER_RETRY_DELAY", "0.5"))
+RETRY_DELAY_MAX = float(os.getenv("ORDER_WORKER_RETRY_DELAY_MAX", "30"))
+
+# Errors that say nothing about the order itself (failover, pool or
+# statement timeout): applying is idempotent, so those are retried.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+_retry_delay = 0.0
+
+
+def _event_id(data: dict):
+    order_id = data.get("order_id", data.get("id"))
+    return None if order_id is None else f"order.created:{order_id}"
+
+
+def _parse_order(msg):
+    try:
         data = json.loads(msg.body.decode())
-        print(f"[order_worker.py] Received {msg.routing_key}: {data}")
+        if data["type"] not in ("BUY", "SELL"):
+            raise ValueError(data["type"])
+        for item in data["items"]:
+            int(item["tyre_id"]), int(item["quantity"])
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"[order_worker.py] Dead-lettering malformed {msg.routing_key}: {e!r}")
+        WORKER_FAILURES.labels("order", "malformed").inc()
+        return None
+    return data
 
-        db = SessionLocal()
 
-        try:
-            if msg.routing_key == "order.created":
-                order_type = data["type"]
+def _apply_line(db, tyre_id: int, delta: int):
+    """Move one tyre's stock by delta; its new quantity, or None if short."""
+    stmt = (
+        update(TyreModel)
+        .where(TyreModel.id == tyre_id)
+        .where(TyreModel.shards == 0)
+        .where(TyreModel.quantity + delta >= TyreModel.reserved)
+        .where(TyreModel.quantity + delta >= TyreModel.located)
+        .values(quantity=TyreModel.quantity + delta, **crud.write_stamp(db))
+        .returning(TyreModel.quantity)
+    )
+    quantity = db.execute(stmt).scalar_one_or_none()
+    if quantity is None and crud.adjust_sharded_stock(db, tyre_id, delta):
+        quantity = db.execute(
+            select(crud.TYRE_STOCK).where(TyreModel.id == tyre_id)
+        ).scalar_one()
+    elif quantity is None and crud.unassign_stock(db, tyre_id, TyreModel.quantity + delta):
+        quantity = db.execute(stmt).scalar_one()
+    return quantity
+
+
+def _apply_order(db, data: dict):
+    """Apply one order's lines under a savepoint: its new quantities, or
+    None with nothing written if any tyre is missing or short."""
+    sign = 1 if data["type"] == "BUY" else -1
+    deltas: dict[int, int] = {}
+    for item in data["items"]:
+        tyre_id = int(item["tyre_id"])
+        deltas[tyre_id] = deltas.get(tyre_id, 0) + sign * int(item["quantity"])
+
+    savepoint = db.begin_nested()
+    quantities = {}
+    for tyre_id in sorted(deltas):
+        quantity = _apply_line(db, tyre_id, deltas[tyre_id])
+        if quantity is None:
+            savepoint.rollback()
+            print(
+                f"[order_worker.py] Rejecting {_event_id(data) or 'order'}: tyre {tyre_id} "
+                f"not found or not enough stock for {deltas[tyre_id]}"
+            )
+            WORKER_FAILURES.labels("order", "stock_rejected").inc()
+            return None
+        quantities[tyre_id] = quantity
+    savepoint.commit()
+    return quantities
+
+
+def apply_orders(db, orders: list) -> dict:
+    """Apply a batch of order.created payloads in one transaction.
+
+    The batch's tyre rows are locked up front in id order (the lock order
+    adjust_stock_batch uses), then each order is applied on its own, in
+    arrival order, so an order is checked against the stock the ones
+    before it left. An order is all or nothing: a missing or short tyre
+    rejects it and is logged. Stock never drops below what is reserved; a
+    sale unassigned stock cannot cover takes the rest from locations
+    (crud.unassign_stock).
+
+    Applied and rejected orders alike are claimed in processed_events, so
+    redelivery is a no-op. Each updated tyre queues a tyre.stock.changed
+    outbox event. Returns the new quantity of each updated tyre.
+    """
+    insert = dialect_insert(db.get_bind())
+    tyre_ids = sorted({int(item["tyre_id"]) for data in orders for item in data["items"]})
+    db.execute(
+        select(TyreModel.id)
+        .where(TyreModel.id.in_(tyre_ids))
+        .order_by(TyreModel.id)
+        .with_for_update()
+    ).all()
 
-                for item in data["items"]:
-                    tyre = db.get(TyreModel, item["tyre_id"])
-                    if not tyre:
-                        print("Tyre not found")
-                        continue
+    updated = {}
+    for data in orders:
+        event_id = _event_id(data)
+        if event_id is not None:
+            claimed = db.execute(
+                insert(ProcessedEventModel)
+                .values(event_id=event_id)
+                .on_conflict_do_nothing()
+            ).rowcount
+            if not claimed:
+                print(f"[order_worker.py] Skipping already processed {event_id}")
+                continue
+        updated.update(_apply_order(db, data) or {})
 
-                    if order_type == "BUY":
-                        tyre.quantity += item["quantity"]
-                    else:
-                        tyre.quantity -= item["quantity"]
+    if updated:
+        crud.record_changes(db, list(updated), crud.STOCK_CHANGED)
+    db.commit()
+    if updated:
+        invalidate_tyres(*updated)
+    return updated
 
-                    db.add(tyre)
 
-                db.commit()
+def _apply_in_session(orders: list) -> dict:
+    db = SessionLocal()
+    try:
+        return apply_orders(db, orders)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
+
+async def _requeue(messages: list, error: Exception):
+    """Back off, then hand messages back to the broker for redelivery."""
+    global _retry_delay
+    _retry_delay = min(max(_retry_delay * 2, RETRY_DELAY), RETRY_DELAY_MAX)
+    print(f"[order_worker.py] Database unavailable, requeueing {len(messages)} "
+          f"in {_retry_delay}s: {error!r}")
+    WORKER_FAILURES.labels("order", "db_unavailable").inc(len(messages))
+    await asyncio.sleep(_retry_delay)
+    for msg in messages:
+        await msg.nack(requeue=True)
+
+
+async def _apply_one_by_one(orders: list, pending: list):
+    global _retry_delay
+    for data, msg in zip(orders, pending):
+        try:
+            await run_db(_apply_in_session, [data])
+        except TRANSIENT_ERRORS as e:
+            await _requeue([msg], e)
         except Exception as e:
-            print("ERROR:", e)
-            db.rollback()
-        finally:
-            db.close()
+            print(f"[order_worker.py] Dead-lettering {_event_id(data) or 'order'}: {e!r}")
+            WORKER_FAILURES.labels("order", "db_error").inc()
+            await msg.reject(requeue=False)
+        else:
+            _retry_delay = 0.0
+            await msg.ack()
+
+
+async def process_batch(messages: list):
+    global _retry_delay
+    start = time.perf_counter()
+    orders = []
+    pending = []
+    for msg in messages:
+        if msg.routing_key != "order.created":
+            await msg.ack()
+            continue
+        data = _parse_order(msg)
+        if data is None:
+            await msg.reject(requeue=False)
+            continue
+        print(f"[order_worker.py] Received {msg.routing_key}: {data}")
+        orders.append(data)
+        pending.append(msg)
+
+    if not pending:
+        return
+
+    WORKER_BATCH_SIZE.labels("order").observe(len(pending))
+    try:
+        await run_db(_apply_in_session, orders)
+    except TRANSIENT_ERRORS as e:
+        await _requeue(pending, e)
+        return
+    except Exception as e:
+        # Requeueing the batch would fail it again on every redelivery if
+        # one order is at fault: apply them one by one instead and
+        # dead-letter whichever fails on its own.
+        print(f"[order_worker.py] Batch of {len(pending)} failed, applying one by one: {e!r}")
+        await _apply_one_by_one(orders, pending)
+    else:
+        _retry_delay = 0.0
+        for msg in pending:
+            await msg.ack()
+    elapsed = time.perf_counter() - start
+    for _ in pending:
+        WORKER_MESSAGE_SECONDS.labels("order").observe(elapsed)
+
+
+async def process_message(msg: aio_pika.IncomingMessage):
+    await process_batch([msg])
+
+
+async def consume_batches(buffer: asyncio.Queue, stopping: asyncio.Event):
+    # Runs until shutdown is requested and the buffer has been drained.
+    loop = asyncio.get_running_loop()
+    while not (stopping.is_set() and buffer.empty()):
+        try:
+            batch = [await asyncio.wait_for(buffer.get(), 0.5)]
+        except asyncio.TimeoutError:
+            continue
+        deadline = loop.time() + BATCH_WINDOW
+        while len(batch) < BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(buffer.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        await process_batch(batch)
 
 
 async def main():
+    start_worker_metrics_server()
     connection = await aio_pika.connect_robust(RABBIT_URL)
     channel = await connection.channel()
+    await channel.set_qos(prefetch_count=PREFETCH)
 
     exchange = await channel.declare_exchange(EXCHANGE, aio_pika.ExchangeType.TOPIC)
-    queue = await channel.declare_queue("", exclusive=True)
+    dead_letters = await channel.declare_exchange(
+        DEAD_LETTER_EXCHANGE, aio_pika.ExchangeType.FANOUT, durable=True
+    )
+    dead_letter_queue = await channel.declare_queue(DEAD_LETTER_QUEUE, durable=True)
+    await dead_letter_queue.bind(dead_letters)
+    queue = await channel.declare_queue(
+        "", exclusive=True, arguments={"x-dead-letter-exchange": DEAD_LETTER_EXCHANGE}
+    )
 
     await queue.bind(exchange, routing_key="order.created")
 
-    print("[order_worker.py] Listening for 'order.created'...")
+    print(f"[order_worker.py] Listening for 'order.created' (concurrency {CONCURRENCY})...")
 
-    await queue.consume(process_message)
+    stopping = stop_on_signals()
+    buffer: asyncio.Queue = asyncio.Queue()
+    consumer_tag = await queue.consume(buffer.put)
+    consumers = [
+        asyncio.create_task(consume_batches(buffer, stopping)) for _ in range(CONCURRENCY)
+    ]
 
-    await asyncio.Future()  # keep alive
+    await stopping.wait()
+    print("[order_worker.py] Shutting down; draining in-flight batches")
+    await queue.cancel(consumer_tag)
+    await drain(consumers)
+    await connection.close()
+    shutdown_executor()
 
 if __name__ == "__main__":
     asyncio.run(main())
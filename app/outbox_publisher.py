@@ -0,0 +1,119 @@
+# tyres_service/app/outbox_publisher.py
+# Relays the outbox (tyre change events queued by crud.record_changes in
+# the writer's transaction) to the topic_logs exchange as
+# tyre.stock.changed / tyre.price.changed. Runs as its own process
+# (python -m app.outbox_publisher).
+#
+# Delivery is at-least-once: a batch is published, each message
+# confirmed by the broker, before its rows are deleted, so a crash in
+# between publishes the batch again. message_id is the outbox id, which
+# consumers can use to drop repeats. Events go out in outbox id order,
+# which is commit order per tyre. Run a single publisher: a second one
+# blocks on the first one's row locks and so only acts as a standby.
+import aio_pika
+import asyncio
+import json
+import os
+
+from sqlalchemy import delete, select
+
+from app.database import SessionLocal
+from app.metrics import WORKER_BATCH_SIZE, WORKER_FAILURES, start_worker_metrics_server
+from app.models import OutboxModel
+from app.worker_runtime import run_db, shutdown_executor, stop_on_signals
+
+RABBIT_URL = os.getenv("RABBIT_URL")
+EXCHANGE = "topic_logs"
+
+# Events relayed per transaction, and how long to wait once the outbox
+# is empty before looking again.
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+
+
+def claim_batch(db, batch_size: int) -> list:
+    """The oldest batch_size events, locked until this transaction ends."""
+    return db.execute(
+        select(OutboxModel).order_by(OutboxModel.id).limit(batch_size).with_for_update()
+    ).scalars().all()
+
+
+def delete_relayed(db, event_ids: list) -> None:
+    db.execute(delete(OutboxModel).where(OutboxModel.id.in_(event_ids)))
+    db.commit()
+
+
+def event_body(event: OutboxModel) -> dict:
+    return {
+        "event_id": event.id,
+        "tyre_id": event.tyre_id,
+        "quantity": event.quantity,
+        "reserved": event.reserved,
+        "available": event.quantity - event.reserved,
+        "retail_cost": str(event.retail_cost),
+        "version": event.version,
+        "occurred_at": event.created_at.isoformat(),
+    }
+
+
+def event_message(event: OutboxModel) -> aio_pika.Message:
+    return aio_pika.Message(
+        body=json.dumps(event_body(event)).encode(),
+        content_type="application/json",
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        message_id=str(event.id),
+    )
+
+
+async def relay_batch(exchange, batch_size: int = BATCH_SIZE) -> int:
+    """Publish and delete one batch of events; returns how many. If a
+    publish fails the transaction is rolled back and the whole batch stays
+    in the outbox for the next attempt."""
+    db = SessionLocal()
+    try:
+        events = await run_db(claim_batch, db, batch_size)
+        # One at a time: concurrent publishes could reorder a tyre's events.
+        for event in events:
+            await exchange.publish(event_message(event), routing_key=event.routing_key)
+        if events:
+            await run_db(delete_relayed, db, [event.id for event in events])
+        WORKER_BATCH_SIZE.labels("outbox").observe(len(events))
+        return len(events)
+    finally:
+        await run_db(db.close)
+
+
+async def relay(exchange, stopping: asyncio.Event, batch_size: int = BATCH_SIZE) -> None:
+    """Relay until stopping is set, polling while the outbox is empty."""
+    while not stopping.is_set():
+        try:
+            relayed = await relay_batch(exchange, batch_size)
+        except Exception as e:
+            print("ERROR:", e)
+            WORKER_FAILURES.labels("outbox", "publish_error").inc()
+            relayed = 0
+        if relayed < batch_size:
+            try:
+                await asyncio.wait_for(stopping.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def main():
+    start_worker_metrics_server()
+    connection = await aio_pika.connect_robust(RABBIT_URL)
+    # Publisher confirms: publish() returns once the broker has the message.
+    channel = await connection.channel(publisher_confirms=True)
+    exchange = await channel.declare_exchange(EXCHANGE, aio_pika.ExchangeType.TOPIC)
+
+    print(f"[outbox_publisher] Relaying outbox to {EXCHANGE} (batch {BATCH_SIZE})")
+    stopping = stop_on_signals()
+    await relay(exchange, stopping)
+
+    print("[outbox_publisher] Shutting down")
+    await connection.close()
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+# tyres_service/app/pricing.py
+# Retail prices from pricing rules. A rule sets the markup for tyres
+# matching its supplier, brand and/or season (criteria left unset match
+# any tyre); of the rules matching a tyre the highest priority wins, then
+# the most specific, then the oldest. Tyres no rule matches are priced at
+# RETAIL_MARKUP, as before rules existed.
+#
+# Rules are compiled into a PricingRules, which prices a tyre in Python
+# (inserts, where every field is at hand) or as a SQL CASE (UPDATEs,
+# including the set-based repricing in crud.reprice_tyres). The compiled
+# rules are cached per process: rule writes drop them, and a change made
+# by another process is picked up within PRICING_RULES_TTL seconds.
+import os
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import Numeric, and_, case, func, literal, select, true
+from sqlalchemy.orm import Session
+
+from app.models import PricingRuleModel, TyreModel
+
+# Markup where no rule matches; configurable so the business can change
+# its default margin without a code change.
+RETAIL_MARKUP = Decimal(os.getenv("RETAIL_MARKUP", "1.35"))
+PRICING_RULES_TTL = float(os.getenv("PRICING_RULES_TTL", "30"))
+
+# Tyre fields a rule can match on.
+RULE_FIELDS = ("supplier", "brand", "season")
+MARKUP_TYPE = Numeric(6, 4)
+CENT = Decimal("0.01")
+
+
+def retail_price(cost: Decimal, markup: Decimal = RETAIL_MARKUP) -> Decimal:
+    # Half up, as Postgres rounds numerics, so Python and SQL prices agree.
+    return (cost * markup).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PricingRules:
+    """Rules in the order they are tried: [(criteria, markup)]."""
+
+    def __init__(self, rules, default: Decimal = RETAIL_MARKUP):
+        self.default = default
+        ranked = []
+        for rule in rules:
+            criteria = {
+                field: getattr(rule, field)
+                for field in RULE_FIELDS
+                if getattr(rule, field) is not None
+            }
+            ranked.append(((-rule.priority, -len(criteria), rule.id), criteria, rule.markup))
+        ranked.sort(key=lambda item: item[0])
+        self.rules = [(criteria, markup) for _rank, criteria, markup in ranked]
+        # Writes to these fields can change a tyre's markup.
+        self.fields = {field for criteria, _markup in self.rules for field in criteria}
+        self._keys = tuple(sorted(self.fields))
+        # Markup by the tyre's values of those fields; a catalogue has few
+        # distinct combinations, so bulk imports mostly hit this.
+        self._markups: dict[tuple, Decimal] = {}
+
+    def markup_for(self, tyre: dict) -> Decimal:
+        key = tuple(tyre[field] for field in self._keys)
+        markup = self._markups.get(key)
+        if markup is None:
+            markup = self._markups[key] = next(
+                (
+                    markup
+                    for criteria, markup in self.rules
+                    if all(tyre[field] == value for field, value in criteria.items())
+                ),
+                self.default,
+            )
+        return markup
+
+    def retail_price(self, tyre: dict) -> Decimal:
+        return retail_price(tyre["cost"], self.markup_for(tyre))
+
+    def markup_sql(self, fields=None):
+        """The markup as a CASE over the tyre's columns, or over the SQL
+        expressions in fields ({field: expression}) where given."""
+        fields = {**{field: getattr(TyreModel, field) for field in RULE_FIELDS}, **(fields or {})}
+        default = literal(self.default, MARKUP_TYPE)
+        if not self.rules:
+            return default
+        whens = [
+            (
+                and_(*(fields[field] == value for field, value in criteria.items()))
+                if criteria else true(),
+                literal(markup, MARKUP_TYPE),
+            )
+            for criteria, markup in self.rules
+        ]
+        return case(*whens, else_=default)
+
+    def retail_cost_sql(self, cost=TyreModel.cost, fields=None):
+        """SQL for the retail price of cost (the tyre's cost by default)."""
+        return func.round(cost * self.markup_sql(fields), 2)
+
+
+_rules = None
+_rules_loaded_at = 0.0
+
+
+def drop_pricing_rules() -> None:
+    global _rules
+    _rules = None
+
+
+def pricing_rules(db: Session) -> PricingRules:
+    # No lock: two requests racing to reload both build the same rules,
+    # and one query must not hold up the event loop (ASYNC_DB).
+    global _rules, _rules_loaded_at
+    rules = _rules
+    if rules is None or time.monotonic() - _rules_loaded_at > PRICING_RULES_TTL:
+        rules = PricingRules(db.execute(select(PricingRuleModel)).scalars().all())
+        _rules, _rules_loaded_at = rules, time.monotonic()
+    return rules
@@ -0,0 +1,34 @@
+# tyres_service/app/reprice_job.py
+# Applies the pricing rules to the whole catalogue (crud.reprice_tyres),
+# printing progress after each chunk. Safe to interrupt and rerun: each
+# chunk commits on its own and tyres already at their price are skipped.
+#
+#   python -m app.reprice_job [--chunk-size 1000]
+import argparse
+
+from app import crud
+from app.database import SessionLocal, wait_for_database
+
+
+def report(done: int, total: int, repriced: int) -> None:
+    percent = done * 100 // total if total else 100
+    print(f"[reprice_job] {done}/{total} tyres ({percent}%) checked, {repriced} repriced")
+
+
+def main(chunk_size: int) -> dict:
+    wait_for_database()
+    db = SessionLocal()
+    try:
+        return crud.reprice_tyres(db, chunk_size, progress=report)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reprice every tyre from the pricing rules")
+    parser.add_argument("--chunk-size", type=int, default=crud.REPRICE_CHUNK_SIZE,
+                        help="tyres per UPDATE and transaction")
+    args = parser.parse_args()
+    result = main(args.chunk_size)
+    print(f"[reprice_job] Done: {result['repriced']} of {result['total']} tyres repriced "
+          f"in {result['chunks']} chunk(s)")
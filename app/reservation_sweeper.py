@@ -0,0 +1,54 @@
+# tyres_service/app/reservation_sweeper.py
+# Returns expired stock holds to availability. Runs as its own process
+# (python -m app.reservation_sweeper); several can run side by side, as
+# each batch skips rows another sweeper has locked.
+import asyncio
+import os
+
+from app import crud
+from app.database import SessionLocal
+from app.metrics import WORKER_BATCH_SIZE, WORKER_FAILURES, start_worker_metrics_server
+from app.worker_runtime import run_db, shutdown_executor, stop_on_signals
+
+SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "5"))
+
+
+def sweep(batch_size: int = crud.RESERVATION_SWEEP_BATCH) -> int:
+    """Expire overdue holds batch by batch until none are left. Blocking."""
+    db = SessionLocal()
+    try:
+        total = 0
+        while True:
+            expired = crud.expire_reservations(db, batch_size)
+            WORKER_BATCH_SIZE.labels("sweeper").observe(expired)
+            total += expired
+            if expired < batch_size:
+                return total
+    finally:
+        db.close()
+
+
+async def main():
+    start_worker_metrics_server()
+    stopping = stop_on_signals()
+    print(f"[reservation_sweeper] Sweeping expired holds every {SWEEP_INTERVAL}s")
+
+    while not stopping.is_set():
+        try:
+            expired = await run_db(sweep)
+            if expired:
+                print(f"[reservation_sweeper] Expired {expired} reservation(s)")
+        except Exception as e:
+            print("ERROR:", e)
+            WORKER_FAILURES.labels("sweeper", "error").inc()
+        try:
+            await asyncio.wait_for(stopping.wait(), SWEEP_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+    print("[reservation_sweeper] Shutting down")
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
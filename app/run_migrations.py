@@ -8,13 +8,14 @@ from alembic import command
 from alembic.config import Config
 from sqlalchemy import inspect
 
-from app.database import engine
+from app.database import engine, wait_for_database
 
 BASELINE_REVISION = "0001"
 BASELINE_TABLE = "tyres"
 
 
 def main() -> None:
+    wait_for_database()
     cfg = Config("alembic.ini")
     tables = inspect(engine).get_table_names()
 
@@ -1,8 +1,9 @@
 # backend/tyres_service/schemas.py
-from pydantic import BaseModel, StringConstraints
+from pydantic import BaseModel, ConfigDict, PlainSerializer, StringConstraints
 from typing import Annotated, Literal, Optional
+from datetime import datetime
 from decimal import Decimal
-from annotated_types import Ge, Gt, Le
+from annotated_types import Ge, Gt, Le, MaxLen, MinLen
 
 # -------------------------------------------------
 #                Reusable Shared Types
@@ -19,6 +20,9 @@ LoadRateInt = Annotated[int, Gt(0)]
 NoiseLevelInt = Annotated[int, Gt(0)]
 PositiveDecimal = Annotated[Decimal, Gt(0)]
 QuantityInt = Annotated[int, Ge(0)]
+MarkupDecimal = Annotated[Decimal, Gt(0), Le(10)]
+# Money goes out as a JSON number, as the API has always returned it.
+JsonDecimal = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
 
 # Literal types
 SpeedRate = Literal[
@@ -59,10 +63,198 @@ class TyreCreate(TyreSchema):
     pass
 
 
+class TyreOut(BaseModel):
+    """A tyre as the API returns it. Built from ORM objects, result rows or
+    cached column dicts; deliberately unconstrained, as the data was
+    validated on the way in."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    brand: str
+    model: str
+    size: str
+    load_rate: int
+    speed_rate: str
+    season: str
+    supplier: str
+    fuel_efficiency: str
+    noise_level: int
+    weather_efficiency: str
+    ev_approved: bool
+    cost: JsonDecimal
+    quantity: int
+    retail_cost: JsonDecimal
+    version: int
+    reserved: int
+    shards: int
+    change_seq: int
+    located: int
+
+
+class TyreSearchHit(TyreOut):
+    score: float
+
+
+class TyreTombstone(BaseModel):
+    id: int
+    change_seq: int
+
+
+class TyreChanges(BaseModel):
+    """Change feed page: tyres written and deleted since a position, the
+    position to continue from, and whether more changes follow it."""
+    changes: list[TyreOut]
+    deleted: list[TyreTombstone]
+    next_since: int
+    has_more: bool
+
+
+class FacetCount(BaseModel):
+    value: str | bool
+    count: int
+
+
+class PriceRange(BaseModel):
+    min: Optional[JsonDecimal] = None
+    max: Optional[JsonDecimal] = None
+
+
+class TyreFacets(BaseModel):
+    total: int
+    retail_cost: PriceRange
+    facets: dict[str, list[FacetCount]]
+
+
+class TyreFilters(BaseModel):
+    """Catalogue filters for GET /api/tyres; every field is applied in SQL."""
+    brand: Optional[BrandStr] = None
+    size: Optional[SizeStr] = None
+    season: Optional[Season] = None
+    speed_rate: Optional[SpeedRate] = None
+    ev_approved: Optional[bool] = None
+    min_price: Optional[Annotated[Decimal, Ge(0)]] = None
+    max_price: Optional[Annotated[Decimal, Ge(0)]] = None
+    in_stock: bool = False
+
+
 class StockAdjust(BaseModel):
     """Atomic stock adjustment: negative delta sells stock, positive restores it."""
     delta: Annotated[int, Ge(-1000), Le(1000)]
 
+
+class StockAdjustLine(StockAdjust):
+    tyre_id: int
+
+
+class StockAdjustBatch(BaseModel):
+    """Several stock adjustments applied all-or-nothing in one transaction."""
+    items: Annotated[list[StockAdjustLine], MinLen(1), MaxLen(500)]
+
+class StockShards(BaseModel):
+    """Split a hot tyre's stock over count slots; 0 merges it back."""
+    count: Annotated[int, Ge(0), Le(64)]
+
+
+class ReservationCreate(BaseModel):
+    """Hold stock for checkout; expires after ttl_seconds unless confirmed."""
+    quantity: Annotated[int, Gt(0), Le(1000)]
+    ttl_seconds: Optional[Annotated[int, Gt(0), Le(3600)]] = None
+
+
+class ReservationOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    tyre_id: int
+    quantity: int
+    status: str
+    expires_at: datetime
+
+
+class TyreAvailability(BaseModel):
+    tyre_id: int
+    quantity: int
+    reserved: int
+    available: int
+
+
+class LocationCreate(BaseModel):
+    code: Annotated[str, StringConstraints(min_length=1, max_length=20)]
+    name: Annotated[str, StringConstraints(min_length=1, max_length=100)]
+    latitude: Annotated[float, Ge(-90), Le(90)]
+    longitude: Annotated[float, Ge(-180), Le(180)]
+
+
+class LocationOut(LocationCreate):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+
+
+class LocationStockAdjust(StockAdjust):
+    """Stock received (positive delta) or taken (negative) at a location.
+    With transfer, the units move between the location and the tyre's
+    unassigned stock instead, and the tyre's total is unchanged."""
+    transfer: bool = False
+
+
+class LocationStock(BaseModel):
+    location_id: int
+    code: str
+    name: str
+    quantity: int
+
+
+class TyreLocations(BaseModel):
+    """A tyre's stock by location; unassigned is the part of quantity held
+    at no location."""
+    tyre_id: int
+    quantity: int
+    reserved: int
+    unassigned: int
+    locations: list[LocationStock]
+
+
+class StockAllocate(BaseModel):
+    """Take quantity units from the location nearest to a point."""
+    quantity: Annotated[int, Gt(0), Le(1000)]
+    latitude: Annotated[float, Ge(-90), Le(90)]
+    longitude: Annotated[float, Ge(-180), Le(180)]
+
+
+class StockAllocation(LocationStock):
+    tyre_id: int
+    distance_km: float
+
+
+class PricingRuleIn(BaseModel):
+    """Markup for the tyres matching every criterion given; criteria left
+    out match any tyre. The highest priority matching rule wins."""
+    supplier: Optional[SupplierStr] = None
+    brand: Optional[BrandStr] = None
+    season: Optional[Season] = None
+    markup: MarkupDecimal
+    priority: int = 0
+
+
+class PricingRuleOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    supplier: Optional[str]
+    brand: Optional[str]
+    season: Optional[str]
+    markup: JsonDecimal
+    priority: int
+    updated_at: datetime
+
+
+class RepriceResult(BaseModel):
+    total: int
+    repriced: int
+    chunks: int
+
+
 class TyreUpdate(BaseModel):
     brand: Optional[BrandStr] = None
     model: Optional[ModelStr] = None
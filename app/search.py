@@ -0,0 +1,217 @@
+# tyres_service/app/search.py
+# Counter search: "205 55 16", "michelin pilot", "pilto 225/40zr18".
+# A size in the query, in any notation, becomes a digits-only prefix match
+# on the tyre's size; the remaining words must each match the brand, model
+# or supplier by prefix or, failing that, fuzzily (trigram similarity).
+#
+# On Postgres this runs in SQL against the tsvector/trigram/size-key
+# expression indexes from migration 0009. Elsewhere (SQLite in tests and
+# local dev) a pure-Python inverted index over the catalogue stands in;
+# it is rebuilt after local writes and at most every SEARCH_INDEX_TTL
+# seconds otherwise.
+import bisect
+import os
+import re
+import time
+
+from sqlalchemy import func, literal, literal_column, or_, select
+from sqlalchemy.dialects import postgresql  # noqa: F401 - registers func.to_tsvector & co.
+from sqlalchemy.orm import Session
+
+from app.cache import on_tyre_write
+from app.crud import TYRE_COLUMNS, load_tyres
+from app.models import TyreModel
+
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "30"))
+# Minimum trigram similarity for a fuzzy word match (pg_trgm's default
+# similarity_threshold). Postgres matches with <% (word_similarity), whose
+# own threshold defaults to 0.6: each search sets it to this value, so
+# both backends return the same hits.
+SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.3"))
+
+# 205/55R16, 205 55 16, 205-55-16, 225/40ZR18, or a prefix of one.
+SIZE_RE = re.compile(
+    r"(?<!\d)(\d{3})(?:\s*[/ -]?\s*(\d{2})(?:\s*(?:zr|r|/|-)?\s*(\d{2}))?)?(?!\d)"
+)
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Keep these expressions in step with the indexes in migration 0009:
+# Postgres only uses an expression index when the query repeats it.
+SEARCH_TEXT = func.lower(
+    TyreModel.brand
+    + literal_column("' '")
+    + TyreModel.model
+    + literal_column("' '")
+    + TyreModel.supplier
+)
+SEARCH_VECTOR = func.to_tsvector(literal_column("'simple'"), SEARCH_TEXT)
+SIZE_KEY = func.regexp_replace(
+    TyreModel.size, literal_column("'[^0-9]'"), literal_column("''"), literal_column("'g'")
+)
+
+
+def parse_query(q: str):
+    """(size digits or None, words) from a free-text query."""
+    q = q.lower()
+    size_key = None
+    match = SIZE_RE.search(q)
+    if match:
+        size_key = "".join(group or "" for group in match.groups())
+        q = q[:match.start()] + " " + q[match.end():]
+    return size_key, WORD_RE.findall(q)
+
+
+def size_key(size: str) -> str:
+    return re.sub(r"\D", "", size)
+
+
+def trigrams(word: str) -> set:
+    """pg_trgm-style trigrams: the word padded with two leading blanks and one trailing."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+# -----------------------------
+# Pure-Python inverted index
+# -----------------------------
+class SearchIndex:
+    """Word -> tyre ids, with a sorted word list for prefix lookups and a
+    trigram -> words map for fuzzy ones."""
+
+    def __init__(self, rows):
+        self.sizes = {}
+        self.postings: dict[str, set] = {}
+        for row in rows:
+            self.sizes[row.id] = size_key(row.size)
+            for word in WORD_RE.findall(f"{row.brand} {row.model} {row.supplier}".lower()):
+                self.postings.setdefault(word, set()).add(row.id)
+        self.words = sorted(self.postings)
+        self.word_trigrams = {word: trigrams(word) for word in self.words}
+        self.by_trigram: dict[str, set] = {}
+        for word, grams in self.word_trigrams.items():
+            for gram in grams:
+                self.by_trigram.setdefault(gram, set()).add(word)
+
+    def _word_scores(self, term: str) -> dict:
+        """{tyre id: best score} for one query word."""
+        scores = {}
+        start = bisect.bisect_left(self.words, term)
+        for word in self.words[start:bisect.bisect_right(self.words, term + "\uffff")]:
+            score = 1.0 if word == term else 0.75
+            for tyre_id in self.postings[word]:
+                scores[tyre_id] = max(scores.get(tyre_id, 0.0), score)
+
+        grams = trigrams(term)
+        candidates = set().union(*(self.by_trigram.get(gram, ()) for gram in grams))
+        for word in candidates:
+            sim = similarity(grams, self.word_trigrams[word])
+            if sim >= SIMILARITY_THRESHOLD:
+                for tyre_id in self.postings[word]:
+                    scores[tyre_id] = max(scores.get(tyre_id, 0.0), sim * 0.6)
+        return scores
+
+    def search(self, size: str, words: list, limit: int) -> list:
+        """[(tyre id, score)], best first."""
+        if size:
+            totals = {tid: 0.0 for tid, key in self.sizes.items() if key.startswith(size)}
+        else:
+            totals = None
+        for term in words:
+            scores = self._word_scores(term)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {
+                    tid: total + scores[tid] for tid, total in totals.items() if tid in scores
+                }
+        if not totals:
+            return []
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+_index = None
+_index_built_at = 0.0
+# Bumped by every drop, so a build that raced a write is not kept.
+_index_generation = 0
+
+
+@on_tyre_write
+def drop_search_index() -> None:
+    global _index, _index_generation
+    _index = None
+    _index_generation += 1
+
+
+def search_index(db: Session) -> SearchIndex:
+    # No lock, as in pricing.pricing_rules: under ASYNC_DB this runs on
+    # the event loop, which must not block on another request's query.
+    # Requests racing to rebuild each build the index and the last one is
+    # kept; swapping the global is atomic.
+    global _index, _index_built_at
+    index = _index
+    if index is None or time.monotonic() - _index_built_at > SEARCH_INDEX_TTL:
+        generation = _index_generation
+        rows = db.execute(
+            select(TyreModel.id, TyreModel.brand, TyreModel.model, TyreModel.supplier,
+                   TyreModel.size)
+        ).all()
+        index = SearchIndex(rows)
+        if generation == _index_generation:
+            _index, _index_built_at = index, time.monotonic()
+    return index
+
+
+# -----------------------------
+# Postgres
+# -----------------------------
+def postgres_search_stmt(size: str, words: list, limit: int):
+    stmt = select(*TYRE_COLUMNS)
+    score = literal(0.0)
+    if size:
+        stmt = stmt.where(SIZE_KEY.like(f"{size}%"))
+    if words:
+        prefix_query = func.to_tsquery(
+            literal_column("'simple'"), " & ".join(f"{word}:*" for word in words)
+        )
+        for word in words:
+            stmt = stmt.where(
+                or_(
+                    SEARCH_VECTOR.op("@@")(
+                        func.to_tsquery(literal_column("'simple'"), f"{word}:*")
+                    ),
+                    literal(word).op("<%")(SEARCH_TEXT),
+                )
+            )
+        score = func.ts_rank(SEARCH_VECTOR, prefix_query) + func.word_similarity(
+            " ".join(words), SEARCH_TEXT
+        )
+    return stmt.add_columns(score.label("score")).order_by(
+        score.desc(), TyreModel.id
+    ).limit(limit)
+
+
+def search_tyres(db: Session, q: str, limit: int) -> list:
+    """Ranked tyres (column dicts/rows plus a score) matching q."""
+    # Words are letters and digits only, so they are safe tsquery terms.
+    size, words = parse_query(q)
+    if not size and not words:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        # For this transaction only: <% reads it.
+        db.execute(select(func.set_config(
+            "pg_trgm.word_similarity_threshold", str(SIMILARITY_THRESHOLD), True
+        )))
+        return db.execute(postgres_search_stmt(size, words, limit)).all()
+
+    ranked = search_index(db).search(size, words, limit)
+    tyres = load_tyres(db, [tyre_id for tyre_id, _score in ranked])
+    return [
+        {**tyres[tyre_id], "score": round(score, 4)}
+        for tyre_id, score in ranked
+        if tyre_id in tyres
+    ]
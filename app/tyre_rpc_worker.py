@@ -3,44 +3,118 @@ import aio_pika
 import asyncio
 import os
 import json
+import time
 
+from app import crud
+from app.cache import tyre_cache
 from app.database import SessionLocal
-from app.models import TyreModel
+from app.metrics import (
+    WORKER_BATCH_SIZE, WORKER_FAILURES, WORKER_MESSAGE_SECONDS, start_worker_metrics_server,
+)
+from app.worker_runtime import drain, run_db, shutdown_executor, stop_on_signals
 
 RABBIT_URL = os.getenv("RABBIT_URL")
 EXCHANGE = "topic_logs"
 
+# Requests handled concurrently; the broker stops delivering once this
+# many are unacked.
+PREFETCH = int(os.getenv("RPC_WORKER_PREFETCH", "32"))
+# Upper bound on ids in one tyres.get request; larger requests are
+# refused rather than truncated, so no id goes unanswered.
+MAX_IDS = int(os.getenv("RPC_WORKER_MAX_IDS", "500"))
+
+
+def serialize_tyre(tyre: dict) -> dict:
+    return {
+        "id": tyre["id"],
+        "brand": tyre["brand"],
+        "model": tyre["model"],
+        "size": tyre["size"],
+        "supplier": tyre["supplier"],
+        "retail_cost": str(tyre["retail_cost"]),
+        "quantity": tyre["quantity"]
+    }
+
+
+def requested_ids(data: dict) -> list:
+    # Bulk form: {"tyre_ids": [...]}; single form: {"tyre_id": n}.
+    if "tyre_ids" in data:
+        tyre_ids = list(dict.fromkeys(int(i) for i in data["tyre_ids"]))
+        if len(tyre_ids) > MAX_IDS:
+            raise ValueError(f"At most {MAX_IDS} tyre ids per request, got {len(tyre_ids)}")
+        return tyre_ids
+    return [int(data.get("tyre_id"))]
+
+
+def cached_tyres(tyre_ids: list):
+    """Split ids into cached tyres and ids still to fetch."""
+    found = tyre_cache.get_many(tyre_ids)
+    return found, [tyre_id for tyre_id in tyre_ids if tyre_id not in found]
+
+
+def fetch_tyres(tyre_ids: list) -> dict:
+    """Fetch (and cache) cache misses in one query. Blocking."""
+    db = SessionLocal()
+    try:
+        return crud.fetch_tyres(db, tyre_ids)
+    finally:
+        db.close()
+
+
+def lookup_tyres(tyre_ids: list) -> dict:
+    found, misses = cached_tyres(tyre_ids)
+    if misses:
+        found.update(fetch_tyres(misses))
+    return found
+
+
+def format_response(data: dict, tyre_ids: list, found: dict) -> dict:
+    if "tyre_ids" in data:
+        return {
+            "ok": True,
+            "tyres": [serialize_tyre(found[i]) for i in tyre_ids if i in found],
+            "missing": [i for i in tyre_ids if i not in found],
+        }
+    tyre = found.get(tyre_ids[0])
+    if not tyre:
+        return {"ok": False}
+    return {"ok": True, "tyre": serialize_tyre(tyre)}
+
+
+def build_response(data: dict) -> dict:
+    try:
+        tyre_ids = requested_ids(data)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    return format_response(data, tyre_ids, lookup_tyres(tyre_ids))
+
+
 async def process_message(msg: aio_pika.IncomingMessage):
+    start = time.perf_counter()
     async with msg.process():
         data = json.loads(msg.body.decode())
         print(f"[tyre_rpc_worker] Received {msg.routing_key}: {data}")
 
-        db = SessionLocal()
         try:
-            tyre_id = data.get("tyre_id")
-            tyre = db.get(TyreModel, tyre_id)
-
-            if not tyre:
-                response = {"ok": False}
+            # Cache hits are answered on the loop (unless the cache is
+            # Redis, a round trip away); only misses touch the DB.
+            tyre_ids = requested_ids(data)
+            WORKER_BATCH_SIZE.labels("rpc").observe(len(tyre_ids))
+            if tyre_cache.blocks:
+                found, misses = await run_db(cached_tyres, tyre_ids)
             else:
-                response = {
-                    "ok": True,
-                    "tyre": {
-                        "id": tyre.id,
-                        "brand": tyre.brand,
-                        "model": tyre.model,
-                        "size": tyre.size,
-                        "supplier": tyre.supplier,
-                        "retail_cost": str(tyre.retail_cost),
-                        "quantity": tyre.quantity
-                    }
-                }
-
+                found, misses = cached_tyres(tyre_ids)
+            if misses:
+                found.update(await run_db(fetch_tyres, misses))
+            response = format_response(data, tyre_ids, found)
+        except ValueError as e:
+            print("Rejected:", e)
+            WORKER_FAILURES.labels("rpc", "rejected").inc()
+            response = {"ok": False, "error": str(e)}
         except Exception as e:
             print("ERROR:", e)
+            WORKER_FAILURES.labels("rpc", "error").inc()
             response = {"ok": False}
-        finally:
-            db.close()
 
         if msg.reply_to and msg.correlation_id:
             await msg.channel.default_exchange.publish(
@@ -50,20 +124,55 @@ async def process_message(msg: aio_pika.IncomingMessage):
                 ),
                 routing_key=msg.reply_to
             )
+    WORKER_MESSAGE_SECONDS.labels("rpc").observe(time.perf_counter() - start)
+
+async def drop_changed_tyre(msg: aio_pika.IncomingMessage):
+    """tyre.*.changed (outbox_publisher): evict the tyre from this worker's
+    cache, so writes made elsewhere are seen before TYRE_CACHE_TTL."""
+    try:
+        tyre_id = int(json.loads(msg.body.decode())["tyre_id"])
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"[tyre_rpc_worker] Ignoring malformed {msg.routing_key}: {e!r}")
+        return
+    if tyre_cache.blocks:
+        await run_db(tyre_cache.delete, tyre_id)
+    else:
+        tyre_cache.delete(tyre_id)
 
 async def main():
+    start_worker_metrics_server()
     connection = await aio_pika.connect_robust(RABBIT_URL)
     channel = await connection.channel()
+    await channel.set_qos(prefetch_count=PREFETCH)
 
     exchange = await channel.declare_exchange(EXCHANGE, aio_pika.ExchangeType.TOPIC)
     queue = await channel.declare_queue("rpc.tyres.get", durable=True)
 
     await queue.bind(exchange, routing_key="tyres.get")
+    changes = await channel.declare_queue("", exclusive=True)
+    await changes.bind(exchange, routing_key="tyre.*.changed")
+    await changes.consume(drop_changed_tyre, no_ack=True)
+
+    print(f"[tyre_rpc_worker] Listening for tyres.get (prefetch {PREFETCH})")
+
+    # Handle each delivery in its own task so up to PREFETCH requests
+    # are in flight at once.
+    in_flight = set()
+
+    async def dispatch(msg: aio_pika.IncomingMessage):
+        task = asyncio.create_task(process_message(msg))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
 
-    print("[tyre_rpc_worker] Listening for tyres.get")
+    stopping = stop_on_signals()
+    consumer_tag = await queue.consume(dispatch)
 
-    await queue.consume(process_message)
-    await asyncio.Future()
+    await stopping.wait()
+    print("[tyre_rpc_worker] Shutting down; draining in-flight requests")
+    await queue.cancel(consumer_tag)
+    await drain(in_flight)
+    await connection.close()
+    shutdown_executor()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,52 @@
+# tyres_service/app/worker_runtime.py
+# Shared plumbing for the RabbitMQ workers. SQLAlchemy here is
+# synchronous, so DB work runs on a bounded thread pool instead of the
+# event loop (which must stay free for heartbeats and deliveries), and
+# SIGTERM/SIGINT trigger a graceful drain instead of killing in-flight
+# messages.
+import asyncio
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Keep at or below the engine's pool size + overflow so threads do not
+# queue for connections.
+DB_THREADS = int(os.getenv("WORKER_DB_THREADS", "8"))
+SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "30"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="worker-db")
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run blocking DB work on the worker thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+def stop_on_signals() -> asyncio.Event:
+    """Event set on SIGTERM/SIGINT (where the platform supports it)."""
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # e.g. Windows dev machines; Ctrl+C still interrupts
+    return stopping
+
+
+async def drain(tasks, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+    """Wait for in-flight tasks, cancelling whatever outlives the timeout."""
+    tasks = [task for task in tasks if not task.done()]
+    if not tasks:
+        return
+    _done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        print(f"[worker] Cancelled {len(pending)} task(s) still running after {timeout}s")
+
+
+def shutdown_executor() -> None:
+    _executor.shutdown(wait=True)
@@ -0,0 +1,8 @@
+# tyres_service/benchmarks
+# Benchmarks that touch the app's database use DATABASE_URL, and default
+# to a scratch SQLite file here, not the compose Postgres; they create
+# their own tyres and delete them afterwards.
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite+pysqlite:///./bench_tyres.db")
+os.environ.setdefault("JWT_SECRET", "bench-secret-0123456789abcdef0123456789abcdef")
@@ -0,0 +1,205 @@
+# tyres_service/benchmarks/bench_api.py
+# In-process load generator: drives the FastAPI app through httpx's ASGI
+# transport (no server, no network) with a weighted mix of list, get and
+# stock-adjust requests from N concurrent clients, then runs an oversell
+# stress test: many buyers racing for the last units of one tyre through
+# POST /api/tyres/{id}/stock. Any sale beyond the stock fails the run.
+#
+# Uses DATABASE_URL (default: a scratch SQLite file, see __init__.py);
+# SQLite serializes writers, so write-heavy numbers mean most on Postgres.
+#
+#   python -m benchmarks.bench_api [--requests 2000] [--concurrency 16] [--output api.json]
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import jwt
+from sqlalchemy import delete, select
+
+from app import crud
+from app.auth import JWT_ALGORITHM, JWT_SECRET
+from app.cache import invalidate_tyres
+from app.database import SessionLocal, engine
+from app.main import app
+from app.models import Base, TyreModel
+from benchmarks.common import add_output_argument, emit, environment, summarize
+
+# Request weights per operation.
+MIXES = {
+    "read_heavy": {"list": 20, "get": 75, "adjust": 5},
+    "balanced": {"list": 10, "get": 50, "adjust": 40},
+    "write_heavy": {"get": 20, "adjust": 80},
+}
+
+
+def admin_headers() -> dict:
+    now = datetime.now(timezone.utc)
+    token = jwt.encode(
+        {"sub": "1", "user_id": 1, "name": "bench", "role": "admin", "iat": now,
+         "exp": now + timedelta(hours=1)},
+        JWT_SECRET,
+        algorithm=JWT_ALGORITHM,
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed(brand: str, tyres: int, quantity: int) -> list:
+    """Insert a catalogue under brand; returns the tyre ids."""
+    Base.metadata.create_all(bind=engine)
+    rows = [
+        {
+            "brand": brand, "model": f"Model {i}", "size": f"{195 + 10 * (i % 5)}/55R16",
+            "load_rate": 91, "speed_rate": "H", "season": ("Summer", "Winter")[i % 2],
+            "supplier": "Bench", "fuel_efficiency": "C", "noise_level": 70,
+            "weather_efficiency": "C", "ev_approved": bool(i % 3), "cost": "100.00",
+            "quantity": quantity,
+        }
+        for i in range(tyres)
+    ]
+    db = SessionLocal()
+    try:
+        crud.import_tyres(db, rows)
+        return db.scalars(
+            select(TyreModel.id).where(TyreModel.brand == brand).order_by(TyreModel.id)
+        ).all()
+    finally:
+        db.close()
+
+
+def cleanup(brand: str) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(TyreModel).where(TyreModel.brand == brand))
+        db.commit()
+    finally:
+        db.close()
+    invalidate_tyres()
+
+
+def make_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=admin_headers()
+    )
+
+
+async def run_mix(mix: dict, tyre_ids: list, requests: int, concurrency: int, brand: str):
+    operations = list(mix)
+    weights = [mix[op] for op in operations]
+    latencies = {op: [] for op in operations}
+    statuses: dict[str, int] = {}
+    remaining = requests
+
+    async def one(client, op):
+        tyre_id = random.choice(tyre_ids)
+        if op == "list":
+            return await client.get("/api/tyres", params={"brand": brand, "limit": 50})
+        if op == "get":
+            return await client.get(f"/api/tyres/{tyre_id}")
+        # +1/-1 in equal measure keeps stock roughly where it started.
+        return await client.post(f"/api/tyres/{tyre_id}/stock",
+                                 json={"delta": random.choice((-1, 1))})
+
+    async def worker(client):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            op = random.choices(operations, weights)[0]
+            start = time.perf_counter()
+            response = await one(client, op)
+            latencies[op].append(time.perf_counter() - start)
+            key = f"{op}:{response.status_code}"
+            statuses[key] = statuses.get(key, 0) + 1
+
+    async with make_client() as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_second": round(requests / elapsed, 1),
+        "latency": {op: summarize(samples) for op, samples in latencies.items() if samples},
+        "statuses": statuses,
+    }
+
+
+async def oversell_stress(brand: str, stock: int, buyers: int, concurrency: int) -> dict:
+    """buyers single-unit sales against stock units, concurrency at a time
+    (more in flight than the DB pool holds would just time out waiting)."""
+    tyre_id = seed(f"{brand}-hot", 1, stock)[0]
+    codes: dict[int, int] = {}
+    latencies = []
+    in_flight = asyncio.Semaphore(concurrency)
+
+    async with make_client() as client:
+        async def buy():
+            async with in_flight:
+                start = time.perf_counter()
+                response = await client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -1})
+                latencies.append(time.perf_counter() - start)
+            codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(buy() for _ in range(buyers)))
+        elapsed = time.perf_counter() - start
+        final = (await client.get(f"/api/tyres/{tyre_id}")).json()["quantity"]
+
+    sold = codes.get(200, 0)
+    return {
+        "stock": stock,
+        "buyers": buyers,
+        "concurrency": concurrency,
+        "sold": sold,
+        "rejected": codes.get(409, 0),
+        "errors": sum(n for code, n in codes.items() if code not in (200, 409)),
+        "final_quantity": final,
+        "oversold": max(0, sold - stock),
+        "consistent": final == stock - sold and final >= 0,
+        "sales_per_second": round(buyers / elapsed, 1),
+        "latency": summarize(latencies),
+    }
+
+
+def run(requests: int = 2000, concurrency: int = 16, tyres: int = 200,
+        stock: int = 50, buyers: int = 200) -> dict:
+    brand = f"Bench-{uuid.uuid4().hex[:8]}"
+    try:
+        tyre_ids = seed(brand, tyres, quantity=1000)
+        mixes = {
+            name: asyncio.run(run_mix(mix, tyre_ids, requests, concurrency, brand))
+            for name, mix in MIXES.items()
+        }
+        stress = asyncio.run(oversell_stress(brand, stock, buyers, concurrency))
+    finally:
+        cleanup(brand)
+        cleanup(f"{brand}-hot")
+    return {
+        "benchmark": "api_load",
+        "environment": environment(),
+        "database": engine.dialect.name,
+        "catalogue": tyres,
+        "mixes": mixes,
+        "oversell_stress": stress,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process API load generator")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per mix")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tyres", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=50, help="units in the oversell test")
+    parser.add_argument("--buyers", type=int, default=200, help="buyers in the oversell test")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    result = run(args.requests, args.concurrency, args.tyres, args.stock, args.buyers)
+    emit(result, args.output)
+    stress = result["oversell_stress"]
+    if stress["oversold"] or not stress["consistent"]:
+        sys.exit("Oversell stress test failed")
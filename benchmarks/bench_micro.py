@@ -0,0 +1,135 @@
+# tyres_service/benchmarks/bench_micro.py
+# Per-call cost of the hot helpers, with no database or HTTP in the way:
+#   - serializing one tyre: ORM object -> TyreOut -> orjson, and the old
+#     jsonable_encoder path for reference
+#   - retail pricing: the default markup (pricing.retail_price) and a tyre
+#     matched against compiled pricing rules (PricingRules.retail_price)
+#   - bearer token verification (auth.get_current_user), with the
+#     verified-token cache cold (a full jwt.decode) and warm
+#
+#   python -m benchmarks.bench_micro [--number 2000] [--repeat 20] [--output micro.json]
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import jwt
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import auth, pricing
+from app.models import PricingRuleModel, TyreModel
+from app.schemas import TyreOut
+from benchmarks.common import add_output_argument, emit, environment, summarize, time_calls
+
+
+def sample_tyre() -> TyreModel:
+    return TyreModel(
+        id=1, brand="Michelin", model="Pilot Sport 5", size="225/40R18", load_rate=92,
+        speed_rate="Y", season="Summer", supplier="Bench", fuel_efficiency="C",
+        noise_level=71, weather_efficiency="A", ev_approved=True, cost=Decimal("112.40"),
+        quantity=24, retail_cost=Decimal("151.74"), version=3, reserved=2, shards=0, located=0,
+        change_seq=1,
+    )
+
+
+def bench_serialization(number: int, repeat: int) -> dict:
+    tyre = sample_tyre()
+
+    def tyreout_orjson():
+        return orjson.dumps(TyreOut.model_validate(tyre).model_dump(mode="json"))
+
+    def jsonable_json():
+        return json.dumps(jsonable_encoder(TyreOut.model_validate(tyre))).encode()
+
+    return {
+        "tyreout_orjson": summarize(time_calls(tyreout_orjson, number, repeat), "us"),
+        "jsonable_encoder_json": summarize(time_calls(jsonable_json, number, repeat), "us"),
+    }
+
+
+def bench_pricing(number: int, repeat: int) -> dict:
+    costs = [Decimal(random.randrange(2000, 40000)) / 100 for _ in range(number)]
+    suppliers = [f"Supplier {i}" for i in range(20)]
+    brands = [f"Brand {i}" for i in range(20)]
+    seasons = ["Summer", "Winter", "All Season"]
+    rules = pricing.PricingRules([
+        PricingRuleModel(
+            id=i, supplier=random.choice((None, *suppliers)), brand=random.choice((None, *brands)),
+            season=random.choice((None, *seasons)),
+            markup=Decimal(random.randrange(110, 180)) / 100, priority=i % 5,
+        )
+        for i in range(50)
+    ])
+    tyres = [
+        {"cost": cost, "supplier": random.choice(suppliers), "brand": random.choice(brands),
+         "season": random.choice(seasons)}
+        for cost in costs
+    ]
+
+    def price_default():
+        for cost in costs:
+            pricing.retail_price(cost)
+
+    def price_rules():
+        for tyre in tyres:
+            rules.retail_price(tyre)
+
+    # time_calls measures per loop; report per priced tyre.
+    return {
+        "markup": str(pricing.RETAIL_MARKUP),
+        "retail_price": summarize(
+            [sample / number for sample in time_calls(price_default, 1, repeat)], "us"
+        ),
+        "rules": len(rules.rules),
+        "rules_retail_price": summarize(
+            [sample / number for sample in time_calls(price_rules, 1, repeat)], "us"
+        ),
+    }
+
+
+def bench_jwt(number: int, repeat: int) -> dict:
+    now = datetime.now(timezone.utc)
+    token = jwt.encode(
+        {"sub": "1", "user_id": 1, "name": "bench", "role": "employee", "iat": now,
+         "exp": now + timedelta(hours=1)},
+        auth.JWT_SECRET,
+        algorithm=auth.JWT_ALGORITHM,
+    )
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    def cold():
+        auth.token_cache.clear()
+        return auth.get_current_user(credentials)
+
+    def warm():
+        return auth.get_current_user(credentials)
+
+    result = {"cold_cache": summarize(time_calls(cold, number, repeat), "us")}
+    auth.get_current_user(credentials)
+    result["warm_cache"] = summarize(time_calls(warm, number, repeat), "us")
+    auth.token_cache.clear()
+    return result
+
+
+def run(number: int = 2000, repeat: int = 20) -> dict:
+    return {
+        "benchmark": "micro",
+        "environment": environment(),
+        "number": number,
+        "repeat": repeat,
+        "serialize_tyre": bench_serialization(number, repeat),
+        "pricing": bench_pricing(number, repeat),
+        "jwt_verify": bench_jwt(number, repeat),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serialization, pricing and JWT micro-benchmarks")
+    parser.add_argument("--number", type=int, default=2000, help="calls per sample")
+    parser.add_argument("--repeat", type=int, default=20, help="samples per benchmark")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    emit(run(args.number, args.repeat), args.output)
@@ -0,0 +1,91 @@
+# tyres_service/benchmarks/bench_serialization.py
+# List-response cost: ORM hydration + jsonable_encoder + json (the old
+# path) against column rows + TyreOut + orjson (the current one), on an
+# in-memory SQLite catalogue.
+#
+#   python -m benchmarks.bench_serialization [--rows 500] [--repeat 50]
+import argparse
+import json
+import time
+from decimal import Decimal
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, TyreModel
+from app.schemas import TyreOut
+
+TYRE_COLUMNS = tuple(TyreModel.__table__.c)
+TYRE_LIST = TypeAdapter(list[TyreOut])
+
+
+def make_catalogue(rows: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(TyreModel), [
+            {
+                "brand": f"Brand{i % 20}", "model": f"Model{i}", "size": "205/55R16",
+                "load_rate": 91, "speed_rate": "H", "season": "Summer",
+                "supplier": "Supplier", "fuel_efficiency": "C", "noise_level": 70,
+                "weather_efficiency": "C", "ev_approved": bool(i % 2),
+                "cost": Decimal("100.00"), "quantity": i % 50,
+                "retail_cost": Decimal("135.00"),
+            }
+            for i in range(rows)
+        ])
+    return engine
+
+
+def orm_page(db):
+    tyres = db.execute(select(TyreModel).order_by(TyreModel.id)).scalars().all()
+    return json.dumps(jsonable_encoder(tyres)).encode()
+
+
+def row_page(db):
+    rows = db.execute(select(*TYRE_COLUMNS).order_by(TyreModel.id)).all()
+    tyres = TYRE_LIST.validate_python(rows, from_attributes=True)
+    return orjson.dumps(TYRE_LIST.dump_python(tyres, mode="json"))
+
+
+def timed(engine, fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        # A fresh session per page, like a request.
+        with Session(engine) as db:
+            start = time.perf_counter()
+            fn(db)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "median_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def run(rows: int = 500, repeat: int = 50) -> dict:
+    engine = make_catalogue(rows)
+    with Session(engine) as db:
+        assert json.loads(orm_page(db)) == json.loads(row_page(db))
+    before = timed(engine, orm_page, repeat)
+    after = timed(engine, row_page, repeat)
+    return {
+        "benchmark": "list_serialization",
+        "rows": rows,
+        "repeat": repeat,
+        "orm_jsonable_encoder": before,
+        "rows_tyreout_orjson": after,
+        "speedup": round(before["median_ms"] / after["median_ms"], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List serialization benchmark")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.repeat), indent=2))
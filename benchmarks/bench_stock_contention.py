@@ -0,0 +1,146 @@
+# tyres_service/benchmarks/bench_stock_contention.py
+# Hot-SKU contention: N threads selling one tyre through adjust_stock,
+# first as a single row and then sharded over --shards slots. Meant for
+# Postgres (row locks); on SQLite every writer takes the database lock,
+# so both modes serialize and the comparison says nothing.
+#
+#   DATABASE_URL=postgresql://... python -m benchmarks.bench_stock_contention
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud
+from app.database import SessionLocal, engine
+from app.models import Base, TyreModel
+
+
+def make_tyre(quantity: int) -> int:
+    db = SessionLocal()
+    try:
+        tyre = TyreModel(
+            brand="Bench", model=f"Hot-{uuid.uuid4().hex[:8]}", size="205/55R16", load_rate=91,
+            speed_rate="H", season="Summer", supplier="Bench", fuel_efficiency="C",
+            noise_level=70, weather_efficiency="C", ev_approved=False,
+            cost=Decimal("100.00"), quantity=quantity, retail_cost=Decimal("135.00"),
+        )
+        db.add(tyre)
+        db.commit()
+        return tyre.id
+    finally:
+        db.close()
+
+
+def drop_tyre(tyre_id: int) -> None:
+    db = SessionLocal()
+    try:
+        crud.delete_tyre(db, tyre_id)
+    finally:
+        db.close()
+
+
+def hammer(tyre_id: int, threads: int, sales: int) -> dict:
+    """threads workers each make `sales` single-unit sales. Sales that
+    fail with a database error (lock or statement timeout, lost
+    connection) are counted by error type and left out of the latencies."""
+    latencies = []
+    rejected = 0
+    errors = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker():
+        nonlocal rejected
+        db = SessionLocal()
+        mine = []
+        refused = 0
+        failed = Counter()
+        try:
+            start.wait()
+            for _ in range(sales):
+                began = time.perf_counter()
+                try:
+                    crud.adjust_stock(db, tyre_id, -1)
+                except HTTPException:
+                    refused += 1
+                except SQLAlchemyError as e:
+                    db.rollback()
+                    failed[type(e).__name__] += 1
+                    continue
+                mine.append(time.perf_counter() - began)
+        except Exception as e:
+            # Anything else ends this worker; its samples so far still count.
+            failed[type(e).__name__] += 1
+        finally:
+            db.close()
+            with lock:
+                latencies.extend(mine)
+                rejected += refused
+                errors.update(failed)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    began = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    return {
+        "sales_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3) if latencies else None,
+        "p99_ms": (
+            round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 3)
+            if latencies else None
+        ),
+        "rejected": rejected,
+        "errors": sum(errors.values()),
+        "error_types": dict(errors),
+    }
+
+
+def run(threads: int = 16, sales: int = 200, shards: int = 16) -> dict:
+    Base.metadata.create_all(bind=engine)
+    stock = threads * sales
+    results = {"benchmark": "hot_sku_stock", "threads": threads, "sales_per_thread": sales,
+               "database": engine.dialect.name}
+
+    tyre_id = make_tyre(stock)
+    try:
+        results["single_row"] = hammer(tyre_id, threads, sales)
+    finally:
+        drop_tyre(tyre_id)
+
+    tyre_id = make_tyre(stock)
+    try:
+        db = SessionLocal()
+        try:
+            crud.set_stock_shards(db, tyre_id, shards)
+        finally:
+            db.close()
+        results[f"sharded_{shards}"] = hammer(tyre_id, threads, sales)
+    finally:
+        drop_tyre(tyre_id)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot-SKU stock contention benchmark")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("BENCH_THREADS", "16")))
+    parser.add_argument("--sales", type=int, default=200)
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+    results = run(args.threads, args.sales, args.shards)
+    print(json.dumps(results, indent=2))
+    # Numbers from a run that hit database errors are not comparable.
+    if any(isinstance(mode, dict) and mode["errors"] for mode in results.values()):
+        sys.exit(1)
@@ -0,0 +1,194 @@
+# tyres_service/benchmarks/bench_workers.py
+# Queue worker throughput without RabbitMQ: synthetic deliveries go
+# straight into order_worker.process_message / process_batch and
+# tyre_rpc_worker.process_message, and RPC replies land on a fake
+# channel's in-memory default exchange (app.local_broker.LocalExchange).
+#
+# Uses DATABASE_URL (default: a scratch SQLite file, see __init__.py).
+#
+#   python -m benchmarks.bench_workers [--messages 1000] [--concurrency 32] [--output w.json]
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import time
+import uuid
+
+from app import order_worker, tyre_rpc_worker
+from app.cache import tyre_cache
+from app.local_broker import LocalExchange
+from benchmarks.bench_api import cleanup, seed
+from benchmarks.common import add_output_argument, emit, environment, summarize
+
+
+class FakeChannel:
+    """What the workers use of an aio_pika channel: its default exchange."""
+
+    def __init__(self):
+        self.default_exchange = LocalExchange("")
+
+
+class FakeMessage:
+    """A delivery with the aio_pika.IncomingMessage surface the workers use."""
+
+    def __init__(self, data: dict, routing_key: str, channel: FakeChannel, reply_to=None):
+        self.body = json.dumps(data).encode()
+        self.routing_key = routing_key
+        self.channel = channel
+        self.reply_to = reply_to
+        self.correlation_id = uuid.uuid4().hex if reply_to else None
+        self.outcome = None
+
+    @contextlib.asynccontextmanager
+    async def process(self):
+        # Like aio_pika: ack on success, reject (and re-raise) on error.
+        try:
+            yield
+        except Exception:
+            self.outcome = "reject"
+            raise
+        self.outcome = "ack"
+
+    async def ack(self):
+        self.outcome = "ack"
+
+    async def nack(self, requeue=True):
+        self.outcome = "nack"
+
+    async def reject(self, requeue=False):
+        self.outcome = "reject"
+
+
+async def drive(handler, messages: list, concurrency: int) -> dict:
+    """Feed messages to handler from concurrency tasks; per-message latency."""
+    latencies = []
+    queue = list(reversed(messages))
+
+    async def worker():
+        while queue:
+            message = queue.pop()
+            start = time.perf_counter()
+            await handler(message)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "messages": len(messages),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(len(messages) / elapsed, 1),
+        "latency": summarize(latencies),
+    }
+
+
+def outcomes(messages: list) -> dict:
+    counts: dict[str, int] = {}
+    for message in messages:
+        counts[str(message.outcome)] = counts.get(str(message.outcome), 0) + 1
+    return counts
+
+
+def orders(tyre_ids: list, count: int, channel: FakeChannel) -> list:
+    run_id = uuid.uuid4().hex[:8]
+    return [
+        FakeMessage(
+            {
+                "order_id": f"bench-{run_id}-{i}",
+                # Alternate sales and restocks so stock stays put.
+                "type": ("SELL", "BUY")[i % 2],
+                "items": [
+                    {"tyre_id": tyre_id, "quantity": 1}
+                    for tyre_id in random.sample(tyre_ids, min(3, len(tyre_ids)))
+                ],
+            },
+            "order.created",
+            channel,
+        )
+        for i in range(count)
+    ]
+
+
+def rpc_requests(tyre_ids: list, count: int, channel: FakeChannel, bulk: int) -> list:
+    return [
+        FakeMessage(
+            {"tyre_ids": random.sample(tyre_ids, bulk)} if bulk > 1
+            else {"tyre_id": random.choice(tyre_ids)},
+            "tyres.get",
+            channel,
+            reply_to="bench.replies",
+        )
+        for _ in range(count)
+    ]
+
+
+async def bench_order_worker(tyre_ids: list, count: int, concurrency: int, batch: int) -> dict:
+    channel = FakeChannel()
+    single = orders(tyre_ids, count, channel)
+    result = {"process_message": await drive(order_worker.process_message, single, concurrency)}
+    result["process_message"]["outcomes"] = outcomes(single)
+
+    batched = orders(tyre_ids, count, channel)
+    chunks = [batched[i:i + batch] for i in range(0, len(batched), batch)]
+    # Like the worker's consumers: a few batches in flight, not one per message.
+    stats = await drive(order_worker.process_batch, chunks, max(1, concurrency // batch))
+    result["process_batch"] = {
+        "messages": len(batched),
+        "batch_size": batch,
+        "messages_per_second": round(len(batched) / stats["seconds"], 1),
+        "batch_latency": stats["latency"],
+        "outcomes": outcomes(batched),
+    }
+    return result
+
+
+async def bench_rpc_worker(tyre_ids: list, count: int, concurrency: int, bulk: int) -> dict:
+    result = {}
+    for name, size in (("single", 1), (f"bulk_{bulk}", bulk)):
+        channel = FakeChannel()
+        replies = channel.default_exchange.bind("bench.replies")
+        tyre_cache.clear()
+        cold = await drive(tyre_rpc_worker.process_message,
+                           rpc_requests(tyre_ids, count, channel, size), concurrency)
+        warm = await drive(tyre_rpc_worker.process_message,
+                           rpc_requests(tyre_ids, count, channel, size), concurrency)
+        answered = [json.loads(replies.get_nowait().body) for _ in range(replies.qsize())]
+        result[name] = {
+            "cold_cache": cold,
+            "warm_cache": warm,
+            "replies_ok": sum(1 for reply in answered if reply["ok"]),
+            "replies": len(answered),
+        }
+    return result
+
+
+def run(messages: int = 1000, concurrency: int = 32, tyres: int = 200, batch: int = 50,
+        bulk: int = 20) -> dict:
+    brand = f"Bench-{uuid.uuid4().hex[:8]}"
+    try:
+        tyre_ids = seed(brand, tyres, quantity=1000)
+        order = asyncio.run(bench_order_worker(tyre_ids, messages, concurrency, batch))
+        rpc = asyncio.run(bench_rpc_worker(tyre_ids, messages, concurrency, bulk))
+    finally:
+        cleanup(brand)
+    return {
+        "benchmark": "workers",
+        "environment": environment(),
+        "catalogue": tyres,
+        "order_worker": order,
+        "tyre_rpc_worker": rpc,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue worker harness benchmarks")
+    parser.add_argument("--messages", type=int, default=1000, help="messages per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tyres", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=50, help="order_worker batch size")
+    parser.add_argument("--bulk", type=int, default=20, help="ids per bulk RPC request")
+    add_output_argument(parser)
+    args = parser.parse_args()
+    emit(run(args.messages, args.concurrency, args.tyres, args.batch, args.bulk), args.output)
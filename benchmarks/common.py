@@ -0,0 +1,57 @@
+# tyres_service/benchmarks/common.py
+# Timing and reporting helpers shared by the benchmarks. Every benchmark
+# returns a JSON-able dict from run(); --output also writes it to a file
+# so two runs can be diffed with benchmarks.compare.
+import json
+import os
+import platform
+import time
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    return samples[max(0, min(len(samples) - 1, int(len(samples) * fraction + 0.5) - 1))]
+
+
+def summarize(samples: list, unit: str = "ms") -> dict:
+    """Latency summary of samples in seconds, reported in ms or us."""
+    scale = {"ms": 1e3, "us": 1e6}[unit]
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        f"median_{unit}": round(percentile(samples, 0.5) * scale, 3),
+        f"p95_{unit}": round(percentile(samples, 0.95) * scale, 3),
+        f"p99_{unit}": round(percentile(samples, 0.99) * scale, 3),
+        f"max_{unit}": round(samples[-1] * scale, 3),
+    }
+
+
+def time_calls(fn, number: int, repeat: int) -> list:
+    """Seconds per call of fn(), averaged over number calls, repeat times."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def add_output_argument(parser) -> None:
+    parser.add_argument("--output", help="also write the results to this JSON file")
+
+
+def emit(result: dict, output: str = None) -> None:
+    text = json.dumps(result, indent=2, default=str)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,56 @@
+# tyres_service/benchmarks/compare.py
+# Diff two benchmark JSON files (from --output) metric by metric: every
+# latency (*_ms, *_us) and throughput (*_per_second) found in both, with
+# the change in percent. Latency up or throughput down past --threshold
+# is flagged as a regression, and the exit status is 1 if any was found.
+#
+#   python -m benchmarks.compare baseline.json current.json [--threshold 10]
+import argparse
+import json
+import sys
+
+
+def metrics(result, prefix: str = "") -> dict:
+    """{dotted.path: value} for the numeric latency/throughput leaves."""
+    found = {}
+    for key, value in result.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            found.update(metrics(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and (
+            key.endswith(("_ms", "_us", "_per_second"))
+        ):
+            found[path] = value
+    return found
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    rows = []
+    before, after = metrics(baseline), metrics(current)
+    for path in sorted(before.keys() & after.keys()):
+        old, new = before[path], after[path]
+        change = (new - old) / old * 100 if old else 0.0
+        worse = -change if path.endswith("_per_second") else change
+        rows.append((path, old, new, change, worse > threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent change that counts as a regression")
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for path, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{path:<{width}}  {old:>12.3f}  {new:>12.3f}  {change:>+8.1f}%{flag}")
+    if any(row[4] for row in rows):
+        sys.exit(1)
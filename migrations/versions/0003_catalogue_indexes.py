@@ -0,0 +1,35 @@
+"""Composite indexes for filtered, keyset-paginated catalogue listing.
+
+Each index leads with a filter column and ends with id, so a filtered
+page (WHERE brand = ? AND id > ? ORDER BY id LIMIT n) is a single
+index range scan.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_tyres_brand_id": ["brand", "id"],
+    "ix_tyres_size_id": ["size", "id"],
+    "ix_tyres_season_id": ["season", "id"],
+    "ix_tyres_speed_rate_id": ["speed_rate", "id"],
+    "ix_tyres_retail_cost_id": ["retail_cost", "id"],
+}
+
+
+def upgrade() -> None:
+    for name, columns in INDEXES.items():
+        op.create_index(name, "tyres", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="tyres")
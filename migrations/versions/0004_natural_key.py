@@ -0,0 +1,28 @@
+"""Unique natural key (brand, model, size, supplier) for bulk upserts.
+
+Bulk imports use INSERT ... ON CONFLICT on this key. Duplicate rows
+already in the table must be merged before upgrading.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("tyres") as batch:
+        batch.create_unique_constraint(
+            "uq_tyres_natural_key", ["brand", "model", "size", "supplier"]
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("tyres") as batch:
+        batch.drop_constraint("uq_tyres_natural_key", type_="unique")
@@ -0,0 +1,58 @@
+"""Stock reservations: tyres.reserved and the reservations table.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("tyres") as batch:
+        batch.add_column(
+            sa.Column("reserved", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch.create_check_constraint(
+            "ck_tyres_reserved_within_quantity", "reserved >= 0 AND reserved <= quantity"
+        )
+
+    op.create_table(
+        "reservations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "tyre_id",
+            sa.Integer(),
+            sa.ForeignKey("tyres.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="held"),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.CheckConstraint("quantity > 0", name="ck_reservations_quantity_positive"),
+    )
+    op.create_index("ix_reservations_tyre_id", "reservations", ["tyre_id"])
+    op.create_index(
+        "ix_reservations_status_expires_at", "reservations", ["status", "expires_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_reservations_status_expires_at", table_name="reservations")
+    op.drop_index("ix_reservations_tyre_id", table_name="reservations")
+    op.drop_table("reservations")
+    with op.batch_alter_table("tyres") as batch:
+        batch.drop_constraint("ck_tyres_reserved_within_quantity", type_="check")
+        batch.drop_column("reserved")
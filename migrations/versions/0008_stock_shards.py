@@ -0,0 +1,47 @@
+"""Sharded stock counters for hot tyres.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("tyres") as batch:
+        batch.add_column(
+            sa.Column("shards", sa.Integer(), nullable=False, server_default="0")
+        )
+
+    op.create_table(
+        "tyre_stock_shards",
+        sa.Column(
+            "tyre_id",
+            sa.Integer(),
+            sa.ForeignKey("tyres.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("slot", sa.Integer(), primary_key=True),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.CheckConstraint(
+            "quantity >= 0", name="ck_tyre_stock_shards_quantity_nonnegative"
+        ),
+    )
+
+
+def downgrade() -> None:
+    # Fold slot stock back into tyres.quantity before dropping the slots.
+    op.execute(
+        "UPDATE tyres SET quantity = quantity + COALESCE("
+        "(SELECT SUM(s.quantity) FROM tyre_stock_shards s WHERE s.tyre_id = tyres.id), 0)"
+    )
+    op.drop_table("tyre_stock_shards")
+    with op.batch_alter_table("tyres") as batch:
+        batch.drop_column("shards")
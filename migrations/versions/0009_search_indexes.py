@@ -0,0 +1,41 @@
+"""Search indexes: trigram, tsvector and size-key expression indexes.
+
+Postgres only; other databases use the in-process index in app.search.
+The expressions must match app.search.SEARCH_TEXT / SIZE_KEY exactly.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+SEARCH_TEXT = "lower(brand || ' ' || model || ' ' || supplier)"
+SIZE_KEY = "regexp_replace(size, '[^0-9]', '', 'g')"
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        f"CREATE INDEX ix_tyres_search_trgm ON tyres USING gin ({SEARCH_TEXT} gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX ix_tyres_search_tsv ON tyres "
+        f"USING gin (to_tsvector('simple', {SEARCH_TEXT}))"
+    )
+    op.execute(f"CREATE INDEX ix_tyres_size_key ON tyres ({SIZE_KEY} text_pattern_ops)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_tyres_size_key")
+    op.execute("DROP INDEX IF EXISTS ix_tyres_search_tsv")
+    op.execute("DROP INDEX IF EXISTS ix_tyres_search_trgm")
@@ -0,0 +1,59 @@
+"""Change feed: change_seq on tyres and stock slots, and tyre tombstones.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    if postgres:
+        op.execute("CREATE SEQUENCE tyre_change_seq")
+
+    for table in ("tyres", "tyre_stock_shards"):
+        with op.batch_alter_table(table) as batch:
+            batch.add_column(
+                sa.Column("change_seq", sa.BigInteger(), nullable=False, server_default="0")
+            )
+        op.create_index(f"ix_{table}_change_seq", table, ["change_seq"])
+
+    # Existing tyres enter the feed once, so a reader starting from 0 gets
+    # the whole catalogue.
+    if postgres:
+        op.execute("UPDATE tyres SET change_seq = nextval('tyre_change_seq')")
+    else:
+        op.execute("UPDATE tyres SET change_seq = id")
+
+    op.create_table(
+        "tyre_tombstones",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tyre_id", sa.Integer(), nullable=False),
+        sa.Column("change_seq", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "deleted_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_index("ix_tyre_tombstones_change_seq", "tyre_tombstones", ["change_seq"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tyre_tombstones_change_seq", table_name="tyre_tombstones")
+    op.drop_table("tyre_tombstones")
+    for table in ("tyre_stock_shards", "tyres"):
+        op.drop_index(f"ix_{table}_change_seq", table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("change_seq")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP SEQUENCE tyre_change_seq")
@@ -0,0 +1,37 @@
+"""Pricing rules: markups by supplier, brand or season.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pricing_rules",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("supplier", sa.String(), nullable=True),
+        sa.Column("brand", sa.String(), nullable=True),
+        sa.Column("season", sa.String(), nullable=True),
+        sa.Column("markup", sa.Numeric(6, 4), nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.CheckConstraint("markup > 0", name="ck_pricing_rules_markup_positive"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("pricing_rules")
@@ -0,0 +1,63 @@
+"""Stock by location: locations, tyre_location_stock and tyres.located.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing stock starts out unassigned (located = 0).
+    with op.batch_alter_table("tyres") as batch:
+        batch.add_column(
+            sa.Column("located", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch.create_check_constraint(
+            "ck_tyres_located_within_quantity", "located >= 0 AND located <= quantity"
+        )
+
+    op.create_table(
+        "locations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("code", sa.String(), nullable=False, unique=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("latitude", sa.Float(), nullable=False),
+        sa.Column("longitude", sa.Float(), nullable=False),
+    )
+    op.create_table(
+        "tyre_location_stock",
+        sa.Column(
+            "tyre_id",
+            sa.Integer(),
+            sa.ForeignKey("tyres.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "location_id",
+            sa.Integer(),
+            sa.ForeignKey("locations.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.CheckConstraint("quantity >= 0", name="ck_tyre_location_stock_quantity_nonnegative"),
+    )
+    op.create_index(
+        "ix_tyre_location_stock_location_id", "tyre_location_stock", ["location_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tyre_location_stock_location_id", table_name="tyre_location_stock")
+    op.drop_table("tyre_location_stock")
+    op.drop_table("locations")
+    with op.batch_alter_table("tyres") as batch:
+        batch.drop_constraint("ck_tyres_located_within_quantity", type_="check")
+        batch.drop_column("located")
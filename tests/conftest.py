@@ -8,11 +8,16 @@ from datetime import datetime, timedelta, timezone
 import jwt
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
-from app.main import app, get_db
+from app import database
+from app.main import app
 from app.models import Base
-from app.database import engine, SessionLocal
+from app.database import engine, SessionLocal, async_database_url
 from app.auth import JWT_ALGORITHM, JWT_SECRET
+from app.cache import invalidate_tyres
+from app.pricing import drop_pricing_rules
 
 
 def make_token(user_id, name, role):
@@ -28,23 +33,46 @@ def make_token(user_id, name, role):
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-def _client():
+def _reset_db():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    invalidate_tyres()
+    drop_pricing_rules()
 
-    def override_get_db():
-        db = SessionLocal()
-        try:
-            yield db
-        finally:
-            db.close()
 
-    app.dependency_overrides[get_db] = override_get_db
+def _client():
+    _reset_db()
     return TestClient(app)
 
 
+@pytest.fixture(params=["sync", "async"])
+def db_mode(request, monkeypatch):
+    """Every API test runs against the sync engine and the ASYNC_DB path."""
+    if request.param == "async":
+        pytest.importorskip("aiosqlite")
+        # NullPool: each TestClient runs its own event loop, and pooled
+        # aiosqlite connections must not outlive the loop they were made on.
+        factory = async_sessionmaker(
+            create_async_engine(async_database_url(os.environ["DATABASE_URL"]), poolclass=NullPool),
+            autoflush=False,
+            expire_on_commit=False,
+        )
+        monkeypatch.setattr(database, "ASYNC_DB", True)
+        monkeypatch.setattr(database, "_async_sessionmaker", factory)
+    return request.param
+
+
+@pytest.fixture
+def db():
+    """Session on a fresh schema, for tests that bypass the HTTP layer."""
+    _reset_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
 @pytest.fixture
-def client():
+def client(db_mode):
     """Client authenticated as an admin (most tests exercise CRUD)."""
     with _client() as c:
         c.headers.update({"Authorization": f"Bearer {make_token(1, 'admin', 'admin')}"})
@@ -53,7 +81,7 @@ def client():
 
 
 @pytest.fixture
-def anon_client():
+def anon_client(db_mode):
     """Client with no Authorization header."""
     with _client() as c:
         yield c
@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import auth
+from app.auth import JWT_ALGORITHM, JWT_SECRET, get_current_user, require_roles, token_cache
+from tests.conftest import make_token
+
+
+def _credentials(token):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def test_repeat_token_is_verified_once(monkeypatch):
+    token = make_token(None, "orders-service", "service")
+    first = get_current_user(_credentials(token))
+
+    def no_decode(*args, **kwargs):
+        raise AssertionError("cached token was decoded again")
+
+    monkeypatch.setattr(auth.jwt, "decode", no_decode)
+    assert get_current_user(_credentials(token)) is first
+
+
+def test_cache_entry_expires_with_token(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    exp = datetime.now(timezone.utc) + timedelta(seconds=5)
+    token = jwt.encode(
+        {"name": "emp", "role": "employee", "exp": exp}, JWT_SECRET, algorithm=JWT_ALGORITHM
+    )
+
+    get_current_user(_credentials(token))
+    assert len(token_cache) == 1
+
+    now[0] += 6  # past exp, well inside TOKEN_CACHE_TTL
+    assert token_cache.get(hashlib.sha256(token.encode()).digest()) is None
+
+
+def test_roles_are_checked_against_cached_user():
+    token = make_token(2, "emp", "employee")
+    user = get_current_user(_credentials(token))
+    cached = get_current_user(_credentials(token))
+    assert cached is user
+
+    with pytest.raises(HTTPException) as exc:
+        require_roles("admin")(cached)
+    assert exc.value.status_code == 403
+
+
+def test_invalid_token_is_not_cached():
+    misses = token_cache.misses
+    with pytest.raises(HTTPException):
+        get_current_user(_credentials("garbage"))
+    assert len(token_cache) == 0
+    assert token_cache.misses == misses + 1
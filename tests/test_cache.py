@@ -0,0 +1,158 @@
+import asyncio
+import threading
+from decimal import Decimal
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy.util.concurrency import greenlet_spawn
+
+from app.cache import RedisCache, TTLCache, dump_tyre, load_tyre, make_tyre_cache, tyre_cache
+from tests.test_main import VALID_PAYLOAD
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    now[0] += 4.9
+    assert cache.get("a") == 1
+    now[0] += 0.2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_delete_and_clear():
+    cache = TTLCache(maxsize=10, ttl=60)
+    for key in "abc":
+        cache.set(key, key)
+    cache.delete("a", "missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+# Pluggable backends
+
+class FakeRedis:
+    """Just enough of redis.Redis for RedisCache, values kept as bytes."""
+
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, name, value, px=None):
+        self.data[name] = value.encode()
+
+    def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+    def scan_iter(self, match=None, count=None):
+        prefix = match.rstrip("*")
+        return [key for key in list(self.data) if key.startswith(prefix)]
+
+
+class DownRedis(FakeRedis):
+    def mget(self, *args, **kwargs):
+        raise ConnectionError("redis is down")
+
+    set = delete = scan_iter = mget
+
+
+def test_redis_cache_round_trips_tyres_with_decimals():
+    client = FakeRedis()
+    cache = RedisCache(client, "t:", ttl=5, dumps=dump_tyre, loads=load_tyre)
+    cache.set(1, {"id": 1, "cost": Decimal("100.00"), "retail_cost": Decimal("135.00")})
+    cache.set(2, {"id": 2, "cost": Decimal("1.10"), "retail_cost": Decimal("1.49")})
+    client.data["other:1"] = b"untouched"
+
+    assert cache.get(1)["retail_cost"] == Decimal("135.00")
+    assert set(cache.get_many([1, 2, 3])) == {1, 2}
+    cache.delete(1)
+    assert cache.get(1) is None
+    cache.clear()
+    assert list(client.data) == ["other:1"]
+
+
+def test_redis_outage_degrades_to_misses():
+    cache = RedisCache(DownRedis(), "t:", ttl=5)
+    cache.set(1, {"id": 1})
+    cache.delete(1)
+    cache.clear()
+    assert cache.get(1) is None
+
+
+def test_redis_calls_from_the_async_engine_leave_the_event_loop():
+    threads = []
+
+    class RecordingRedis(FakeRedis):
+        def mget(self, keys):
+            threads.append(threading.current_thread())
+            return super().mget(keys)
+
+    cache = RedisCache(RecordingRedis(), "t:", ttl=5)
+    cache.get(1)
+    # As AsyncSession.run_sync runs crud code: on the loop, in a greenlet.
+    asyncio.run(greenlet_spawn(cache.get, 1))
+    assert threads[0] is threading.main_thread()
+    assert threads[1] is not threading.main_thread()
+
+
+def test_cache_can_be_switched_off():
+    cache = make_tyre_cache("off")
+    cache.set(1, {"id": 1})
+    assert cache.get(1) is None
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        make_tyre_cache("memcached")
+
+
+def _lookups(result):
+    return REGISTRY.get_sample_value(
+        "tyres_cache_lookups_total", {"cache": "tyre", "result": result}
+    ) or 0
+
+
+def test_api_reads_go_through_the_cache_and_writes_invalidate(client):
+    created = client.post("/api/tyres", json={**VALID_PAYLOAD, "model": "Cached"}).json()
+    url = f"/api/tyres/{created['id']}"
+    hits, misses = _lookups("hit"), _lookups("miss")
+
+    client.get(url)
+    assert client.get(url).json()["quantity"] == 10
+    assert (_lookups("hit") - hits, _lookups("miss") - misses) == (1, 1)
+
+    client.post(f"{url}/stock", json={"delta": -3})
+    assert client.get(url).json()["quantity"] == 7
+    assert _lookups("miss") - misses == 2
+
+
+def test_redis_backend_is_shared_between_readers(client, monkeypatch):
+    shared = FakeRedis()
+    monkeypatch.setattr(
+        tyre_cache, "backend", RedisCache(shared, "tyres:tyre:", 5, dump_tyre, load_tyre)
+    )
+    created = client.post("/api/tyres", json={**VALID_PAYLOAD, "model": "Shared"}).json()
+    url = f"/api/tyres/{created['id']}"
+
+    first = client.get(url).json()
+    assert f"tyres:tyre:{created['id']}" in shared.data
+    assert client.get(url).json() == first
+
+    client.patch(url, json={"quantity": 4})
+    assert shared.data == {}
+    assert client.get(url).json()["quantity"] == 4
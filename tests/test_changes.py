@@ -0,0 +1,154 @@
+from sqlalchemy import text
+
+from app import order_worker
+from app.database import SessionLocal
+from tests.test_main import VALID_PAYLOAD
+
+
+def _create(client, model):
+    return client.post("/api/tyres", json={**VALID_PAYLOAD, "model": model}).json()["id"]
+
+
+def _changes(client, since, **params):
+    response = client.get("/api/tyres/changes", params={"since": since, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_feed_returns_only_what_changed_since(client):
+    a, b, c = _create(client, "A"), _create(client, "B"), _create(client, "C")
+    full = _changes(client, 0)
+    assert [t["id"] for t in full["changes"]] == [a, b, c]
+    assert full["next_since"] == full["changes"][-1]["change_seq"]
+    assert _changes(client, full["next_since"]) == {
+        "changes": [], "deleted": [], "next_since": full["next_since"], "has_more": False,
+    }
+
+    client.post(f"/api/tyres/{b}/stock", json={"delta": -2})
+    client.patch(f"/api/tyres/{a}", json={"noise_level": 68})
+    client.post(f"/api/tyres/{b}/stock", json={"delta": -1})
+    delta = _changes(client, full["next_since"])
+    # One entry per tyre, at its latest write.
+    assert [(t["id"], t["quantity"]) for t in delta["changes"]] == [(a, 10), (b, 7)]
+    assert delta["next_since"] == delta["changes"][-1]["change_seq"]
+
+
+def test_deletes_leave_tombstones(client):
+    a, b = _create(client, "A"), _create(client, "B")
+    since = _changes(client, 0)["next_since"]
+
+    assert client.delete(f"/api/tyres/{a}").status_code == 204
+    delta = _changes(client, since)
+    assert delta["changes"] == []
+    assert [t["id"] for t in delta["deleted"]] == [a]
+    assert delta["next_since"] > since
+    assert b not in [t["id"] for t in delta["deleted"]]
+
+
+def test_deleting_the_newest_tyre_moves_the_feed_forward(client):
+    _create(client, "A")
+    b = _create(client, "B")
+    since = _changes(client, 0)["next_since"]
+
+    assert client.delete(f"/api/tyres/{b}").status_code == 204
+    delta = _changes(client, since)
+    assert [t["id"] for t in delta["deleted"]] == [b]
+    assert delta["next_since"] > since
+
+
+def test_unsharding_moves_the_feed_forward(client):
+    tyre_id = _create(client, "A")
+    client.put(f"/api/tyres/{tyre_id}/stock/shards", json={"count": 2})
+    # The sale lands on a slot, which then holds the newest position.
+    client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -1})
+    since = _changes(client, 0)["next_since"]
+
+    client.put(f"/api/tyres/{tyre_id}/stock/shards", json={"count": 0})
+    delta = _changes(client, since)
+    assert [(t["id"], t["quantity"]) for t in delta["changes"]] == [(tyre_id, 9)]
+
+
+def test_short_page_of_one_tyre_written_often_is_not_the_end(client):
+    sharded = _create(client, "A")
+    client.put(f"/api/tyres/{sharded}/stock/shards", json={"count": 3})
+    since = _changes(client, 0)["next_since"]
+    # Slots of 4, 3 and 3: selling 8 writes all three.
+    client.post(f"/api/tyres/{sharded}/stock", json={"delta": -8})
+    later = _create(client, "B")
+
+    page = _changes(client, since, limit=3)
+    assert [t["id"] for t in page["changes"]] == [sharded]
+    assert page["has_more"] is True
+    rest = _changes(client, page["next_since"], limit=3)
+    assert ([t["id"] for t in rest["changes"]], rest["has_more"]) == ([later], False)
+
+
+def test_feed_pages_without_skipping(client):
+    ids = [_create(client, f"M{i}") for i in range(5)]
+    seen, since = [], 0
+    while True:
+        page = _changes(client, since, limit=2)
+        seen += [t["id"] for t in page["changes"]]
+        since = page["next_since"]
+        if not page["has_more"]:
+            break
+    assert seen == ids
+
+
+def test_every_write_path_moves_the_tyre_forward(client):
+    tyre_id = _create(client, "A")
+    other = _create(client, "B")
+
+    def moved(write):
+        since = _changes(client, 0)["next_since"]
+        write()
+        return [t["id"] for t in _changes(client, since)["changes"]]
+
+    assert moved(lambda: client.put(
+        f"/api/tyres/{tyre_id}", json={**VALID_PAYLOAD, "model": "A"}
+    )) == [tyre_id]
+    assert moved(lambda: client.post(
+        "/api/tyres/stock/batch", json={"items": [{"tyre_id": tyre_id, "delta": 1}]}
+    )) == [tyre_id]
+    assert moved(lambda: client.post(
+        f"/api/tyres/{tyre_id}/reservations", json={"quantity": 1}
+    )) == [tyre_id]
+    assert moved(lambda: client.post(
+        "/api/tyres/import",
+        json=[{**VALID_PAYLOAD, "model": "A"}, {**VALID_PAYLOAD, "model": "B"}],
+    )) == [tyre_id, other]
+
+    def order():
+        db = SessionLocal()
+        try:
+            order_worker.apply_orders(
+                db, [{"type": "SELL", "items": [{"tyre_id": other, "quantity": 1}]}]
+            )
+        finally:
+            db.close()
+
+    assert moved(order) == [other]
+
+
+def test_sharded_stock_moves_appear_with_total_stock(client):
+    tyre_id = _create(client, "Hot")
+    client.put(f"/api/tyres/{tyre_id}/stock/shards", json={"count": 4})
+    since = _changes(client, 0)["next_since"]
+
+    client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -3})
+    delta = _changes(client, since)
+    assert [(t["id"], t["quantity"]) for t in delta["changes"]] == [(tyre_id, 7)]
+    assert delta["next_since"] > since
+
+
+def _plan(db, table):
+    rows = db.execute(text(
+        f"EXPLAIN QUERY PLAN SELECT * FROM {table} WHERE change_seq > 5 "
+        "ORDER BY change_seq LIMIT 10"
+    ))
+    return " ".join(str(row[-1]) for row in rows)
+
+
+def test_feed_scans_use_the_change_seq_indexes(db):
+    for table in ("tyres", "tyre_stock_shards", "tyre_tombstones"):
+        assert f"ix_{table}_change_seq" in _plan(db, table)
@@ -0,0 +1,87 @@
+import contextlib
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from app import database
+from app.database import async_database_url
+
+
+def test_async_database_url_swaps_in_async_driver():
+    assert (
+        async_database_url("postgresql://u:p@db:5432/tyres").render_as_string(hide_password=False)
+        == "postgresql+asyncpg://u:p@db:5432/tyres"
+    )
+    assert (
+        async_database_url("postgresql+psycopg2://u:p@db/tyres").drivername
+        == "postgresql+asyncpg"
+    )
+    assert async_database_url("sqlite+pysqlite:///./x.db").drivername == "sqlite+aiosqlite"
+
+
+def test_engine_options_from_environment(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(database, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    options = database.engine_options("postgresql://u:p@db/tyres")
+    assert options["poolclass"] is database.TimedQueuePool
+    assert options["pool_size"] == 20
+    assert options["pool_pre_ping"] is False
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+
+    async_options = database.engine_options("postgresql+asyncpg://u:p@db/tyres", is_async=True)
+    assert async_options["poolclass"] is database.TimedAsyncQueuePool
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+
+    # statement_timeout is a Postgres setting
+    assert "connect_args" not in database.engine_options("sqlite:///./x.db")
+
+
+def test_external_pooler_disables_client_pool(monkeypatch):
+    monkeypatch.setattr(database, "DB_EXTERNAL_POOLER", True)
+    monkeypatch.setattr(database, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    options = database.engine_options("postgresql://u:p@db/tyres")
+    assert options["poolclass"] is NullPool
+    assert "pool_size" not in options
+    # set per transaction instead (startup options do not survive PgBouncer)
+    assert "connect_args" not in options
+
+
+def test_db_metrics_report_pool_and_checkout_wait(client):
+    client.get("/api/tyres")
+    metrics = client.get("/metrics/db").json()
+    sync = metrics["sync"]
+    assert sync["pool"] == "TimedQueuePool"
+    assert sync["checkouts"] >= 1
+    assert {"size", "checked_out", "overflow", "checkout_wait_seconds_max"} <= set(sync)
+
+
+def test_checkout_wait_is_counted_per_pool(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pools.db'}"
+    first = create_engine(url, **database.engine_options(url))
+    second = create_engine(url, **database.engine_options(url))
+    with first.connect():
+        pass
+    assert database.pool_status(first)["checkouts"] == 1
+    assert database.pool_status(second)["checkouts"] == 0
+
+
+class _Unreachable:
+    def __init__(self, failures):
+        self.failures = failures
+
+    def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+        return contextlib.nullcontext()
+
+
+def test_wait_for_database_retries_then_gives_up(monkeypatch):
+    monkeypatch.setattr(database, "engine", _Unreachable(failures=2))
+    database.wait_for_database(retries=3, delay=0)
+
+    monkeypatch.setattr(database, "engine", _Unreachable(failures=5))
+    with pytest.raises(RuntimeError):
+        database.wait_for_database(retries=3, delay=0)
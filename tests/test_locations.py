@@ -0,0 +1,204 @@
+from sqlalchemy import select
+
+from app import order_worker
+from app.models import OutboxModel, TyreModel
+from tests.test_main import VALID_PAYLOAD
+
+# Two branches and a warehouse, by (latitude, longitude).
+LOCATIONS = {
+    "DUB": ("Dublin branch", 53.35, -6.26),
+    "CRK": ("Cork branch", 51.90, -8.47),
+    "ATH": ("Athlone warehouse", 53.42, -7.94),
+}
+
+
+def _locations(client):
+    ids = {}
+    for code, (name, latitude, longitude) in LOCATIONS.items():
+        response = client.post("/api/locations", json={
+            "code": code, "name": name, "latitude": latitude, "longitude": longitude,
+        })
+        assert response.status_code == 201, response.text
+        ids[code] = response.json()["id"]
+    return ids
+
+
+def _tyre(client, quantity=0, model="TestModel"):
+    return client.post(
+        "/api/tyres", json={**VALID_PAYLOAD, "model": model, "quantity": quantity}
+    ).json()["id"]
+
+
+def _stock(client, tyre_id, location_id, delta, transfer=False):
+    return client.post(
+        f"/api/tyres/{tyre_id}/locations/{location_id}/stock",
+        json={"delta": delta, "transfer": transfer},
+    )
+
+
+def _by_code(breakdown):
+    return {line["code"]: line["quantity"] for line in breakdown["locations"]}
+
+
+def test_location_stock_moves_the_total(client):
+    ids = _locations(client)
+    tyre_id = _tyre(client, quantity=2)
+
+    _stock(client, tyre_id, ids["DUB"], 5)
+    breakdown = _stock(client, tyre_id, ids["CRK"], 3).json()
+    assert breakdown["quantity"] == 10
+    assert breakdown["unassigned"] == 2
+    assert _by_code(breakdown) == {"DUB": 5, "CRK": 3}
+
+    # Single-quantity reads see the total, kept on the tyre row.
+    tyre = client.get(f"/api/tyres/{tyre_id}").json()
+    assert (tyre["quantity"], tyre["located"]) == (10, 8)
+    assert client.get("/api/tyres").json()[0]["quantity"] == 10
+
+    sold = _stock(client, tyre_id, ids["DUB"], -4).json()
+    assert (sold["quantity"], _by_code(sold)) == (6, {"DUB": 1, "CRK": 3})
+
+
+def test_location_stock_cannot_oversell(client):
+    ids = _locations(client)
+    tyre_id = _tyre(client, quantity=20)
+    _stock(client, tyre_id, ids["DUB"], 2)
+
+    short = _stock(client, tyre_id, ids["DUB"], -3)
+    assert short.status_code == 409
+    assert short.json()["detail"] == "Not enough stock at this location"
+    # Unassigned stock does not cover a sale at a location.
+    assert _stock(client, tyre_id, ids["CRK"], -1).status_code == 409
+
+    breakdown = client.get(f"/api/tyres/{tyre_id}/locations").json()
+    assert (breakdown["quantity"], breakdown["unassigned"], _by_code(breakdown)) == (
+        22, 20, {"DUB": 2}
+    )
+    assert _stock(client, tyre_id, 999, 1).status_code == 404
+    assert _stock(client, 99999, ids["DUB"], 1).status_code == 404
+    assert _stock(client, tyre_id, ids["DUB"], 0).status_code == 400
+
+
+def test_transfers_assign_existing_stock(client):
+    ids = _locations(client)
+    tyre_id = _tyre(client, quantity=10)
+
+    breakdown = _stock(client, tyre_id, ids["ATH"], 8, transfer=True).json()
+    assert (breakdown["quantity"], breakdown["unassigned"]) == (10, 2)
+    refused = _stock(client, tyre_id, ids["DUB"], 3, transfer=True)
+    assert (refused.status_code, refused.json()["detail"]) == (409, "Not enough unassigned stock")
+
+    breakdown = _stock(client, tyre_id, ids["ATH"], -5, transfer=True).json()
+    assert (breakdown["quantity"], breakdown["unassigned"], _by_code(breakdown)) == (
+        10, 7, {"ATH": 3}
+    )
+
+
+def test_single_quantity_writes_draw_on_locations(client, db):
+    ids = _locations(client)
+    tyre_id = _tyre(client, quantity=1)
+    _stock(client, tyre_id, ids["DUB"], 2)
+    _stock(client, tyre_id, ids["CRK"], 4)
+
+    # One unassigned unit, then the fullest location.
+    tyre = client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -3}).json()
+    assert tyre["quantity"] == 4
+    breakdown = client.get(f"/api/tyres/{tyre_id}/locations").json()
+    assert (breakdown["unassigned"], _by_code(breakdown)) == (0, {"DUB": 2, "CRK": 2})
+
+    batch = client.post("/api/tyres/stock/batch",
+                        json={"items": [{"tyre_id": tyre_id, "delta": -3}]})
+    assert batch.json() == [{"tyre_id": tyre_id, "quantity": 1}]
+    assert client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -2}).status_code == 409
+
+    assert client.patch(f"/api/tyres/{tyre_id}", json={"quantity": 0}).status_code == 200
+    breakdown = client.get(f"/api/tyres/{tyre_id}/locations").json()
+    assert (breakdown["quantity"], breakdown["locations"]) == (0, [])
+
+
+def test_reservations_and_orders_on_located_stock(client, db):
+    ids = _locations(client)
+    tyre_id = _tyre(client)
+    _stock(client, tyre_id, ids["DUB"], 5)
+
+    hold = client.post(f"/api/tyres/{tyre_id}/reservations", json={"quantity": 2}).json()
+    assert client.post(f"/api/reservations/{hold['id']}/confirm").status_code == 200
+    assert _by_code(client.get(f"/api/tyres/{tyre_id}/locations").json()) == {"DUB": 3}
+
+    updated = order_worker.apply_orders(db, [
+        {"order_id": "o-1", "type": "SELL", "items": [{"tyre_id": tyre_id, "quantity": 2}]},
+    ])
+    assert updated == {tyre_id: 1}
+    db.expire_all()
+    tyre = db.get(TyreModel, tyre_id)
+    assert (tyre.quantity, tyre.located) == (1, 1)
+
+
+def test_allocation_takes_from_the_nearest_location_with_enough(client, db):
+    ids = _locations(client)
+    tyre_id = _tyre(client)
+    _stock(client, tyre_id, ids["DUB"], 2)
+    _stock(client, tyre_id, ids["CRK"], 10)
+    _stock(client, tyre_id, ids["ATH"], 4)
+
+    naas = {"latitude": 53.22, "longitude": -6.66}
+    allocated = client.post(f"/api/tyres/{tyre_id}/allocate",
+                            json={"quantity": 4, **naas}).json()
+    # Dublin is nearest but short; Athlone is the next nearest with 4.
+    assert (allocated["code"], allocated["quantity"]) == ("ATH", 4)
+    assert 80 < allocated["distance_km"] < 100
+
+    assert client.post(f"/api/tyres/{tyre_id}/allocate",
+                       json={"quantity": 1, **naas}).json()["code"] == "DUB"
+
+    breakdown = client.get(f"/api/tyres/{tyre_id}/locations").json()
+    assert (breakdown["quantity"], _by_code(breakdown)) == (11, {"DUB": 1, "CRK": 10})
+
+    refused = client.post(f"/api/tyres/{tyre_id}/allocate", json={"quantity": 11, **naas})
+    assert refused.status_code == 409
+    missing = client.post("/api/tyres/99999/allocate", json={"quantity": 1, **naas})
+    assert missing.status_code == 404
+
+    events = db.execute(select(OutboxModel.quantity).where(OutboxModel.tyre_id == tyre_id)
+                        .order_by(OutboxModel.id)).scalars().all()
+    assert events[-2:] == [12, 11]
+
+
+def test_import_keeps_room_for_located_stock(client):
+    ids = _locations(client)
+    tyre_id = _tyre(client, quantity=1)
+    _stock(client, tyre_id, ids["DUB"], 5)
+
+    rows = [
+        {**VALID_PAYLOAD, "model": "Other", "quantity": 3},
+        {**VALID_PAYLOAD, "quantity": 4},
+    ]
+    result = client.post("/api/tyres/import", json=rows).json()
+    assert result["upserted"] == 1
+    assert [(error["row"], error["errors"][0]["type"]) for error in result["errors"]] == [
+        (2, "located_stock")
+    ]
+    assert client.get(f"/api/tyres/{tyre_id}").json()["quantity"] == 6
+
+
+def test_sharded_tyres_hold_no_location_stock(client):
+    ids = _locations(client)
+    sharded = _tyre(client, quantity=4, model="Hot")
+    client.put(f"/api/tyres/{sharded}/stock/shards", json={"count": 2})
+    refused = _stock(client, sharded, ids["DUB"], 1)
+    assert (refused.status_code, refused.json()["detail"]) == (
+        409, "Sharded stock has no locations"
+    )
+
+    located = _tyre(client, model="Branch")
+    _stock(client, located, ids["DUB"], 1)
+    assert client.put(f"/api/tyres/{located}/stock/shards", json={"count": 2}).status_code == 409
+
+
+def test_locations_are_listed_and_admin_managed(client, employee_headers):
+    _locations(client)
+    assert [loc["code"] for loc in client.get("/api/locations").json()] == ["DUB", "CRK", "ATH"]
+    duplicate = {"code": "DUB", "name": "Again", "latitude": 0, "longitude": 0}
+    assert client.post("/api/locations", json=duplicate).status_code == 409
+    other = {**duplicate, "code": "NEW"}
+    assert client.post("/api/locations", json=other, headers=employee_headers).status_code == 403
@@ -1,6 +1,17 @@
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
 import pytest
 from decimal import Decimal
 
+from sqlalchemy import event
+
+from app import database, main
+from app.schemas import TyreSchema
+
 VALID_PAYLOAD = {
     "brand": "TestBrand",
     "model": "TestModel",
@@ -24,6 +35,30 @@ def test_health_check(client):
     assert response.json() == {"status": "ok"}
 
 
+def test_ready_checks_database_and_pool(client, monkeypatch):
+    assert client.get("/ready").json() == {"status": "ready"}
+
+    async def down():
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(main, "ping_database", down)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable", "database": "OSError"}
+
+    async def hangs():
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(main, "READY_TIMEOUT", 0.01)
+    monkeypatch.setattr(main, "ping_database", hangs)
+    assert client.get("/ready").json()["database"] == "no answer within 0.01s"
+
+    monkeypatch.setattr(main, "pool_saturated", lambda eng: True)
+    assert client.get("/ready").json()["pool_sync"] == "exhausted"
+    # Liveness does not depend on any of it.
+    assert client.get("/health").status_code == 200
+
+
 def test_create_tyre(client):
     response = client.post("/api/tyres", json=VALID_PAYLOAD)
     assert response.status_code == 201
@@ -219,3 +254,383 @@ def test_service_token_can_patch_stock(client, anon_client, service_headers):
         anon_client.delete(f"/api/tyres/{created['id']}", headers=service_headers).status_code
         == 403
     )
+
+
+# Catalogue listing: filters + keyset pagination
+
+def _create_many(client, count, **overrides):
+    ids = []
+    for i in range(count):
+        payload = {**VALID_PAYLOAD, "model": f"Model{i}", **overrides}
+        ids.append(client.post("/api/tyres", json=payload).json()["id"])
+    return ids
+
+
+def test_list_tyres_keyset_pagination(client):
+    ids = _create_many(client, 5)
+
+    first = client.get("/api/tyres", params={"limit": 2})
+    assert [t["id"] for t in first.json()] == ids[:2]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get("/api/tyres", params={"limit": 2, "after": cursor})
+    assert [t["id"] for t in second.json()] == ids[2:4]
+
+    last = client.get(
+        "/api/tyres", params={"limit": 2, "after": second.headers["X-Next-Cursor"]}
+    )
+    assert [t["id"] for t in last.json()] == ids[4:]
+    assert "X-Next-Cursor" not in last.headers
+
+
+def test_list_tyres_filters(client):
+    _create_many(client, 2)
+    _create_many(client, 1, brand="Other", season="Winter", ev_approved=True)
+    _create_many(client, 1, brand="Third", quantity=0, cost="300.00")
+
+    assert len(client.get("/api/tyres", params={"brand": "Other"}).json()) == 1
+    assert len(client.get("/api/tyres", params={"season": "Winter"}).json()) == 1
+    assert len(client.get("/api/tyres", params={"ev_approved": True}).json()) == 1
+    assert len(client.get("/api/tyres", params={"in_stock": True}).json()) == 3
+    assert len(client.get("/api/tyres", params={"min_price": "200"}).json()) == 1
+    assert len(client.get("/api/tyres", params={"max_price": "200"}).json()) == 3
+
+
+def test_list_tyres_rejects_bad_limit(client):
+    assert client.get("/api/tyres", params={"limit": 0}).status_code == 422
+    assert client.get("/api/tyres", params={"season": "Monsoon"}).status_code == 422
+
+
+# Streaming export
+
+def test_export_ndjson(client):
+    ids = _create_many(client, 3)
+    response = client.get("/api/tyres/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ids
+    assert set(rows[0]) == {"id", *TyreSchema.model_fields}
+    assert Decimal(rows[0]["retail_cost"]) == Decimal("135.00")
+
+
+def test_export_csv(client):
+    _create_many(client, 2)
+    _create_many(client, 1, brand="Other")
+    response = client.get("/api/tyres/export", params={"format": "csv", "brand": "Other"})
+    assert response.status_code == 200
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1
+    assert rows[0]["brand"] == "Other"
+    assert list(rows[0]) == ["id", *TyreSchema.model_fields]
+
+
+def test_export_csv_empty_catalogue_has_header(client):
+    response = client.get("/api/tyres/export", params={"format": "csv"})
+    assert response.text.strip() == ",".join(["id", *TyreSchema.model_fields])
+
+
+# Batch stock adjustment
+
+def test_stock_batch_applies_all_lines(client):
+    a, b = _create_many(client, 2)  # quantity 10 each
+    resp = client.post(
+        "/api/tyres/stock/batch",
+        json={"items": [
+            {"tyre_id": b, "delta": -4},
+            {"tyre_id": a, "delta": -1},
+            {"tyre_id": b, "delta": -2},
+        ]},
+    )
+    assert resp.status_code == 200
+    assert resp.json() == [{"tyre_id": a, "quantity": 9}, {"tyre_id": b, "quantity": 4}]
+
+
+def test_stock_batch_is_all_or_nothing(client):
+    a, b = _create_many(client, 2)
+    resp = client.post(
+        "/api/tyres/stock/batch",
+        json={"items": [
+            {"tyre_id": a, "delta": -5},
+            {"tyre_id": b, "delta": -11},
+            {"tyre_id": 99999, "delta": -1},
+        ]},
+    )
+    assert resp.status_code == 409
+    assert resp.json()["detail"]["failed"] == [
+        {"tyre_id": b, "reason": "Not enough stock"},
+        {"tyre_id": 99999, "reason": "Tyre not found"},
+    ]
+    assert client.get(f"/api/tyres/{a}").json()["quantity"] == 10
+
+
+def test_stock_batch_validation(client, anon_client, employee_headers):
+    a = _create_many(client, 1)[0]
+    assert client.post("/api/tyres/stock/batch", json={"items": []}).status_code == 422
+    zero = client.post(
+        "/api/tyres/stock/batch", json={"items": [{"tyre_id": a, "delta": 0}]}
+    )
+    assert zero.status_code == 400
+    denied = anon_client.post(
+        "/api/tyres/stock/batch",
+        json={"items": [{"tyre_id": a, "delta": -1}]},
+        headers=employee_headers,
+    )
+    assert denied.status_code == 403
+
+
+# Bulk import
+
+def test_import_json_upserts_on_natural_key(client):
+    existing = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    rows = [
+        {**VALID_PAYLOAD, "cost": "200.00", "quantity": 4},  # same natural key
+        {**VALID_PAYLOAD, "model": "Brand New"},
+        {**VALID_PAYLOAD, "speed_rate": "Z"},
+    ]
+    resp = client.post("/api/tyres/import", json=rows)
+    assert resp.status_code == 200
+    report = resp.json()
+    assert report["received"] == 3
+    assert report["upserted"] == 2
+    assert [e["row"] for e in report["errors"]] == [3]
+    assert report["errors"][0]["errors"][0]["loc"] == ["speed_rate"]
+
+    tyres = client.get("/api/tyres").json()
+    assert len(tyres) == 2
+    updated = client.get(f"/api/tyres/{existing['id']}").json()
+    assert updated["quantity"] == 4
+    assert Decimal(str(updated["retail_cost"])) == Decimal("270.00")
+
+
+def test_import_csv_price_list(client):
+    with open("app/tyredatabase.csv", "rb") as f:
+        body = f.read()
+    resp = client.post(
+        "/api/tyres/import", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert resp.status_code == 200
+    report = resp.json()
+    # the sample list has some dirty rows (e.g. ev_approved "FALES")
+    assert report["upserted"] > 0
+    assert report["upserted"] + len(report["errors"]) == report["received"]
+    assert len(client.get("/api/tyres", params={"limit": 500}).json()) == report["upserted"]
+
+
+def test_import_keeps_room_for_reserved_stock(client):
+    existing = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    client.post(f"/api/tyres/{existing['id']}/reservations", json={"quantity": 5})
+    rows = [
+        {**VALID_PAYLOAD, "quantity": 3},
+        {**VALID_PAYLOAD, "model": "Brand New"},
+    ]
+    report = client.post("/api/tyres/import", json=rows).json()
+    assert report["upserted"] == 1
+    assert report["errors"] == [{"row": 1, "errors": [{
+        "type": "reserved_stock", "loc": ["quantity"],
+        "msg": "Quantity is below the stock reserved", "input": 3,
+    }]}]
+    assert client.get(f"/api/tyres/{existing['id']}").json()["quantity"] == 10
+    assert len(client.get("/api/tyres").json()) == 2
+
+
+def test_import_rejects_non_array_body(client, anon_client, employee_headers):
+    assert client.post("/api/tyres/import", json={"brand": "x"}).status_code == 400
+    assert (
+        anon_client.post("/api/tyres/import", json=[], headers=employee_headers).status_code
+        == 403
+    )
+
+
+# Metrics
+
+def test_metrics_endpoint_exposes_route_and_query_latency(client):
+    created = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    client.get(f"/api/tyres/{created['id']}")
+    client.get("/api/tyres/99999")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'route="/api/tyres/{tyre_id}",status="200"' in body
+    assert 'route="/api/tyres/{tyre_id}",status="404"' in body
+    assert 'tyres_db_query_duration_seconds_count{operation="SELECT"}' in body
+    assert "tyres_jwt_decode_duration_seconds_count" in body
+    assert 'tyres_db_pool_checked_out{engine="sync"}' in body
+
+
+def test_multiprocess_metrics_keep_this_process_pool_gauges(client, monkeypatch, tmp_path):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    body = client.get("/metrics").text
+    assert f'tyres_db_pool_checked_out{{engine="sync",pid="{os.getpid()}"}}' in body
+
+
+# ETags / conditional requests
+
+def test_get_tyre_etag_and_not_modified(client):
+    created = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    response = client.get(f"/api/tyres/{created['id']}")
+    etag = response.headers["ETag"]
+    assert etag == 'W/"1"'
+
+    cached = client.get(f"/api/tyres/{created['id']}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+
+def test_writes_bump_the_etag(client):
+    created = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    url = f"/api/tyres/{created['id']}"
+
+    patched = client.patch(url, json={"quantity": 5})
+    assert patched.headers["ETag"] == 'W/"2"'
+    stocked = client.post(f"{url}/stock", json={"delta": -1})
+    assert stocked.headers["ETag"] == 'W/"3"'
+
+    assert client.get(url, headers={"If-None-Match": 'W/"1"'}).status_code == 200
+    assert client.get(url).json()["version"] == 3
+
+
+def test_if_match_rejects_stale_writes(client):
+    created = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    url = f"/api/tyres/{created['id']}"
+    client.patch(url, json={"quantity": 5})
+
+    stale = client.patch(url, json={"quantity": 1}, headers={"If-Match": 'W/"1"'})
+    assert stale.status_code == 412
+    assert client.get(url).json()["quantity"] == 5
+
+    fresh = client.put(url, json=VALID_PAYLOAD, headers={"If-Match": 'W/"2"'})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] == 'W/"3"'
+
+    garbled = client.patch(url, json={"quantity": 1}, headers={"If-Match": "nonsense"})
+    assert garbled.status_code == 412
+
+
+def test_list_tyres_not_modified_until_a_write(client):
+    ids = _create_many(client, 3)
+    first = client.get("/api/tyres")
+    etag = first.headers["ETag"]
+
+    assert client.get("/api/tyres", headers={"If-None-Match": etag}).status_code == 304
+
+    client.patch(f"/api/tyres/{ids[1]}", json={"quantity": 9})
+    changed = client.get("/api/tyres", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+# Statements per write: one round trip (plus COMMIT) on success, and one
+# more for the outbox event of a stock or price change or the tombstone
+# of a delete. The first priced write also loads the pricing rules,
+# which are then cached.
+
+@contextlib.contextmanager
+def _statements():
+    """Record the SQL verbs the API sends while the block runs."""
+    if database.ASYNC_DB:
+        bind = database._async_sessionmaker.kw["bind"].sync_engine
+    else:
+        bind = database.engine
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement.split(None, 1)[0].upper())
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield seen
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+
+def test_writes_cost_one_statement(client):
+    with _statements() as seen:
+        created = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    assert seen == ["SELECT", "INSERT"]
+    with _statements() as seen:
+        client.post("/api/tyres", json={**VALID_PAYLOAD, "model": "Other"})
+    assert seen == ["INSERT"]
+    url = f"/api/tyres/{created['id']}"
+
+    for method, kwargs in [
+        (client.put, {"json": {**VALID_PAYLOAD, "quantity": 3}}),
+        (client.patch, {"json": {"quantity": 4}, "headers": {"If-Match": 'W/"2"'}}),
+        (client.post, {"json": {"delta": -1}}),
+    ]:
+        target = f"{url}/stock" if method == client.post else url
+        with _statements() as seen:
+            assert method(target, **kwargs).status_code == 200
+        assert seen == ["UPDATE", "INSERT"]
+
+    with _statements() as seen:
+        assert client.patch(url, json={"noise_level": 68}).status_code == 200
+    assert seen == ["UPDATE"]
+
+    with _statements() as seen:
+        assert client.delete(url).status_code == 204
+    # SQLite fixes the tombstone's change feed position before the DELETE
+    # (Postgres takes it from a sequence inside the INSERT).
+    assert seen == ["SELECT", "DELETE", "INSERT"]
+
+
+def test_failed_writes_keep_their_status_codes(client):
+    first = client.post("/api/tyres", json=VALID_PAYLOAD).json()
+    second = client.post("/api/tyres", json={**VALID_PAYLOAD, "model": "Other"}).json()
+
+    assert client.post("/api/tyres", json=VALID_PAYLOAD).status_code == 409
+    clash = client.put(f"/api/tyres/{second['id']}", json=VALID_PAYLOAD)
+    assert clash.status_code == 409
+    assert client.put("/api/tyres/99999", json=VALID_PAYLOAD).status_code == 404
+    assert client.patch("/api/tyres/99999", json={"quantity": 1}).status_code == 404
+    stale = client.patch(
+        f"/api/tyres/{first['id']}", json={"quantity": 1}, headers={"If-Match": 'W/"7"'}
+    )
+    assert stale.status_code == 412
+    assert client.delete("/api/tyres/99999").status_code == 404
+
+
+# Facets
+
+def test_facets_count_values_and_price_range(client):
+    _create_many(client, 3)
+    _create_many(client, 2, brand="Other", season="Winter", ev_approved=True, cost="200.00")
+
+    body = client.get("/api/tyres/facets").json()
+    assert body["total"] == 5
+    assert body["retail_cost"] == {"min": 135.0, "max": 270.0}
+    assert body["facets"]["brand"] == [
+        {"value": "TestBrand", "count": 3}, {"value": "Other", "count": 2},
+    ]
+    assert body["facets"]["ev_approved"] == [
+        {"value": False, "count": 3}, {"value": True, "count": 2},
+    ]
+    assert body["facets"]["season"][1] == {"value": "Winter", "count": 2}
+
+    winter = client.get("/api/tyres/facets", params={"season": "Winter"}).json()
+    assert winter["total"] == 2
+    assert winter["facets"]["brand"] == [{"value": "Other", "count": 2}]
+
+
+def test_facets_are_cached_until_a_write(client):
+    ids = _create_many(client, 2)
+    assert client.get("/api/tyres/facets").json()["total"] == 2
+
+    with _statements() as seen:
+        assert client.get("/api/tyres/facets").json()["total"] == 2
+    assert seen == []
+
+    client.delete(f"/api/tyres/{ids[0]}")
+    assert client.get("/api/tyres/facets").json()["total"] == 1
+
+
+def test_facets_of_an_empty_catalogue(client):
+    body = client.get("/api/tyres/facets", params={"brand": "Nope"}).json()
+    assert body["total"] == 0
+    assert body["retail_cost"] == {"min": None, "max": None}
+    assert body["facets"]["brand"] == []
@@ -0,0 +1,154 @@
+import asyncio
+import json
+from decimal import Decimal
+
+from sqlalchemy.exc import OperationalError
+
+from app import order_worker
+from app.models import ProcessedEventModel, TyreModel
+
+
+class FakeMessage:
+    def __init__(self, data, routing_key="order.created"):
+        self.body = (data if isinstance(data, str) else json.dumps(data)).encode()
+        self.routing_key = routing_key
+        self.outcome = None
+
+    async def ack(self):
+        self.outcome = "ack"
+
+    async def nack(self, requeue=True):
+        self.outcome = "nack"
+
+    async def reject(self, requeue=False):
+        self.outcome = "reject"
+
+
+def _tyre(db, quantity=10, model="M"):
+    tyre = TyreModel(
+        brand="B", model=model, size="205/55R16", load_rate=91, speed_rate="H",
+        season="Summer", supplier="Supplier", fuel_efficiency="C", noise_level=70,
+        weather_efficiency="C", ev_approved=False, cost=Decimal("100.00"),
+        quantity=quantity, retail_cost=Decimal("135.00"),
+    )
+    db.add(tyre)
+    db.commit()
+    return tyre.id
+
+
+def _quantity(db, tyre_id):
+    db.expire_all()
+    return db.get(TyreModel, tyre_id).quantity
+
+
+def test_batch_applies_each_order(db):
+    a, b = _tyre(db, model="A"), _tyre(db, model="B")
+    updated = order_worker.apply_orders(db, [
+        {"order_id": 1, "type": "SELL", "items": [{"tyre_id": a, "quantity": 3}]},
+        {"order_id": 2, "type": "BUY", "items": [
+            {"tyre_id": a, "quantity": 1}, {"tyre_id": b, "quantity": 5},
+        ]},
+    ])
+    assert updated == {a: 8, b: 15}
+
+
+def test_orders_in_a_batch_are_checked_one_by_one(db):
+    tyre_id = _tyre(db, quantity=5)
+    updated = order_worker.apply_orders(db, [
+        {"order_id": 1, "type": "SELL", "items": [{"tyre_id": tyre_id, "quantity": 3}]},
+        {"order_id": 2, "type": "SELL", "items": [{"tyre_id": tyre_id, "quantity": 4}]},
+        {"order_id": 3, "type": "BUY", "items": [{"tyre_id": tyre_id, "quantity": 2}]},
+    ])
+    # Netted, the batch would be -5 and fit; the second sale alone does not.
+    assert updated == {tyre_id: 4}
+    assert _quantity(db, tyre_id) == 4
+    # The rejected order is claimed too, so redelivery does not retry it.
+    assert db.get(ProcessedEventModel, "order.created:2") is not None
+
+
+def test_order_with_a_short_line_writes_nothing(db):
+    a, b = _tyre(db, model="A"), _tyre(db, quantity=2, model="B")
+    updated = order_worker.apply_orders(db, [
+        {"order_id": 1, "type": "SELL", "items": [{"tyre_id": a, "quantity": 1},
+                                                  {"tyre_id": b, "quantity": 3}]},
+        {"order_id": 2, "type": "SELL", "items": [{"tyre_id": b, "quantity": 2}]},
+    ])
+    assert updated == {b: 0}
+    assert (_quantity(db, a), _quantity(db, b)) == (10, 0)
+
+
+def test_redelivered_order_is_applied_once(db):
+    tyre_id = _tyre(db)
+    order = {"order_id": 42, "type": "SELL", "items": [{"tyre_id": tyre_id, "quantity": 2}]}
+
+    order_worker.apply_orders(db, [order, order])
+    order_worker.apply_orders(db, [order])
+
+    assert _quantity(db, tyre_id) == 8
+    assert db.get(ProcessedEventModel, "order.created:42") is not None
+
+
+def test_sale_beyond_stock_leaves_quantity_unchanged(db):
+    tyre_id = _tyre(db, quantity=2)
+    updated = order_worker.apply_orders(
+        db, [{"type": "SELL", "items": [{"tyre_id": tyre_id, "quantity": 3},
+                                        {"tyre_id": 99999, "quantity": 1}]}]
+    )
+    assert updated == {}
+    assert _quantity(db, tyre_id) == 2
+
+
+def test_process_batch_acks_applied_and_rejects_malformed(db):
+    tyre_id = _tyre(db)
+    good = FakeMessage({"order_id": 7, "type": "SELL",
+                        "items": [{"tyre_id": tyre_id, "quantity": 1}]})
+    bad = FakeMessage("not json")
+    other = FakeMessage({"type": "SELL"}, routing_key="order.cancelled")
+
+    asyncio.run(order_worker.process_batch([good, bad, other]))
+
+    assert (good.outcome, bad.outcome, other.outcome) == ("ack", "reject", "ack")
+    assert _quantity(db, tyre_id) == 9
+
+
+def test_failed_batch_is_retried_one_by_one(db, monkeypatch):
+    tyre_id = _tyre(db)
+    apply_orders = order_worker.apply_orders
+
+    def failing(session, orders):
+        if any(order["order_id"] == "poison" for order in orders):
+            raise RuntimeError("constraint violated")
+        return apply_orders(session, orders)
+
+    monkeypatch.setattr(order_worker, "apply_orders", failing)
+    good = FakeMessage({"order_id": 1, "type": "SELL",
+                        "items": [{"tyre_id": tyre_id, "quantity": 1}]})
+    poison = FakeMessage({"order_id": "poison", "type": "SELL",
+                          "items": [{"tyre_id": tyre_id, "quantity": 1}]})
+
+    asyncio.run(order_worker.process_batch([good, poison]))
+
+    assert (good.outcome, poison.outcome) == ("ack", "reject")
+    assert _quantity(db, tyre_id) == 9
+
+
+def test_batch_is_requeued_while_the_database_is_down(db, monkeypatch):
+    tyre_id = _tyre(db)
+
+    def unavailable(session, orders):
+        raise OperationalError("UPDATE tyres", {}, Exception("server closed the connection"))
+
+    monkeypatch.setattr(order_worker, "apply_orders", unavailable)
+    monkeypatch.setattr(order_worker, "RETRY_DELAY", 0)
+    monkeypatch.setattr(order_worker, "_retry_delay", 0.0)
+    messages = [
+        FakeMessage({"order_id": i, "type": "SELL",
+                     "items": [{"tyre_id": tyre_id, "quantity": 1}]})
+        for i in (1, 2)
+    ]
+
+    asyncio.run(order_worker.process_batch(messages))
+
+    # Not applied, not dropped: redelivered once the database is back.
+    assert [msg.outcome for msg in messages] == ["nack", "nack"]
+    assert _quantity(db, tyre_id) == 10
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import types
+
+import pytest
+from sqlalchemy import select
+
+from app import order_worker, outbox_publisher, tyre_rpc_worker
+from app.cache import tyre_cache
+from app.local_broker import LocalExchange, topic_matches
+from app.models import OutboxModel
+from tests.test_main import VALID_PAYLOAD
+
+
+def _create(client, model="A", quantity=10):
+    payload = {**VALID_PAYLOAD, "model": model, "quantity": quantity}
+    return client.post("/api/tyres", json=payload).json()["id"]
+
+
+def _outbox(db):
+    db.expire_all()
+    return db.execute(select(OutboxModel).order_by(OutboxModel.id)).scalars().all()
+
+
+def _relay(exchange, batch_size=100):
+    return asyncio.run(outbox_publisher.relay_batch(exchange, batch_size))
+
+
+@pytest.fixture
+def db_after(client):
+    """Session for inspecting what the API wrote (the client resets the schema)."""
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_stock_and_price_changes_queue_events(client, db_after):
+    tyre_id = _create(client)
+    assert _outbox(db_after) == []  # creation is not a change
+
+    client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -3})
+    client.patch(f"/api/tyres/{tyre_id}", json={"cost": "200.00"})
+    client.patch(f"/api/tyres/{tyre_id}", json={"noise_level": 68})
+    client.post("/api/tyres/stock/batch", json={"items": [{"tyre_id": tyre_id, "delta": 2}]})
+
+    events = _outbox(db_after)
+    assert [(e.routing_key, e.quantity, str(e.retail_cost)) for e in events] == [
+        ("tyre.stock.changed", 7, "135.00"),
+        ("tyre.price.changed", 7, "270.00"),
+        ("tyre.stock.changed", 9, "270.00"),
+    ]
+    assert [e.version for e in events] == [2, 3, 5]
+
+
+def test_rejected_change_queues_nothing(client, db_after):
+    tyre_id = _create(client, quantity=1)
+    assert client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -5}).status_code == 409
+    assert _outbox(db_after) == []
+
+
+def test_reservations_queue_availability_changes(client, db_after):
+    tyre_id = _create(client)
+    held = client.post(f"/api/tyres/{tyre_id}/reservations", json={"quantity": 4}).json()
+    client.post(f"/api/reservations/{held['id']}/confirm")
+
+    events = _outbox(db_after)
+    assert [(e.quantity, e.reserved) for e in events] == [(10, 4), (6, 0)]
+
+
+def test_publisher_relays_in_order_and_deletes(client, db_after):
+    a, b = _create(client, "A"), _create(client, "B")
+    client.post(f"/api/tyres/{a}/stock", json={"delta": -1})
+    client.post(f"/api/tyres/{b}/stock", json={"delta": -2})
+    client.post(f"/api/tyres/{a}/stock", json={"delta": -3})
+
+    exchange = LocalExchange()
+    assert _relay(exchange, batch_size=2) == 2
+    assert _relay(exchange, batch_size=2) == 1
+    assert _relay(exchange) == 0
+
+    bodies = [json.loads(message.body) for _key, message in exchange.published]
+    assert [(body["tyre_id"], body["quantity"]) for body in bodies] == [(a, 9), (b, 8), (a, 6)]
+    assert bodies[0]["available"] == 9 and bodies[0]["retail_cost"] == "135.00"
+    assert {key for key, _message in exchange.published} == {"tyre.stock.changed"}
+    assert exchange.published[0][1].message_id == str(bodies[0]["event_id"])
+    assert _outbox(db_after) == []
+
+
+def test_failed_publish_keeps_batch_for_redelivery(client, db_after):
+    tyre_id = _create(client)
+    client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -1})
+    client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -1})
+
+    class FlakyExchange(LocalExchange):
+        async def publish(self, message, routing_key, **kwargs):
+            await super().publish(message, routing_key, **kwargs)
+            if len(self.published) == 1:
+                raise ConnectionError("broker went away")
+
+    exchange = FlakyExchange()
+    with pytest.raises(ConnectionError):
+        _relay(exchange)
+    assert len(_outbox(db_after)) == 2
+
+    assert _relay(exchange) == 2
+    quantities = [json.loads(message.body)["quantity"] for _key, message in exchange.published]
+    assert quantities == [9, 9, 8]  # at least once: the first event went out twice
+    assert _outbox(db_after) == []
+
+
+def test_relay_loop_stops_when_asked(client, db_after):
+    tyre_id = _create(client)
+    client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -1})
+    exchange = LocalExchange()
+    changes = exchange.bind("tyre.*.changed")
+
+    async def run():
+        stopping = asyncio.Event()
+        task = asyncio.create_task(outbox_publisher.relay(exchange, stopping))
+        message = await asyncio.wait_for(changes.get(), 5)
+        stopping.set()
+        await asyncio.wait_for(task, 5)
+        return message
+
+    assert json.loads(asyncio.run(run()).body)["tyre_id"] == tyre_id
+
+
+def test_order_worker_queues_stock_events(db):
+    from tests.test_order_worker import _tyre
+
+    tyre_id = _tyre(db)
+    order_worker.apply_orders(
+        db, [{"order_id": 1, "type": "SELL", "items": [{"tyre_id": tyre_id, "quantity": 2}]}]
+    )
+    assert [(e.tyre_id, e.quantity) for e in _outbox(db)] == [(tyre_id, 8)]
+
+
+def test_rpc_worker_evicts_changed_tyres(client):
+    tyre_id = _create(client)
+    tyre_rpc_worker.lookup_tyres([tyre_id])
+    assert tyre_cache.get(tyre_id) is not None
+
+    event = types.SimpleNamespace(
+        body=json.dumps({"tyre_id": tyre_id}).encode(), routing_key="tyre.stock.changed"
+    )
+    asyncio.run(tyre_rpc_worker.drop_changed_tyre(event))
+    assert tyre_cache.get(tyre_id) is None
+    asyncio.run(tyre_rpc_worker.drop_changed_tyre(types.SimpleNamespace(
+        body=b"{}", routing_key="tyre.stock.changed"
+    )))
+
+
+@pytest.mark.parametrize("pattern, key, expected", [
+    ("tyre.*.changed", "tyre.stock.changed", True),
+    ("tyre.*.changed", "tyre.stock.level.changed", False),
+    ("tyre.#", "tyre.price.changed", True),
+    ("#", "order.created", True),
+    ("tyre.#.changed", "tyre.changed", True),
+    ("order.created", "order.cancelled", False),
+])
+def test_topic_matching(pattern, key, expected):
+    assert topic_matches(pattern, key) is expected
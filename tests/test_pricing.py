@@ -0,0 +1,160 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+
+from app import crud, pricing
+from app.models import OutboxModel, PricingRuleModel, TyreModel
+from app.schemas import PricingRuleIn, TyreCreate
+from tests.test_main import VALID_PAYLOAD
+
+
+def _rule(client, **rule):
+    response = client.post("/api/pricing/rules", json=rule)
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def _create(client, **fields):
+    response = client.post("/api/tyres", json={**VALID_PAYLOAD, **fields})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_default_markup_without_rules(client):
+    assert _create(client)["retail_cost"] == 135.0
+
+
+def test_highest_priority_then_most_specific_rule_wins(client):
+    _rule(client, supplier="TestSupplier", markup="1.50")
+    _rule(client, supplier="TestSupplier", brand="TestBrand", markup="1.40")
+    _rule(client, season="Winter", markup="2.00", priority=10)
+
+    # Same priority: the supplier+brand rule is the more specific.
+    assert _create(client, model="A")["retail_cost"] == 140.0
+    assert _create(client, model="B", brand="Other")["retail_cost"] == 150.0
+    assert _create(client, model="C", season="Winter")["retail_cost"] == 200.0
+    assert _create(client, model="D", supplier="Elsewhere")["retail_cost"] == 135.0
+
+    rules = client.get("/api/pricing/rules").json()
+    assert [rule["markup"] for rule in rules] == [2.0, 1.5, 1.4]
+
+
+def test_updates_are_priced_by_the_rules(client):
+    _rule(client, brand="Premium", markup="1.60")
+    tyre = _create(client)
+
+    # A rule field changing reprices even when the cost does not.
+    tyre = client.patch(f"/api/tyres/{tyre['id']}", json={"brand": "Premium"}).json()
+    assert tyre["retail_cost"] == 160.0
+    tyre = client.patch(f"/api/tyres/{tyre['id']}", json={"cost": "80.55"}).json()
+    assert tyre["retail_cost"] == 128.88
+    tyre = client.put(f"/api/tyres/{tyre['id']}", json={**VALID_PAYLOAD, "cost": "10.00"}).json()
+    assert tyre["retail_cost"] == 13.5
+
+
+def test_import_is_priced_by_the_rules(client):
+    _rule(client, supplier="Cheap Co", markup="1.10")
+    rows = [
+        {**VALID_PAYLOAD, "model": "A"},
+        {**VALID_PAYLOAD, "model": "B", "supplier": "Cheap Co"},
+    ]
+    assert client.post("/api/tyres/import", json=rows).status_code == 200
+    prices = {tyre["model"]: tyre["retail_cost"] for tyre in client.get("/api/tyres").json()}
+    assert prices == {"A": 135.0, "B": 110.0}
+
+
+def test_rule_updates_and_deletes(client):
+    rule = _rule(client, brand="TestBrand", markup="1.50")
+    assert _create(client, model="A")["retail_cost"] == 150.0
+
+    response = client.put(f"/api/pricing/rules/{rule['id']}", json={"brand": "TestBrand",
+                                                                    "markup": "1.20"})
+    assert response.status_code == 200
+    assert _create(client, model="B")["retail_cost"] == 120.0
+
+    assert client.delete(f"/api/pricing/rules/{rule['id']}").status_code == 204
+    assert _create(client, model="C")["retail_cost"] == 135.0
+
+    assert client.delete(f"/api/pricing/rules/{rule['id']}").status_code == 404
+    assert client.put(f"/api/pricing/rules/{rule['id']}", json={"markup": "1.2"}).status_code == 404
+    assert client.post("/api/pricing/rules", json={"markup": "0"}).status_code == 422
+
+
+def test_pricing_rules_are_admin_only(client, employee_headers):
+    assert client.get("/api/pricing/rules", headers=employee_headers).status_code == 403
+    response = client.post("/api/pricing/reprice", headers=employee_headers)
+    assert response.status_code == 403
+
+
+def test_reprice_endpoint(client):
+    tyre = _create(client)
+    _rule(client, markup="1.25")
+    assert client.get(f"/api/tyres/{tyre['id']}").json()["retail_cost"] == 135.0
+
+    assert client.post("/api/pricing/reprice").json() == {"total": 1, "repriced": 1, "chunks": 1}
+    repriced = client.get(f"/api/tyres/{tyre['id']}").json()
+    assert repriced["retail_cost"] == 125.0
+    assert repriced["version"] == tyre["version"] + 1
+
+
+def _add_tyres(db, count):
+    for i in range(count):
+        data = TyreCreate.model_validate(
+            {**VALID_PAYLOAD, "model": f"M{i}", "brand": ("Alpha", "Beta")[i % 2]}
+        ).model_dump()
+        db.add(TyreModel(**{**data, "retail_cost": pricing.retail_price(data["cost"])}))
+    db.commit()
+
+
+def test_reprice_in_chunks_writes_only_changed_tyres(db):
+    _add_tyres(db, 7)
+    crud.create_pricing_rule(db, PricingRuleIn(brand="Alpha", markup=Decimal("1.5")))
+    before = {row.id: row for row in db.execute(select(TyreModel)).scalars()}
+    versions = {tyre_id: tyre.version for tyre_id, tyre in before.items()}
+    db.expire_all()
+
+    progress = []
+    result = crud.reprice_tyres(db, chunk_size=3, progress=lambda *p: progress.append(p))
+
+    assert result == {"total": 7, "repriced": 4, "chunks": 3}
+    assert progress == [(3, 7, 2), (6, 7, 3), (7, 7, 4)]
+    tyres = db.execute(select(TyreModel).order_by(TyreModel.id)).scalars().all()
+    for tyre in tyres:
+        alpha = tyre.brand == "Alpha"
+        assert tyre.retail_cost == (Decimal("150.00") if alpha else Decimal("135.00"))
+        assert tyre.version == versions[tyre.id] + alpha
+    repriced = [tyre for tyre in tyres if tyre.brand == "Alpha"]
+    # Every repriced row took its own change feed position.
+    assert len({tyre.change_seq for tyre in repriced}) == len(repriced)
+    events = db.execute(select(OutboxModel.routing_key, OutboxModel.tyre_id)).all()
+    assert sorted(events) == sorted((crud.PRICE_CHANGED, tyre.id) for tyre in repriced)
+
+    # Nothing left to change: a rerun writes nothing.
+    assert crud.reprice_tyres(db, chunk_size=3)["repriced"] == 0
+    assert db.execute(select(func.count()).select_from(OutboxModel)).scalar_one() == 4
+
+
+def test_compiled_rules_are_cached_until_a_rule_changes(db, monkeypatch):
+    crud.create_pricing_rule(db, PricingRuleIn(season="Winter", markup=Decimal("2")))
+    rules = pricing.pricing_rules(db)
+    assert pricing.pricing_rules(db) is rules
+    assert rules.markup_for({"season": "Winter"}) == Decimal("2")
+    assert rules.markup_for({"season": "Summer"}) == pricing.RETAIL_MARKUP
+
+    # Another process's change: seen once the TTL has passed.
+    db.add(PricingRuleModel(season="Summer", markup=Decimal("1.1"), priority=1))
+    db.commit()
+    assert pricing.pricing_rules(db) is rules
+    monkeypatch.setattr(pricing, "PRICING_RULES_TTL", -1)
+    reloaded = pricing.pricing_rules(db)
+    assert reloaded is not rules
+    assert reloaded.markup_for({"season": "Summer"}) == Decimal("1.1")
+
+
+@pytest.mark.parametrize("cost, markup, expected", [
+    (Decimal("10.01"), Decimal("1.5"), Decimal("15.02")),  # 15.015 rounds half up
+    (Decimal("99.99"), Decimal("1.35"), Decimal("134.99")),
+])
+def test_retail_price_rounds_half_up(cost, markup, expected):
+    assert pricing.retail_price(cost, markup) == expected
@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from fastapi import HTTPException
+
+from app import crud, reservation_sweeper
+from app.database import SessionLocal
+from app.models import ReservationModel, TyreModel
+from tests.test_main import VALID_PAYLOAD
+
+
+def _create(client, quantity=10):
+    payload = {**VALID_PAYLOAD, "quantity": quantity}
+    return client.post("/api/tyres", json=payload).json()["id"]
+
+
+def _hold(client, tyre_id, quantity, **extra):
+    return client.post(
+        f"/api/tyres/{tyre_id}/reservations", json={"quantity": quantity, **extra}
+    )
+
+
+def _availability(client, tyre_id):
+    return client.get(f"/api/tyres/{tyre_id}/availability").json()
+
+
+def test_hold_confirm_and_release(client):
+    tyre_id = _create(client, quantity=10)
+
+    held = _hold(client, tyre_id, 4)
+    assert held.status_code == 201
+    assert held.json()["status"] == "held"
+    assert _availability(client, tyre_id) == {
+        "tyre_id": tyre_id, "quantity": 10, "reserved": 4, "available": 6,
+    }
+
+    confirmed = client.post(f"/api/reservations/{held.json()['id']}/confirm")
+    assert confirmed.json()["status"] == "confirmed"
+    assert _availability(client, tyre_id)["quantity"] == 6
+    assert _availability(client, tyre_id)["reserved"] == 0
+
+    other = _hold(client, tyre_id, 2).json()
+    released = client.post(f"/api/reservations/{other['id']}/release")
+    assert released.json()["status"] == "released"
+    assert _availability(client, tyre_id)["available"] == 6
+    assert client.get(f"/api/tyres/{tyre_id}").json()["reserved"] == 0
+
+
+def test_holds_cannot_exceed_available_stock(client):
+    tyre_id = _create(client, quantity=5)
+    assert _hold(client, tyre_id, 3).status_code == 201
+    assert _hold(client, tyre_id, 3).status_code == 409
+    assert _hold(client, 99999, 1).status_code == 404
+
+    # Held units cannot be sold or edited away behind the reservation.
+    sold = client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -3})
+    assert sold.status_code == 409
+    assert client.patch(f"/api/tyres/{tyre_id}", json={"quantity": 2}).status_code == 409
+    assert client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": -2}).status_code == 200
+
+
+def test_reservations_close_exactly_once(client):
+    tyre_id = _create(client)
+    reservation_id = _hold(client, tyre_id, 2).json()["id"]
+
+    assert client.post(f"/api/reservations/{reservation_id}/release").status_code == 200
+    again = client.post(f"/api/reservations/{reservation_id}/confirm")
+    assert again.status_code == 409
+    assert again.json()["detail"] == "Reservation is already released"
+    assert client.post("/api/reservations/99999/release").status_code == 404
+    assert client.get(f"/api/reservations/{reservation_id}").json()["status"] == "released"
+    assert _availability(client, tyre_id)["reserved"] == 0
+
+
+def test_expired_holds_cannot_be_confirmed_and_are_swept(client, monkeypatch):
+    tyre_id = _create(client)
+    first = _hold(client, tyre_id, 3, ttl_seconds=60).json()
+    _hold(client, tyre_id, 2, ttl_seconds=60)
+    _hold(client, tyre_id, 1, ttl_seconds=600)
+
+    later = crud.utcnow() + timedelta(seconds=120)
+    monkeypatch.setattr(crud, "utcnow", lambda: later)
+
+    expired = client.post(f"/api/reservations/{first['id']}/confirm")
+    assert expired.status_code == 409
+    assert expired.json()["detail"] == "Reservation has expired"
+
+    assert reservation_sweeper.sweep(batch_size=1) == 2
+    assert _availability(client, tyre_id) == {
+        "tyre_id": tyre_id, "quantity": 10, "reserved": 1, "available": 9,
+    }
+    assert client.get(f"/api/reservations/{first['id']}").json()["status"] == "expired"
+    assert reservation_sweeper.sweep() == 0
+
+
+def test_service_can_hold_employee_cannot(client, anon_client, employee_headers, service_headers):
+    tyre_id = _create(client)
+    url = f"/api/tyres/{tyre_id}/reservations"
+    assert anon_client.post(url, json={"quantity": 1}, headers=service_headers).status_code == 201
+    assert anon_client.post(url, json={"quantity": 1}, headers=employee_headers).status_code == 403
+    assert anon_client.get(
+        f"/api/tyres/{tyre_id}/availability", headers=employee_headers
+    ).status_code == 200
+
+
+# Load test: many checkouts racing for the last units.
+
+def test_concurrent_checkouts_never_oversell(db):
+    stock = 25
+    tyre = TyreModel(**{**VALID_PAYLOAD, "quantity": stock, "retail_cost": "135.00"})
+    db.add(tyre)
+    db.commit()
+    tyre_id = tyre.id
+
+    start = threading.Barrier(16)
+
+    def checkout(n):
+        session = SessionLocal()
+        try:
+            if n < 16:
+                start.wait()
+            try:
+                reservation = crud.hold_stock(session, tyre_id, 1 + n % 3)
+            except HTTPException as exc:
+                assert exc.status_code == 409
+                return "rejected"
+            # Two in three pay; the rest abandon the cart.
+            if n % 3:
+                crud.confirm_reservation(session, reservation.id)
+                return "sold"
+            crud.release_reservation(session, reservation.id)
+            return "released"
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(checkout, range(80)))
+
+    db.expire_all()
+    tyre = db.get(TyreModel, tyre_id)
+    sold = sum(
+        r.quantity
+        for r in db.query(ReservationModel).filter_by(tyre_id=tyre_id, status="confirmed")
+    )
+    assert "rejected" in outcomes and "sold" in outcomes
+    assert tyre.reserved == 0
+    assert tyre.quantity == stock - sold >= 0
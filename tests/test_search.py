@@ -0,0 +1,113 @@
+import types
+
+from sqlalchemy.dialects import postgresql
+
+from app import search
+from app.search import SearchIndex, parse_query, postgres_search_stmt
+from tests.test_main import VALID_PAYLOAD
+
+CATALOGUE = [
+    ("Michelin", "Pilot Sport 4", "205/55R16"),
+    ("Michelin", "Primacy 4", "205/55R16"),
+    ("Michelin", "Pilot Sport 5", "225/40ZR18"),
+    ("Pirelli", "P Zero", "225/40ZR18"),
+    ("Continental", "PremiumContact 6", "205/55R16"),
+]
+
+
+def _seed(client):
+    ids = {}
+    for brand, model, size in CATALOGUE:
+        payload = {**VALID_PAYLOAD, "brand": brand, "model": model, "size": size}
+        ids[model] = client.post("/api/tyres", json=payload).json()["id"]
+    return ids
+
+
+def _search(client, q, **params):
+    response = client.get("/api/tyres/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return [hit["model"] for hit in response.json()]
+
+
+def test_parse_query_normalizes_size_notation():
+    for q in ("205/55R16", "205 55 16", "205-55-16", "205/55 r16"):
+        assert parse_query(q) == ("2055516", [])
+    assert parse_query("michelin 225/40zr18 pilot") == ("2254018", ["michelin", "pilot"])
+    assert parse_query("Pilot Sport 4") == (None, ["pilot", "sport", "4"])
+
+
+def test_search_by_size_words_and_typos(client):
+    ids = _seed(client)
+
+    assert set(_search(client, "205 55 16")) == {"Pilot Sport 4", "Primacy 4", "PremiumContact 6"}
+    assert _search(client, "michelin pilot 225/40zr18") == ["Pilot Sport 5"]
+    assert set(_search(client, "mich pil")) == {"Pilot Sport 4", "Pilot Sport 5"}
+    # Fuzzy: misspelt brand still finds the tyres.
+    assert set(_search(client, "michelan primacy")) == {"Primacy 4"}
+    assert _search(client, "goodyear") == []
+    assert len(_search(client, "michelin", limit=2)) == 2
+
+    hit = client.get("/api/tyres/search", params={"q": "pirelli"}).json()[0]
+    assert hit["id"] == ids["P Zero"] and hit["score"] > 0
+
+
+def test_search_index_follows_writes(client):
+    ids = _seed(client)
+    assert _search(client, "zero") == ["P Zero"]
+
+    client.patch(f"/api/tyres/{ids['P Zero']}", json={"model": "Cinturato"})
+    assert _search(client, "zero") == []
+    assert _search(client, "cinturato") == ["Cinturato"]
+
+
+def test_exact_word_outranks_prefix_and_fuzzy():
+    Row = type("Row", (), {})
+    rows = []
+    for tyre_id, (brand, model, size) in enumerate(CATALOGUE, start=1):
+        row = Row()
+        row.id, row.brand, row.model, row.supplier, row.size = tyre_id, brand, model, "S", size
+        rows.append(row)
+    ranked = SearchIndex(rows).search(None, ["pilot"], limit=10)
+    assert [tyre_id for tyre_id, _ in ranked] == [1, 3]
+
+
+def test_postgres_query_uses_the_indexed_expressions():
+    sql = str(
+        postgres_search_stmt("2055516", ["michelin"], 20).compile(dialect=postgresql.dialect())
+    )
+    text = "lower(tyres.brand || ' ' || tyres.model || ' ' || tyres.supplier)"
+    assert f"to_tsvector('simple', {text}) @@ to_tsquery('simple'," in sql
+    assert f"<%% {text}" in sql
+    assert "regexp_replace(tyres.size, '[^0-9]', '', 'g') LIKE" in sql
+
+
+class _RecordingSession:
+    """Records statements; every query returns no rows."""
+
+    def __init__(self, dialect, on_execute=None):
+        self.statements = []
+        self._bind = types.SimpleNamespace(dialect=types.SimpleNamespace(name=dialect))
+        self._on_execute = on_execute
+
+    def get_bind(self):
+        return self._bind
+
+    def execute(self, stmt):
+        self.statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+        if self._on_execute:
+            self._on_execute()
+        return types.SimpleNamespace(all=list)
+
+
+def test_postgres_search_sets_the_word_similarity_threshold():
+    db = _RecordingSession("postgresql")
+    assert search.search_tyres(db, "pilto", 20) == []
+    assert "set_config" in db.statements[0]
+    assert "<%" in db.statements[1]
+
+
+def test_index_built_across_a_write_is_not_kept():
+    search.drop_search_index()
+    db = _RecordingSession("sqlite", on_execute=search.drop_search_index)
+    assert isinstance(search.search_index(db), SearchIndex)
+    assert search._index is None
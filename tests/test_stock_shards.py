@@ -0,0 +1,168 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import delete, select
+
+from app import crud, order_worker
+from app.database import SessionLocal
+from app.models import TyreModel, TyreStockShardModel
+from tests.test_main import VALID_PAYLOAD
+
+
+def _sharded(client, quantity=10, shards=4, model="Hot"):
+    tyre_id = client.post(
+        "/api/tyres", json={**VALID_PAYLOAD, "model": model, "quantity": quantity}
+    ).json()["id"]
+    response = client.put(f"/api/tyres/{tyre_id}/stock/shards", json={"count": shards})
+    assert response.status_code == 200
+    return tyre_id
+
+
+def _slots(db, tyre_id):
+    db.expire_all()
+    return db.execute(
+        select(TyreStockShardModel.quantity)
+        .where(TyreStockShardModel.tyre_id == tyre_id)
+        .order_by(TyreStockShardModel.slot)
+    ).scalars().all()
+
+
+def _stock(client, tyre_id, delta):
+    return client.post(f"/api/tyres/{tyre_id}/stock", json={"delta": delta})
+
+
+def test_sharding_keeps_one_quantity_on_reads(client, db):
+    tyre_id = _sharded(client, quantity=10, shards=4)
+    assert _slots(db, tyre_id) == [3, 3, 2, 2]
+
+    tyre = client.get(f"/api/tyres/{tyre_id}").json()
+    assert (tyre["quantity"], tyre["shards"]) == (10, 4)
+    listed = client.get("/api/tyres", params={"in_stock": True}).json()
+    assert [t["quantity"] for t in listed] == [10]
+    exported = client.get("/api/tyres/export").text
+    assert '"quantity": 10' in exported
+
+    unsharded = client.put(f"/api/tyres/{tyre_id}/stock/shards", json={"count": 0}).json()
+    assert (unsharded["quantity"], unsharded["shards"]) == (10, 0)
+    assert _slots(db, tyre_id) == []
+
+
+def test_sharded_stock_never_goes_negative(client, db):
+    tyre_id = _sharded(client, quantity=6, shards=3)
+
+    assert _stock(client, tyre_id, -1).json()["quantity"] == 5
+    # No single slot holds 4: every slot is locked and drained.
+    assert _stock(client, tyre_id, -4).json()["quantity"] == 1
+    assert _stock(client, tyre_id, -2).status_code == 409
+    assert _stock(client, tyre_id, 5).json()["quantity"] == 6
+    assert sum(_slots(db, tyre_id)) == 6
+    assert min(_slots(db, tyre_id)) >= 0
+
+
+def test_restock_is_not_dropped_when_the_slots_are_gone(client, db):
+    tyre_id = _sharded(client, quantity=6, shards=3)
+    # What a concurrent un-shard leaves before it resets shards: no slots.
+    db.execute(delete(TyreStockShardModel).where(TyreStockShardModel.tyre_id == tyre_id))
+    assert crud.adjust_sharded_stock(db, tyre_id, 5) is False
+    db.rollback()
+
+
+def test_adjustment_follows_a_concurrent_unshard(client, db, monkeypatch):
+    tyre_id = _sharded(client, quantity=6, shards=3)
+
+    class UnshardAfterRead:
+        # Called just after adjust_sharded_stock reads the shard count.
+        @staticmethod
+        def randrange(shards):
+            crud.spread_stock(db, tyre_id, 6, 0)
+            return 0
+
+    monkeypatch.setattr(crud, "random", UnshardAfterRead)
+    assert crud.adjust_sharded_stock(db, tyre_id, 5) is True
+    db.commit()
+    assert client.get(f"/api/tyres/{tyre_id}").json()["quantity"] == 11
+    assert _slots(db, tyre_id) == []
+
+
+def test_sharded_etag_follows_stock(client):
+    tyre_id = _sharded(client)
+    etag = client.get(f"/api/tyres/{tyre_id}").headers["ETag"]
+    _stock(client, tyre_id, -1)
+    fresh = client.get(f"/api/tyres/{tyre_id}", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    patched = client.patch(
+        f"/api/tyres/{tyre_id}",
+        json={"noise_level": 71},
+        headers={"If-Match": fresh.headers["ETag"]},
+    )
+    assert patched.status_code == 200
+
+
+def test_writes_that_set_quantity_respread_the_slots(client, db):
+    tyre_id = _sharded(client, quantity=10, shards=2)
+
+    patched = client.patch(f"/api/tyres/{tyre_id}", json={"quantity": 7}).json()
+    assert patched["quantity"] == 7
+    assert _slots(db, tyre_id) == [4, 3]
+
+    payload = {**VALID_PAYLOAD, "model": "Hot", "quantity": 3}
+    assert client.post("/api/tyres/import", json=[payload]).status_code == 200
+    assert client.get(f"/api/tyres/{tyre_id}").json()["quantity"] == 3
+    assert _slots(db, tyre_id) == [2, 1]
+
+
+def test_sharded_tyres_cannot_be_reserved(client):
+    tyre_id = _sharded(client)
+    held = client.post(f"/api/tyres/{tyre_id}/reservations", json={"quantity": 1})
+    assert held.status_code == 409
+    assert held.json()["detail"] == "Sharded stock cannot be reserved"
+
+    other = client.post("/api/tyres", json={**VALID_PAYLOAD, "model": "Held"}).json()["id"]
+    client.post(f"/api/tyres/{other}/reservations", json={"quantity": 1})
+    refused = client.put(f"/api/tyres/{other}/stock/shards", json={"count": 2})
+    assert refused.status_code == 409
+    assert client.put("/api/tyres/99999/stock/shards", json={"count": 2}).status_code == 404
+
+
+def test_batch_and_order_worker_use_the_slots(client, db):
+    tyre_id = _sharded(client, quantity=10, shards=4)
+
+    batch = client.post(
+        "/api/tyres/stock/batch", json={"items": [{"tyre_id": tyre_id, "delta": -3}]}
+    )
+    assert batch.json() == [{"tyre_id": tyre_id, "quantity": 7}]
+
+    order = {"id": 1, "type": "SELL", "items": [{"tyre_id": tyre_id, "quantity": 2}]}
+    assert order_worker.apply_orders(db, [order])[tyre_id] == 5
+    assert sum(_slots(db, tyre_id)) == 5
+
+
+# Contention: many sellers racing for the same hot tyre.
+
+def test_concurrent_sharded_sales_never_oversell(client, db):
+    tyre_id = _sharded(client, quantity=30, shards=8)
+    start = threading.Barrier(12)
+
+    def sell(n):
+        session = SessionLocal()
+        try:
+            if n < 12:
+                start.wait()
+            if crud.adjust_sharded_stock(session, tyre_id, -(1 + n % 2)):
+                session.commit()
+                return 1 + n % 2
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        sold = sum(pool.map(sell, range(60)))
+
+    slots = _slots(db, tyre_id)
+    assert min(slots) >= 0
+    assert sum(slots) == 30 - sold
+    assert sold >= 29
+    db.expire_all()
+    assert db.get(TyreModel, tyre_id).quantity == 0
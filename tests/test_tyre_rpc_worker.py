@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import json
+import types
+
+from app import tyre_rpc_worker
+from app.cache import tyre_cache
+from tests.test_main import VALID_PAYLOAD
+
+
+def _create(client, model):
+    return client.post("/api/tyres", json={**VALID_PAYLOAD, "model": model}).json()["id"]
+
+
+def test_bulk_lookup_returns_found_and_missing(client):
+    a, b = _create(client, "A"), _create(client, "B")
+    response = tyre_rpc_worker.build_response({"tyre_ids": [b, 99999, a, b]})
+    assert response["ok"] is True
+    assert [t["id"] for t in response["tyres"]] == [b, a]
+    assert response["missing"] == [99999]
+    assert response["tyres"][0]["retail_cost"] == "135.00"
+
+
+def test_single_lookup_keeps_legacy_shape(client):
+    a = _create(client, "A")
+    assert tyre_rpc_worker.build_response({"tyre_id": a})["tyre"]["id"] == a
+    assert tyre_rpc_worker.build_response({"tyre_id": 99999}) == {"ok": False}
+
+
+def test_oversized_bulk_lookup_is_refused(client, monkeypatch):
+    monkeypatch.setattr(tyre_rpc_worker, "MAX_IDS", 2)
+    assert tyre_rpc_worker.build_response({"tyre_ids": [1, 2, 2]})["ok"] is True
+    assert tyre_rpc_worker.build_response({"tyre_ids": [1, 2, 3]}) == {
+        "ok": False, "error": "At most 2 tyre ids per request, got 3",
+    }
+
+    msg = FakeRpcMessage({"tyre_ids": [1, 2, 3]})
+    asyncio.run(tyre_rpc_worker.process_message(msg))
+    [(_routing_key, body)] = msg.channel.default_exchange.published
+    assert body["ok"] is False
+
+
+def test_repeat_lookups_are_served_from_cache(client, monkeypatch):
+    a = _create(client, "A")
+    tyre_rpc_worker.lookup_tyres([a])
+
+    def no_db():
+        raise AssertionError("cache miss went to the database")
+
+    monkeypatch.setattr(tyre_rpc_worker, "SessionLocal", no_db)
+    assert tyre_rpc_worker.lookup_tyres([a])[a]["quantity"] == 10
+
+
+def test_api_writes_invalidate_cached_tyre(client):
+    a = _create(client, "A")
+    tyre_rpc_worker.lookup_tyres([a])
+    assert tyre_cache.get(a) is not None
+
+    client.post(f"/api/tyres/{a}/stock", json={"delta": -4})
+    assert tyre_cache.get(a) is None
+    assert tyre_rpc_worker.lookup_tyres([a])[a]["quantity"] == 6
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append((routing_key, json.loads(message.body)))
+
+
+class FakeRpcMessage:
+    def __init__(self, data):
+        self.body = json.dumps(data).encode()
+        self.routing_key = "tyres.get"
+        self.reply_to = "amq.rabbitmq.reply-to"
+        self.correlation_id = "c-1"
+        self.channel = types.SimpleNamespace(default_exchange=FakeExchange())
+
+    @contextlib.asynccontextmanager
+    async def process(self):
+        yield
+
+
+def test_process_message_replies_on_reply_queue(client):
+    a = _create(client, "A")
+    msg = FakeRpcMessage({"tyre_ids": [a, 99999]})
+
+    asyncio.run(tyre_rpc_worker.process_message(msg))
+
+    [(routing_key, body)] = msg.channel.default_exchange.published
+    assert routing_key == "amq.rabbitmq.reply-to"
+    assert body["missing"] == [99999]
+    assert body["tyres"][0]["id"] == a